@@ -7,9 +7,139 @@ from __future__ import annotations
 
 import abc
 import argparse
+import atexit
+import fcntl
 import os
+import sys
+import tempfile
+import threading
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional, Sequence
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# Queued changelog lines that force a flush without waiting for exit or the
+# background flusher.
+CHANGELOG_MAX_PENDING = 256
+
+# An mtime this close to the moment it was observed is not trusted to reveal
+# later changes: a write within the same timestamp tick would not bump it.
+# Shared by every mtime-keyed cache (registry snapshot, directory listings,
+# clean-file cache, logger source records).
+RACY_MTIME_NS = 2_000_000_000
+
+
+class ChangelogSink:
+    """
+    Buffered, lock-protected appender shared by every agent writing a file.
+
+    ``append`` only queues a line. ``flush`` encodes the queued lines into one
+    buffer and appends it with a single ``write`` on an ``O_APPEND``
+    descriptor while holding an exclusive ``flock``. Concurrent agents, in
+    this process or any other, therefore never interleave partial lines.
+    There is one sink per path and process (``for_path``). Every sink is
+    flushed at interpreter exit, and long-running modes can add a background
+    flusher with ``start_flusher``.
+    """
+
+    _sinks: Dict[Path, "ChangelogSink"] = {}
+    _sinks_lock = threading.Lock()
+
+    def __init__(self, path: Path, *, max_pending: int = CHANGELOG_MAX_PENDING) -> None:
+        self.path = path
+        self.max_pending = max_pending
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def for_path(cls, path: Path) -> "ChangelogSink":
+        """The process-wide sink for ``path``."""
+        key = Path(os.path.abspath(path))
+        with cls._sinks_lock:
+            sink = cls._sinks.get(key)
+            if sink is None:
+                sink = cls._sinks[key] = cls(key)
+            return sink
+
+    @classmethod
+    def flush_all(cls) -> None:
+        """Flush every sink, reporting (not raising) write failures."""
+        with cls._sinks_lock:
+            sinks = list(cls._sinks.values())
+        for sink in sinks:
+            try:
+                sink.flush()
+            except OSError as exc:
+                print(f"changelog: unable to write {sink.path}: {exc}", file=sys.stderr)
+
+    def append(self, line: str) -> None:
+        """Queue ``line`` (without its newline); flushes once the queue is full."""
+        with self._lock:
+            self._pending.append(line.rstrip("\n") + "\n")
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write every queued line in one locked ``O_APPEND`` write."""
+        with self._lock:
+            if not self._pending:
+                return
+            data = "".join(self._pending).encode("utf-8")
+            flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+            try:
+                fd = os.open(self.path, flags, 0o644)
+            except FileNotFoundError:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(self.path, flags, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)  # also releases the flock
+            self._pending.clear()
+
+    def start_flusher(self, interval: float = 1.0) -> None:
+        """Flush from a daemon thread every ``interval`` seconds until ``stop_flusher``."""
+        if self._flusher is not None:
+            return
+        self._stop.clear()
+
+        def loop() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.flush()
+                except OSError as exc:
+                    print(f"changelog: unable to write {self.path}: {exc}", file=sys.stderr)
+
+        self._flusher = threading.Thread(target=loop, name="changelog-flusher", daemon=True)
+        self._flusher.start()
+
+    def stop_flusher(self) -> None:
+        """Stop the background flusher (if any) and flush what is left."""
+        flusher, self._flusher = self._flusher, None
+        if flusher is not None:
+            self._stop.set()
+            flusher.join()
+        self.flush()
+
+
+atexit.register(ChangelogSink.flush_all)
+
+
+def exit_code_of(exc: SystemExit) -> int:
+    """
+    The exit status ``exc`` stands for, as the interpreter would report it;
+    a non-integer code is printed to stderr and counts as 1.
+    """
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
 
 
 class BaseAgent(abc.ABC):
@@ -30,11 +160,47 @@ class BaseAgent(abc.ABC):
         """Expand ``~`` and environment variables, returning an absolute path."""
         return Path(os.path.expandvars(os.path.expanduser(value))).resolve()
 
+    def changelog(self) -> ChangelogSink:
+        """The shared sink for ``self.changelog_path`` (set by the subclass)."""
+        return ChangelogSink.for_path(self.changelog_path)
+
     @staticmethod
     def ensure_parent(path: Path) -> None:
         """Create the parent directory for ``path`` if it does not exist."""
         path.parent.mkdir(parents=True, exist_ok=True)
 
+    @staticmethod
+    def write_atomic(path: Path, data: bytes, *, durable: bool = True) -> None:
+        """
+        Replace ``path`` with ``data`` so readers see the old or new content.
+
+        The data is fsynced to a temp file in the same directory and renamed
+        over ``path``; the directory is fsynced so the rename survives a crash.
+        ``durable=False`` skips both fsyncs, for caches that may be lost.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+                if durable:
+                    fh.flush()
+                    os.fsync(fh.fileno())
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+        if not durable:
+            return
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
     # ---------------------------------------------------------------- interface
     def build_arg_parser(self) -> argparse.ArgumentParser:
         """Return an ``ArgumentParser`` configured with the agent description."""
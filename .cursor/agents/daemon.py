@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Warm agent daemon behind ``runner.py serve``.
+
+Kept apart from ``runner.py`` so ordinary invocations never import the socket
+and threading machinery. The runner hands in the callables the daemon needs,
+which keeps this module free of a circular import.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import selectors
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from .base import ChangelogSink, exit_code_of
+
+# Daemon wire protocol (keep in sync with scripts/agents/agent-client.py).
+# Every frame is a one byte channel followed by a big-endian u32 length.
+FRAME_HEADER = struct.Struct("!BI")
+FRAME_REQUEST = 0
+FRAME_STDOUT = 1
+FRAME_STDERR = 2
+FRAME_EXIT = 3
+
+# dispatch(argv, registry, *, allow_serve) -> exit code
+DispatchFn = Callable[..., int]
+
+
+def send_frame(sock: socket.socket, channel: int, payload: bytes) -> None:
+    sock.sendall(FRAME_HEADER.pack(channel, len(payload)) + payload)
+
+
+def recv_frame(sock: socket.socket) -> Optional[tuple[int, bytes]]:
+    header = _recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    channel, length = FRAME_HEADER.unpack(header)
+    payload = _recv_exact(sock, length) if length else b""
+    if payload is None:
+        return None
+    return channel, payload
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+class AgentDaemon(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """
+    Forking agent daemon.
+
+    The parent process keeps the registry, ``base.py`` and every agent module
+    loaded. Each connection is served by a ``fork`` of that warm process, so
+    an invocation costs a fork instead of an interpreter start and the agents
+    stay isolated from one another (``parser.exit`` and friends only end the
+    worker).
+    """
+
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        socket_path: Path,
+        *,
+        registry_path: Path,
+        load_registry: Callable[[], Dict[str, Any]],
+        warm_agents: Callable[[Dict[str, Any]], None],
+        dispatch: DispatchFn,
+    ) -> None:
+        self.socket_path = socket_path
+        self.registry_path = registry_path
+        self.load_registry = load_registry
+        self.warm_agents = warm_agents
+        self.dispatch = dispatch
+        self.registry: Dict[str, Any] = {}
+        self.registry_mtime = -1
+        self.refresh_registry()
+        # Create the socket owner-only; a chmod after bind leaves a window.
+        umask = os.umask(0o077)
+        try:
+            super().__init__(str(socket_path), AgentRequestHandler)
+        finally:
+            os.umask(umask)
+
+    def refresh_registry(self) -> None:
+        try:
+            mtime = self.registry_path.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime == self.registry_mtime:
+            return
+        self.registry = self.load_registry()
+        self.registry_mtime = mtime
+        self.warm_agents(self.registry)
+
+    def verify_request(self, request: Any, client_address: Any) -> bool:
+        # Runs in the parent before forking, so reloads are shared by workers.
+        self.refresh_registry()
+        return True
+
+
+class AgentRequestHandler(socketserver.BaseRequestHandler):
+    """Serve a single forwarded ``runner.py`` invocation inside a worker."""
+
+    def handle(self) -> None:
+        # The parent's SIGTERM handler exits cleanly; a terminated agent must
+        # not report success.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        sock: socket.socket = self.request
+        frame = recv_frame(sock)
+        if frame is None or frame[0] != FRAME_REQUEST:
+            return
+        try:
+            request = json.loads(frame[1].decode("utf-8"))
+            argv = [str(item) for item in request.get("argv", [])]
+        except (ValueError, AttributeError) as exc:
+            send_frame(sock, FRAME_STDERR, f"serve: malformed request: {exc}\n".encode())
+            send_frame(sock, FRAME_EXIT, struct.pack("!i", 2))
+            return
+
+        env = request.get("env")
+        if isinstance(env, dict):
+            os.environ.clear()
+            os.environ.update({str(k): str(v) for k, v in env.items()})
+        cwd = request.get("cwd")
+        if cwd:
+            try:
+                os.chdir(cwd)
+            except OSError:
+                pass
+
+        rc = self._run_captured(sock, argv)
+        send_frame(sock, FRAME_EXIT, struct.pack("!i", rc))
+
+    def _run_captured(self, sock: socket.socket, argv: Sequence[str]) -> int:
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(devnull, 0)
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+        os.close(out_w)
+        os.close(err_w)
+
+        pump = threading.Thread(
+            target=_pump_output, args=(sock, out_r, err_r), daemon=True
+        )
+        pump.start()
+
+        try:
+            rc = self.server.dispatch(argv, self.server.registry, allow_serve=False)
+        except SystemExit as exc:
+            rc = exit_code_of(exc)
+        except Exception:  # noqa: BLE001 - reported to the client
+            traceback.print_exc()
+            rc = 1
+        finally:
+            # Workers leave through os._exit, which skips atexit handlers.
+            ChangelogSink.flush_all()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            # Closing the last pipe writers lets the pump reach EOF.
+            os.dup2(devnull, 1)
+            os.dup2(devnull, 2)
+            os.close(devnull)
+        pump.join()
+        return rc
+
+
+def _pump_output(sock: socket.socket, out_fd: int, err_fd: int) -> None:
+    channels = {out_fd: FRAME_STDOUT, err_fd: FRAME_STDERR}
+    selector = selectors.DefaultSelector()
+    for fd in channels:
+        selector.register(fd, selectors.EVENT_READ)
+    try:
+        while channels:
+            for key, _mask in selector.select():
+                fd = key.fd
+                data = os.read(fd, 65536)
+                if not data:
+                    selector.unregister(fd)
+                    os.close(fd)
+                    del channels[fd]
+                    continue
+                try:
+                    send_frame(sock, channels[fd], data)
+                except OSError:
+                    pass  # client went away; keep draining so the agent never blocks
+    finally:
+        selector.close()
+
+
+def serve(
+    socket_path: Path,
+    *,
+    registry_path: Path,
+    load_registry: Callable[[], Dict[str, Any]],
+    warm_agents: Callable[[Dict[str, Any]], None],
+    dispatch: DispatchFn,
+) -> int:
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    if socket_path.exists():
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(socket_path))
+        except OSError:
+            socket_path.unlink()  # stale socket from a previous daemon
+        else:
+            raise SystemExit(f"agent daemon already listening on {socket_path}")
+        finally:
+            probe.close()
+
+    server = AgentDaemon(
+        socket_path,
+        registry_path=registry_path,
+        load_registry=load_registry,
+        warm_agents=warm_agents,
+        dispatch=dispatch,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"cursor-agent-runner serving on {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        try:
+            socket_path.unlink()
+        except FileNotFoundError:
+            pass
+    return 0
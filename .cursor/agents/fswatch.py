@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Filesystem change notification and path matching helpers for agents.
+
+``create_watcher`` returns an inotify backed watcher on Linux and falls back to
+stat polling elsewhere (or when inotify is unavailable / out of watches). Both
+report changed paths from ``poll``; a reported directory means "anything below
+this directory may have changed" (new subtree, queue overflow, ...).
+"""
+
+from __future__ import annotations
+
+import abc
+import ctypes
+import ctypes.util
+import errno
+import os
+import re
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Pattern, Set, Tuple
+
+ExcludeFn = Callable[[str], bool]
+
+
+def exclude_hidden(name: str) -> bool:
+    """Skip dot-directories, mirroring ``glob`` semantics."""
+    return name.startswith(".")
+
+
+# ------------------------------------------------------------------- matching
+def compile_glob(pattern: str, *, match_hidden: bool = False) -> Pattern[str]:
+    """
+    Compile a ``/`` separated glob into a regex with globstar semantics.
+
+    ``*``, ``?`` and ``[...]`` never cross ``/``; a ``**`` component matches
+    zero or more directories. Unless ``match_hidden`` is set, wildcards do not
+    match names starting with ``.`` (like ``glob.glob``).
+    """
+    parts = pattern.split("/")
+    out = []
+    for index, part in enumerate(parts):
+        last = index == len(parts) - 1
+        if part == "**":
+            if last:
+                out.append(".*" if match_hidden else r"(?:(?!\.)[^/]*(?:/|$))*")
+            else:
+                out.append(r"(?:[^/]*/)*" if match_hidden else r"(?:(?!\.)[^/]*/)*")
+            continue
+        segment = _translate_segment(part)
+        if not match_hidden and part[:1] in ("*", "?", "["):
+            segment = r"(?!\.)" + segment
+        out.append(segment + ("" if last else "/"))
+    return re.compile("".join(out) + r"\Z", re.DOTALL)
+
+
+def _translate_segment(part: str) -> str:
+    result = []
+    i, n = 0, len(part)
+    while i < n:
+        char = part[i]
+        i += 1
+        if char == "*":
+            result.append("[^/]*")
+        elif char == "?":
+            result.append("[^/]")
+        elif char == "[":
+            j = i
+            if j < n and part[j] in "!^":
+                j += 1
+            if j < n and part[j] == "]":
+                j += 1
+            while j < n and part[j] != "]":
+                j += 1
+            if j >= n:
+                result.append(r"\[")
+                continue
+            body = part[i:j].replace("\\", r"\\")
+            i = j + 1
+            if body[:1] in "!^":
+                body = "^" + body[1:]
+            result.append(f"[{body}]")
+        else:
+            result.append(re.escape(char))
+    return "".join(result)
+
+
+def glob_base(pattern: str) -> Tuple[str, bool]:
+    """
+    Split an absolute glob into its literal base directory and whether the
+    remainder needs a recursive walk (contains ``**`` or a directory wildcard).
+    """
+    parts = pattern.split("/")
+    literal = []
+    for part in parts[:-1]:
+        if any(char in part for char in "*?["):
+            break
+        literal.append(part)
+    base = "/".join(literal) or "/"
+    recursive = len(literal) < len(parts) - 1
+    return base, recursive
+
+
+# ------------------------------------------------------------------- watchers
+class Watcher(abc.ABC):
+    """Common interface for change notification backends."""
+
+    def __init__(self, exclude: Optional[ExcludeFn] = None) -> None:
+        self.exclude = exclude or (lambda _name: False)
+        # Set when the backend could not cover a new directory during ``poll``
+        # (out of inotify watches or descriptors); see ``recover_watcher``.
+        self.failure: Optional[OSError] = None
+
+    @abc.abstractmethod
+    def add_directory(self, path: Path, recursive: bool = True) -> None:
+        """Start watching ``path`` (and its subdirectories when recursive)."""
+
+    @abc.abstractmethod
+    def poll(self, timeout: float) -> Set[Path]:
+        """Block up to ``timeout`` seconds and return the paths that changed."""
+
+    def close(self) -> None:
+        """Release backend resources."""
+
+    def _walk_dirs(self, root: Path) -> Iterable[Path]:
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            yield current
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if self.exclude(entry.name):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(Path(entry.path))
+            except OSError:
+                continue
+
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher(Watcher):
+    """Linux inotify backend driven through ``ctypes`` (no third-party deps)."""
+
+    def __init__(self, exclude: Optional[ExcludeFn] = None) -> None:
+        super().__init__(exclude)
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches: Dict[int, Path] = {}
+        self._recursive: Dict[int, bool] = {}
+
+    def add_directory(self, path: Path, recursive: bool = True) -> None:
+        roots = self._walk_dirs(path) if recursive else [path]
+        for directory in roots:
+            wd = self._add_watch(self._fd, os.fsencode(str(directory)), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    raise OSError(err, "inotify watch limit reached")
+                continue  # vanished or unreadable directory
+            self._watches[wd] = directory
+            self._recursive[wd] = recursive
+
+    def poll(self, timeout: float) -> Set[Path]:
+        changed: Set[Path] = set()
+        ready, _, _ = select.select([self._fd], [], [], max(timeout, 0))
+        while ready:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            self._parse(data, changed)
+            ready, _, _ = select.select([self._fd], [], [], 0)
+        return changed
+
+    def _parse(self, data: bytes, changed: Set[Path]) -> None:
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            raw_name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                changed.update(self._watches.values())
+                continue
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                self._recursive.pop(wd, None)
+                continue
+            if not raw_name:
+                changed.add(directory)
+                continue
+
+            name = os.fsdecode(raw_name)
+            path = directory / name
+            if mask & IN_ISDIR:
+                if self.exclude(name):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO) and self._recursive.get(wd):
+                    try:
+                        self.add_directory(path, recursive=True)
+                    except OSError as exc:  # ENOSPC / EMFILE: subtree unwatched
+                        self.failure = exc
+                changed.add(path)
+                continue
+            changed.add(path)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher(Watcher):
+    """Portable fallback that compares ``stat`` snapshots every ``interval``."""
+
+    def __init__(self, exclude: Optional[ExcludeFn] = None, interval: float = 1.0) -> None:
+        super().__init__(exclude)
+        self.interval = interval
+        self._dirs: Dict[Path, Tuple[int, bool]] = {}
+        self._files: Dict[Path, Tuple[int, int, int]] = {}
+        self._last = 0.0
+
+    def add_directory(self, path: Path, recursive: bool = True) -> None:
+        roots = self._walk_dirs(path) if recursive else [path]
+        for directory in roots:
+            self._scan(directory, recursive, report=None)
+
+    def _scan(self, directory: Path, recursive: bool, report: Optional[Set[Path]]) -> None:
+        try:
+            mtime = directory.stat().st_mtime_ns
+            entries = list(os.scandir(directory))
+        except OSError:
+            self._dirs.pop(directory, None)
+            return
+        self._dirs[directory] = (mtime, recursive)
+        for entry in entries:
+            path = Path(entry.path)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and not self.exclude(entry.name) and path not in self._dirs:
+                        self._scan(path, True, report)
+                        if report is not None:
+                            report.add(path)
+                    continue
+                if path not in self._files:
+                    stat = entry.stat()
+                    self._files[path] = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                    if report is not None:
+                        report.add(path)
+            except OSError:
+                continue
+
+    def poll(self, timeout: float) -> Set[Path]:
+        wait = self._last + self.interval - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, max(timeout, 0)))
+            if wait > timeout:
+                return set()
+        self._last = time.monotonic()
+
+        changed: Set[Path] = set()
+        for directory, (mtime, recursive) in list(self._dirs.items()):
+            try:
+                current = directory.stat().st_mtime_ns
+            except OSError:
+                self._dirs.pop(directory, None)
+                changed.add(directory)
+                continue
+            if current != mtime:
+                self._scan(directory, recursive, changed)
+
+        for path, signature in list(self._files.items()):
+            try:
+                stat = path.stat()
+            except OSError:
+                del self._files[path]
+                changed.add(path)
+                continue
+            current = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if current != signature:
+                self._files[path] = current
+                changed.add(path)
+        return changed
+
+
+def create_watcher(
+    roots: Iterable[Tuple[Path, bool]],
+    *,
+    exclude: Optional[ExcludeFn] = None,
+    poll_interval: float = 1.0,
+    prefer_inotify: bool = True,
+) -> Watcher:
+    """
+    Build a watcher over ``(directory, recursive)`` roots, preferring inotify.
+    """
+    roots = [(Path(root), recursive) for root, recursive in roots]
+    if prefer_inotify and sys.platform.startswith("linux"):
+        watcher: Optional[Watcher] = None
+        try:
+            watcher = InotifyWatcher(exclude)
+            for root, recursive in roots:
+                watcher.add_directory(root, recursive)
+            return watcher
+        except (OSError, AttributeError):
+            if watcher is not None:
+                watcher.close()
+    watcher = PollingWatcher(exclude, interval=poll_interval)
+    for root, recursive in roots:
+        watcher.add_directory(root, recursive)
+    return watcher
+
+
+def recover_watcher(
+    watcher: Watcher,
+    roots: Iterable[Tuple[Path, bool]],
+    *,
+    exclude: Optional[ExcludeFn] = None,
+    poll_interval: float = 1.0,
+) -> Watcher:
+    """
+    Return ``watcher``, or a polling replacement over ``roots`` once it has
+    recorded a ``failure`` (the caller should rescan, as events may be lost).
+    """
+    if watcher.failure is None:
+        return watcher
+    print(
+        f"fswatch: {watcher.failure}; falling back to stat polling every {poll_interval:g}s",
+        file=sys.stderr,
+    )
+    watcher.close()
+    return create_watcher(roots, exclude=exclude, poll_interval=poll_interval, prefer_inotify=False)
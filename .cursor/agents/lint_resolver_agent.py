@@ -6,36 +6,480 @@ Lint resolver agent implementation.
 from __future__ import annotations
 
 import argparse
+import codecs
 import datetime as dt
 import fnmatch
-import importlib.util
+import functools
+import hashlib
+import math
 import os
+import re
 import shutil
 import subprocess
 import sys
 import json
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Mapping, MutableMapping, Sequence
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+)
+
+if TYPE_CHECKING:
+    import http.server
+
+if __package__:
+    from . import fswatch
+    from .base import RACY_MTIME_NS, BaseAgent
+else:  # executed as a script; .cursor/agents is sys.path[0]
+    import fswatch
+    from base import RACY_MTIME_NS, BaseAgent
+
+REGISTRY_PATH = Path(__file__).resolve().parent / "registry.json"
+
+# Directories never worth watching (or diagnosing) in --watch mode.
+DEFAULT_WATCH_EXCLUDE = [
+    ".git",
+    ".hg",
+    ".state",
+    ".venv",
+    "venv",
+    "node_modules",
+    "__pycache__",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".ruff_cache",
+]
 
-BASE_MODULE_PATH = Path(__file__).resolve().parent / "base.py"
-BASE_MODULE_ID = "cursor_agent_base"
+# Above this many changed paths a watch pass diagnoses the whole tree instead.
+MAX_TARGETED_PATHS = 200
+
+# Upper bound on one debounce window, in multiples of --debounce, so steady
+# churn cannot postpone a pass forever.
+MAX_DEBOUNCE_FACTOR = 5
+
+
+# Above this many git-changed files --changed diagnoses the whole tree instead.
+MAX_CHANGED_PATHS = 5000
+
+# Files per batch command invocation, keeping argv well below ARG_MAX.
+MAX_BATCH_FILES = 500
+
+# Files a batch-capable resolver collects from streamed diagnostics before a
+# chunk is handed to the pool while the linter is still running.
+DEFAULT_BATCH_SIZE = 100
+
+# Bytes read from the diagnostics pipe at a time.
+DIAGNOSTICS_CHUNK_BYTES = 64 * 1024
+
+# name -> (type, help) for everything ResolverMetrics exposes.
+METRIC_DEFINITIONS = {
+    "lint_resolver_passes_total": ("counter", "Diagnose-and-fix passes completed."),
+    "lint_resolver_pass_seconds": ("histogram", "Wall time of diagnose-and-fix passes."),
+    "lint_resolver_last_pass_timestamp_seconds": ("gauge", "Unix time the last pass finished."),
+    "lint_resolver_phase_seconds": (
+        "histogram",
+        "Wall time of resolver subprocesses by phase (diagnostics, fix, verify, ...).",
+    ),
+    "lint_resolver_process_spawns_total": ("counter", "Subprocesses started by resolver and phase."),
+    "lint_resolver_issues_total": ("counter", "Issues parsed from diagnostics output."),
+    "lint_resolver_files_total": ("counter", "Files handed to a fixer, by outcome."),
+    "lint_resolver_cache_lookups_total": ("counter", "Clean-file cache lookups by result."),
+    "lint_resolver_queue_depth": ("gauge", "Fix units submitted to the pool and not yet finished."),
+    "lint_resolver_queue_depth_peak": ("gauge", "Highest queue depth during the last pass."),
+}
+
+METRIC_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Repo-relative linter configuration folded into a resolver's cache key when
+# the resolver does not list its own ``config_files``.
+DEFAULT_CONFIG_FILES = [
+    "pyproject.toml",
+    "ruff.toml",
+    ".ruff.toml",
+    ".flake8",
+    "setup.cfg",
+    "tox.ini",
+]
 
-if BASE_MODULE_ID in sys.modules:
-    _base_module = sys.modules[BASE_MODULE_ID]
-else:
-    _base_spec = importlib.util.spec_from_file_location(
-        BASE_MODULE_ID,
-        BASE_MODULE_PATH,
-    )
-    if _base_spec is None or _base_spec.loader is None:
-        raise RuntimeError(f"unable to load base agent from {BASE_MODULE_PATH}")
-    _base_module = importlib.util.module_from_spec(_base_spec)
-    sys.modules[BASE_MODULE_ID] = _base_module
-    _base_spec.loader.exec_module(_base_module)
-BaseAgent = getattr(_base_module, "BaseAgent")
+DEFAULT_CACHE_MAX_ENTRIES = 50_000
+DEFAULT_CACHE_MAX_AGE_DAYS = 30
+
+# Distinct (path, rule) pairs whose selected resolver is memoized.
+SELECT_CACHE_SIZE = 65_536
+
+
+class ResolverCache:
+    """
+    Persistent record of files that were clean for a resolver.
+
+    Entries are keyed by resolver key (resolver ID plus tool version) and
+    path, and hold the file's SHA-256. A lookup only counts as clean while
+    the content hash still matches; an unchanged ``(mtime, size)`` skips the
+    hashing, except for entries recorded within the mtime granularity window.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+        max_age_days: float = DEFAULT_CACHE_MAX_AGE_DAYS,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        try:
+            with path.open("r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            if isinstance(data, dict) and isinstance(data.get("entries"), dict):
+                self.entries = data["entries"]
+        except (OSError, json.JSONDecodeError):
+            pass
+
+    @staticmethod
+    def _key(resolver_key: str, abs_path: str) -> str:
+        return f"{resolver_key}|{abs_path}"
+
+    @staticmethod
+    def _digest(abs_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(abs_path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def is_clean(self, resolver_key: str, abs_path: str) -> bool:
+        entry = self.entries.get(self._key(resolver_key, abs_path))
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(abs_path)
+        except OSError:
+            return False
+        if stat.st_size != entry.get("size"):
+            return False
+        racy = entry.get("checked_ns", 0) - stat.st_mtime_ns < RACY_MTIME_NS
+        if stat.st_mtime_ns == entry.get("mtime_ns") and not racy:
+            return True
+        try:
+            if self._digest(abs_path) != entry.get("sha256"):
+                return False
+        except OSError:
+            return False
+        entry["mtime_ns"] = stat.st_mtime_ns
+        entry["checked_ns"] = time.time_ns()
+        self.dirty = True
+        return True
+
+    def mark_clean(self, resolver_key: str, abs_path: str) -> None:
+        try:
+            stat = os.stat(abs_path)
+            sha256 = self._digest(abs_path)
+        except OSError:
+            return
+        self.entries[self._key(resolver_key, abs_path)] = {
+            "sha256": sha256,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "checked_ns": time.time_ns(),
+        }
+        self.dirty = True
+
+    def save(self) -> None:
+        """Evict old entries (by age, then oldest beyond ``max_entries``) and persist."""
+        if not self.dirty:
+            return
+        cutoff = time.time_ns() - int(self.max_age * 1e9)
+        live = [
+            (key, entry)
+            for key, entry in self.entries.items()
+            if entry.get("checked_ns", 0) >= cutoff
+        ]
+        if len(live) > self.max_entries:
+            live.sort(key=lambda item: item[1].get("checked_ns", 0))
+            live = live[len(live) - self.max_entries:]
+        self.entries = dict(live)
+        payload = json.dumps({"entries": self.entries}, separators=(",", ":"))
+        BaseAgent.write_atomic(self.path, payload.encode("utf-8"))
+        self.dirty = False
+
+
+class ResolverMetrics:
+    """
+    Counters, gauges and histograms rendered as Prometheus text exposition.
+
+    The agent writes them to a file after every pass (for the node exporter
+    textfile collector) and can serve them from ``/metrics``. All updates
+    are thread-safe.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = {}
+        # Histograms: per label set, bucket counts followed by sum and count.
+        self._histograms: Dict[str, Dict[Tuple[Tuple[str, str], ...], List[float]]] = {}
+
+    @staticmethod
+    def _key(labels: Mapping[str, str]) -> Tuple[Tuple[str, str], ...]:
+        return tuple(sorted(labels.items()))
+
+    def inc(self, name: str, labels: Mapping[str, str], value: float = 1) -> None:
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            key = self._key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, labels: Mapping[str, str], value: float) -> None:
+        with self._lock:
+            self._values.setdefault(name, {})[self._key(labels)] = value
+
+    def adjust(self, name: str, labels: Mapping[str, str], delta: float, *, peak: str = "") -> None:
+        """Add ``delta`` to a gauge, raising the ``peak`` gauge if it is exceeded."""
+        with self._lock:
+            key = self._key(labels)
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0) + delta
+            if peak:
+                peaks = self._values.setdefault(peak, {})
+                peaks[key] = max(peaks.get(key, 0), series[key])
+
+    def observe(self, name: str, labels: Mapping[str, str], seconds: float) -> None:
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            counts = series.setdefault(self._key(labels), [0.0] * (len(METRIC_BUCKETS) + 2))
+            for index, bound in enumerate(METRIC_BUCKETS):
+                if seconds <= bound:
+                    counts[index] += 1
+            counts[-2] += seconds
+            counts[-1] += 1
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, (kind, help_text) in METRIC_DEFINITIONS.items():
+                values = self._values.get(name)
+                histogram = self._histograms.get(name)
+                if not values and not histogram:
+                    continue
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted((values or {}).items()):
+                    lines.append(f"{name}{self._labels(key)} {self._number(value)}")
+                for key, counts in sorted((histogram or {}).items()):
+                    for bound, count in zip(METRIC_BUCKETS, counts):
+                        lines.append(f"{name}_bucket{self._labels(key, le=f'{bound:g}')} {self._number(count)}")
+                    lines.append(f"{name}_bucket{self._labels(key, le='+Inf')} {self._number(counts[-1])}")
+                    lines.append(f"{name}_sum{self._labels(key)} {counts[-2]:.6f}")
+                    lines.append(f"{name}_count{self._labels(key)} {self._number(counts[-1])}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _labels(key: Tuple[Tuple[str, str], ...], le: str = "") -> str:
+        pairs = list(key) + ([("le", le)] if le else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(
+            f'{label}="{ResolverMetrics._escape(value)}"' for label, value in pairs
+        ) + "}"
+
+    @staticmethod
+    def _number(value: float) -> str:
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        BaseAgent.write_atomic(path, self.render().encode("utf-8"))
+
+    def serve(self, host: str, port: int) -> http.server.ThreadingHTTPServer:
+        """Serve ``/metrics`` from a daemon thread; returns the running server."""
+        import http.server  # only --metrics-port needs it; keeps agent import cheap
+
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802 - http.server API
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="lint-resolver-metrics", daemon=True).start()
+        return server
+
+
+class ResolverIndex:
+    """
+    Resolver patterns and rules compiled once for fast selection.
+
+    Patterns follow gitignore conventions: one without ``/`` matches the
+    basename at any depth, one with ``/`` is anchored at the repo root and
+    ``**`` spans directories (``fswatch.compile_glob``, dot names included).
+    Resolvers are bucketed by the file extensions their patterns can match,
+    so a lookup only tries plausible resolvers; ``select`` results are
+    memoized per ``(path, rule)``.
+    """
+
+    def __init__(self, resolvers: Sequence[Dict[str, object]]) -> None:
+        self.resolvers = list(resolvers)
+        self._order = {id(resolver): order for order, resolver in enumerate(self.resolvers)}
+        # Per resolver: None matches every path, otherwise (basename_only, regex) pairs.
+        self._patterns: List[Optional[List[Tuple[bool, Pattern[str]]]]] = []
+        self._rules: List[Optional[Pattern[str]]] = []
+        buckets: Dict[str, Set[int]] = {}
+        unbucketed: Set[int] = set()
+
+        for order, resolver in enumerate(self.resolvers):
+            patterns = resolver.get("patterns")
+            if not patterns:
+                self._patterns.append(None)
+                unbucketed.add(order)
+            else:
+                compiled: List[Tuple[bool, Pattern[str]]] = []
+                for pattern in patterns if isinstance(patterns, list) else []:
+                    if not isinstance(pattern, str) or not pattern.strip("/"):
+                        continue
+                    compiled.append(self._compile_pattern(pattern))
+                    extension = self._literal_extension(pattern)
+                    if extension is None:
+                        unbucketed.add(order)
+                    else:
+                        buckets.setdefault(extension, set()).add(order)
+                self._patterns.append(compiled)
+
+            rules = resolver.get("rules")
+            globs = [rule for rule in rules if isinstance(rule, str)] if isinstance(rules, list) else []
+            if rules and globs:
+                self._rules.append(
+                    re.compile("|".join(f"(?:{fnmatch.translate(rule)})" for rule in globs))
+                )
+            elif rules:
+                self._rules.append(re.compile(r"(?!)"))
+            else:
+                self._rules.append(None)
+
+        self._unbucketed = sorted(unbucketed)
+        self._buckets = {
+            extension: sorted(orders | unbucketed) for extension, orders in buckets.items()
+        }
+        self.select = functools.lru_cache(maxsize=SELECT_CACHE_SIZE)(self._select)
+
+    @staticmethod
+    def _compile_pattern(pattern: str) -> Tuple[bool, Pattern[str]]:
+        if pattern.endswith("/"):
+            pattern += "**"
+        if "/" not in pattern:
+            return True, fswatch.compile_glob(pattern, match_hidden=True)
+        return False, fswatch.compile_glob(pattern.lstrip("/"), match_hidden=True)
+
+    @staticmethod
+    def _literal_extension(pattern: str) -> Optional[str]:
+        """Extension every match must have (``*.py`` -> ``py``), or ``None``."""
+        tail = re.split(r"[*?\[\]]", pattern.rsplit("/", 1)[-1])[-1]
+        if "." not in tail:
+            return None
+        return tail.rsplit(".", 1)[1] or None
+
+    def _select(self, relative_path: str, rule: Optional[str]) -> Optional[Dict[str, object]]:
+        name = relative_path.rpartition("/")[2]
+        _, dot, extension = name.rpartition(".")
+        candidates = self._buckets.get(extension, self._unbucketed) if dot else self._unbucketed
+        for order in candidates:
+            if not self._path_matches(order, relative_path, name):
+                continue
+            rules = self._rules[order]
+            if rule and rules is not None and not rules.match(rule):
+                continue
+            return self.resolvers[order]
+        return None
+
+    def matches(self, resolver: Mapping[str, object], relative_path: str) -> bool:
+        """True if ``resolver``'s patterns accept ``relative_path`` (rules ignored)."""
+        order = self._order.get(id(resolver))
+        if order is None:
+            return False
+        return self._path_matches(order, relative_path, relative_path.rpartition("/")[2])
+
+    def _path_matches(self, order: int, relative_path: str, name: str) -> bool:
+        compiled = self._patterns[order]
+        if compiled is None:
+            return True
+        return any(
+            regex.match(name if basename_only else relative_path)
+            for basename_only, regex in compiled
+        )
+
+
+def iter_json_objects(chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield JSON objects from text arriving in ``chunks`` as soon as each is complete.
+
+    Accepts a top-level array of objects (``ruff --format json``) as well as
+    whitespace or line delimited objects (JSON lines). Raises ``ValueError``
+    on anything else or when the input ends inside an object.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    chunks = iter(chunks)
+    exhausted = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+            pos += 1
+        if pos < len(buffer):
+            if buffer[pos] != "{":
+                raise ValueError(f"unexpected {buffer[pos]!r} in JSON diagnostics")
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as exc:
+                if exhausted:
+                    raise ValueError(f"malformed JSON diagnostics: {exc}") from exc
+            else:
+                yield item
+                continue
+        elif exhausted:
+            return
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            continue
+        buffer = buffer[pos:] + chunk
+        pos = 0
 
 
+# Cached passes and --watch hand ruff explicit file lists, which it lints even
+# when its configured excludes (or .gitignore) cover them; --force-exclude
+# keeps the result independent of how many candidates a pass has.
 DEFAULT_RESOLVERS = [
     {
         "id": "python-ruff",
@@ -46,30 +490,68 @@ DEFAULT_RESOLVERS = [
         ],
         "diagnostics": [
             [
-                ["uv", "run", "ruff", "check", "--exit-zero", "--format", "json"],
-                ["ruff", "check", "--exit-zero", "--format", "json"],
+                ["uv", "run", "ruff", "check", "--force-exclude", "--exit-zero", "--format", "json"],
+                ["ruff", "check", "--force-exclude", "--exit-zero", "--format", "json"],
             ],
         ],
         "commands": [
             [
-                ["uv", "run", "ruff", "check", "--fix", "{file}"],
-                ["ruff", "check", "--fix", "{file}"],
+                ["uv", "run", "ruff", "check", "--force-exclude", "--fix", "{file}"],
+                ["ruff", "check", "--force-exclude", "--fix", "{file}"],
             ],
             [
-                ["uv", "run", "ruff", "format", "{file}"],
-                ["ruff", "format", "{file}"],
+                ["uv", "run", "ruff", "format", "--force-exclude", "{file}"],
+                ["ruff", "format", "--force-exclude", "{file}"],
             ],
         ],
         "verify": [
             [
-                ["uv", "run", "ruff", "check", "{file}"],
-                ["ruff", "check", "{file}"],
+                ["uv", "run", "ruff", "check", "--force-exclude", "{file}"],
+                ["ruff", "check", "--force-exclude", "{file}"],
+            ],
+        ],
+        "batch_commands": [
+            [
+                ["uv", "run", "ruff", "check", "--force-exclude", "--fix", "{files}"],
+                ["ruff", "check", "--force-exclude", "--fix", "{files}"],
+            ],
+            [
+                ["uv", "run", "ruff", "format", "--force-exclude", "{files}"],
+                ["ruff", "format", "--force-exclude", "{files}"],
+            ],
+        ],
+        "batch_verify": [
+            [
+                ["uv", "run", "ruff", "check", "--force-exclude", "--exit-zero", "--format", "json", "{files}"],
+                ["ruff", "check", "--force-exclude", "--exit-zero", "--format", "json", "{files}"],
+            ],
+        ],
+        "version": [
+            [
+                ["uv", "run", "ruff", "--version"],
+                ["ruff", "--version"],
             ],
         ],
     },
 ]
 
 
+class FixResult(NamedTuple):
+    """Outcome of fixing one file."""
+
+    error: Optional[str]  # None when the fix commands succeeded
+    verified: bool  # a verify or diagnostics run confirmed the file is clean
+
+
+class DirectoryListing(NamedTuple):
+    """One directory as seen by ``LintResolverAgent._candidate_files``."""
+
+    mtime: Optional[int]  # None while too recent to trust (RACY_MTIME_NS)
+    files: List[str]  # repo-relative paths
+    dirs: List[str]  # names of subdirectories (symlinks excluded)
+    matches: Dict[int, List[str]]  # id(resolver) -> files it handles
+
+
 class LintResolverAgent(BaseAgent):
     """Resolve lint warnings by running language aware fixers."""
 
@@ -79,6 +561,39 @@ class LintResolverAgent(BaseAgent):
         self.infra_root = self._detect_infra_root(config)
         self.changelog_path = self.infra_root / "server-changelog.md"
         self.resolvers = self._load_resolvers(config)
+        self.resolver_index = ResolverIndex(self.resolvers)
+        exclude = config.get("watch_exclude")
+        self.watch_exclude = set(exclude if isinstance(exclude, list) else DEFAULT_WATCH_EXCLUDE)
+        # (mtime_ns, size) of files right after this agent fixed them, so the
+        # watcher does not re-diagnose its own writes.
+        self._settled: Dict[str, Tuple[int, int]] = {}
+        self.jobs = self._default_jobs(config.get("jobs"))
+        self.batch_size = self._batch_size(config.get("batch_size", DEFAULT_BATCH_SIZE))
+        base_ref = config.get("base_ref")
+        self.base_ref = base_ref if isinstance(base_ref, str) and base_ref else None
+        full_scan_every = config.get("full_scan_every", 0)
+        self.full_scan_every = full_scan_every if isinstance(full_scan_every, int) else 0
+        self.metrics = ResolverMetrics()
+        metrics_file = config.get("metrics_file")
+        self.metrics_path: Optional[Path] = (
+            self._expand_path(metrics_file) if isinstance(metrics_file, str) and metrics_file else None
+        )
+        metrics_port = config.get("metrics_port")
+        self.metrics_port = metrics_port if isinstance(metrics_port, int) else 0
+        self.metrics_host = str(config.get("metrics_host", "127.0.0.1"))
+        cache_setting = config.get("cache_file", ".state/lint-resolver-cache.json")
+        self.cache_path = self._expand_path(str(cache_setting))
+        self.cache: Optional[ResolverCache] = None
+        # id(resolver) -> version command output, queried once per process.
+        self._resolver_versions: Dict[int, str] = {}
+        # Resolved command groups: id(group) -> (group, chosen index, candidates).
+        # A chosen index of -1 means the executable depends on the context.
+        self._resolved_groups: Dict[int, Tuple[object, Optional[int], List[Sequence[object]]]] = {}
+        self._available: Dict[str, bool] = {}
+        self._command_token: Tuple[str, Optional[int]] | None = None
+        # Directory -> listing for _candidate_files; an unchanged directory
+        # costs one stat per pass.
+        self._listings: Dict[str, DirectoryListing] = {}
 
     # ---------------------------------------------------------------- argument
     def build_arg_parser(self) -> argparse.ArgumentParser:
@@ -108,37 +623,118 @@ class LintResolverAgent(BaseAgent):
         parser.add_argument(
             "--watch",
             action="store_true",
-            help="Continuously monitor lint diagnostics and resolve issues.",
+            help="Resolve issues in files as they change (inotify, polling fallback).",
         )
         parser.add_argument(
             "--interval",
             type=float,
             default=5.0,
-            help="Polling interval (seconds) while running with --watch.",
+            help="Stat polling interval (seconds) for --watch when inotify is unavailable.",
+        )
+        parser.add_argument(
+            "--debounce",
+            type=float,
+            default=0.5,
+            help="Quiet period (seconds) that ends a burst of changes before a --watch pass.",
         )
         parser.add_argument(
             "--max-iterations",
             type=int,
-            help="Optional iteration cap for --watch (omit for infinite).",
+            help="Optional cap on --watch passes (omit for infinite).",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Ignore and do not update the clean-file cache.",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=self.jobs,
+            help="Files (or batch chunks) fixed concurrently per pass; 0 uses every core.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=self.batch_size,
+            help="Files per batch fix started while diagnostics are still streaming.",
+        )
+        parser.add_argument(
+            "--changed",
+            action="store_true",
+            help="Diagnose only files git reports as changed (staged, unstaged, untracked).",
+        )
+        parser.add_argument(
+            "--base-ref",
+            default=self.base_ref,
+            help="With --changed, also diagnose files that differ from this ref's merge base.",
+        )
+        parser.add_argument(
+            "--full-scan-every",
+            type=int,
+            default=self.full_scan_every,
+            help="With --watch, make every Nth pass a full-tree scan (0 disables).",
+        )
+        parser.add_argument(
+            "--metrics-file",
+            default=str(self.metrics_path) if self.metrics_path else None,
+            help="Write Prometheus text metrics here after every pass (e.g. a node exporter textfile dir).",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            default=self.metrics_port,
+            help="With --watch, serve Prometheus metrics on this port at /metrics (0 disables).",
         )
         return parser
 
     # ----------------------------------------------------------------- runtime
     def handle(self, parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+        self.jobs = self._default_jobs(args.jobs)
+        self.batch_size = self._batch_size(args.batch_size)
+        self.metrics_path = self._expand_path(args.metrics_file) if args.metrics_file else None
+        self._refresh_command_cache()
         if args.list_resolvers:
             self._print_resolvers()
             return 0
 
+        if not args.no_cache and not args.dry_run:
+            self.cache = ResolverCache(
+                self.cache_path,
+                max_entries=int(self.config.get("cache_max_entries", DEFAULT_CACHE_MAX_ENTRIES)),
+                max_age_days=float(
+                    self.config.get("cache_max_age_days", DEFAULT_CACHE_MAX_AGE_DAYS)
+                ),
+            )
+
+        changed: Optional[List[str]] = None
+        if args.changed:
+            changed = self._changed_paths(args.base_ref)
+            if changed is not None and not changed and not args.watch:
+                print("No changed files to diagnose.")
+                return 0
+
         if args.watch:
+            if args.metrics_port:
+                self.metrics.serve(self.metrics_host, args.metrics_port)
             self._run_watch_loop(
                 interval=max(args.interval, 0.1),
+                debounce=max(args.debounce, 0.0),
                 max_iterations=args.max_iterations,
+                full_scan_every=max(args.full_scan_every, 0),
+                initial_paths=changed,
                 dry_run=args.dry_run,
             )
             return 0
 
+        if args.changed:
+            self._process_all_resolvers(dry_run=args.dry_run, paths=changed)
+            return 0
+
         if not args.file:
-            parser.error("--file is required unless --list-resolvers is used or --watch is enabled")
+            parser.error(
+                "--file is required unless --list-resolvers, --changed or --watch is used"
+            )
 
         target_path = self._resolve_target_path(args.file)
         if not target_path.exists():
@@ -161,9 +757,23 @@ class LintResolverAgent(BaseAgent):
             "infra_root": str(self.infra_root),
         }
 
+        resolver_id = str(resolver.get("id", "<unknown>"))
+        if self.cache is not None:
+            clean = self.cache.is_clean(self._resolver_key(resolver), str(target_path))
+            self.metrics.inc(
+                "lint_resolver_cache_lookups_total",
+                {"resolver": resolver_id, "result": "hit" if clean else "miss"},
+            )
+            if clean:
+                print(f"{relative} unchanged since it last passed {resolver_id}")
+                self._publish_metrics()
+                return 0
+
         try:
-            self._run_resolver(resolver, context, dry_run=args.dry_run)
+            verified = self._run_resolver(resolver, context, dry_run=args.dry_run)
         except RuntimeError as exc:
+            self.metrics.inc("lint_resolver_files_total", {"resolver": resolver_id, "outcome": "failed"})
+            self._publish_metrics()
             self._log_event(
                 relative,
                 resolver.get("id", "<unknown>"),
@@ -172,6 +782,11 @@ class LintResolverAgent(BaseAgent):
             )
             parser.exit(1)
 
+        self.metrics.inc("lint_resolver_files_total", {"resolver": resolver_id, "outcome": "fixed"})
+        self._publish_metrics()
+        if self.cache is not None and verified:
+            self.cache.mark_clean(self._resolver_key(resolver), str(target_path))
+            self.cache.save()
         self._log_event(
             relative,
             resolver.get("id", "<unknown>"),
@@ -202,6 +817,155 @@ class LintResolverAgent(BaseAgent):
             return path.resolve()
         return (self.repo_root / path).resolve()
 
+    @staticmethod
+    def _default_jobs(value: object) -> int:
+        if isinstance(value, int) and value > 0:
+            return value
+        if value == 0:
+            return os.cpu_count() or 1
+        return 1
+
+    def _resolver_key(self, resolver: Mapping[str, object]) -> str:
+        """
+        Resolver ID plus a digest of its definition, tool version output and
+        linter configuration.
+
+        The version command (``version`` group) runs once per process. The
+        mtime and size of the configuration files (``config_files``, default
+        ``DEFAULT_CONFIG_FILES``) are read on every call, so edits made while
+        ``--watch`` runs count too. Cache entries recorded under another tool
+        version, configuration or resolver definition simply stop matching.
+        """
+        definition = json.dumps(resolver, sort_keys=True, default=str)
+        digest = hashlib.sha1(
+            "\0".join(
+                (definition, self._resolver_version(resolver), self._config_signature(resolver))
+            ).encode("utf-8")
+        )
+        return f"{resolver.get('id', '<unnamed>')}@{digest.hexdigest()[:12]}"
+
+    def _resolver_version(self, resolver: Mapping[str, object]) -> str:
+        version = self._resolver_versions.get(id(resolver))
+        if version is not None:
+            return version
+        version = ""
+        for group in resolver.get("version") or []:
+            cmd = self._pick_command(group, {"repo_root": str(self.repo_root)})
+            if cmd is None:
+                continue
+            try:
+                version = self._run_command(
+                    cmd,
+                    os.environ.copy(),
+                    capture_output=True,
+                    dry_run=False,
+                    metric=(str(resolver.get("id", "<unnamed>")), "version"),
+                ) or ""
+            except (RuntimeError, OSError):
+                continue
+            break
+        version = version.strip()
+        self._resolver_versions[id(resolver)] = version
+        return version
+
+    def _config_signature(self, resolver: Mapping[str, object]) -> str:
+        """``name:mtime_ns:size`` of each existing linter configuration file."""
+        names = resolver.get("config_files")
+        if not isinstance(names, list):
+            names = DEFAULT_CONFIG_FILES
+        parts = []
+        for name in names:
+            try:
+                stat = (self.repo_root / str(name)).stat()
+            except OSError:
+                continue
+            parts.append(f"{name}:{stat.st_mtime_ns}:{stat.st_size}")
+        return "\n".join(parts)
+
+    def _candidate_files(
+        self,
+        resolver: Mapping[str, object],
+        paths: Optional[Sequence[str]],
+    ) -> List[str]:
+        """Repo-relative files under ``paths`` (or the repo) that ``resolver`` handles."""
+        found: List[str] = []
+        roots = [self.repo_root / path for path in paths] if paths is not None else [self.repo_root]
+        for root in roots:
+            if root.is_file():
+                relative = root.relative_to(self.repo_root).as_posix()
+                if self._resolver_matches(resolver, relative):
+                    found.append(relative)
+                continue
+            for listing in self._walk_listings(root):
+                matched = listing.matches.get(id(resolver))
+                if matched is None:
+                    matched = listing.matches[id(resolver)] = [
+                        relative for relative in listing.files
+                        if self._resolver_matches(resolver, relative)
+                    ]
+                found.extend(matched)
+        return found
+
+    def _walk_listings(self, root: Path) -> Iterator[DirectoryListing]:
+        """
+        Listings of ``root`` and its subdirectories, skipping ``watch_exclude``
+        and not following directory symlinks (like ``os.walk``).
+
+        Listings, and the files each resolver handles in them, are reused
+        while a directory's mtime is unchanged, so every unscoped pass (each
+        ``--watch`` iteration) after the first costs one ``stat`` per
+        directory instead of a full walk.
+        """
+        visited: Set[str] = set()
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            listing = self._list_directory(directory)
+            if listing is None:
+                continue
+            visited.add(str(directory))
+            yield listing
+            stack.extend(directory / name for name in listing.dirs if name not in self.watch_exclude)
+        if root == self.repo_root:
+            for stale in set(self._listings) - visited:
+                del self._listings[stale]
+
+    def _list_directory(self, directory: Path) -> Optional[DirectoryListing]:
+        key = str(directory)
+        try:
+            mtime = os.stat(key).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._listings.get(key)
+        if cached is not None and cached.mtime == mtime:
+            return cached
+        base = directory.relative_to(self.repo_root).as_posix()
+        prefix = "" if base == "." else base + "/"
+        files: List[str] = []
+        dirs: List[str] = []
+        try:
+            with os.scandir(key) as entries:
+                for entry in entries:
+                    try:
+                        if not entry.is_dir():
+                            files.append(prefix + entry.name)
+                        elif not entry.is_symlink():
+                            dirs.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+        racy = time.time_ns() - mtime < RACY_MTIME_NS
+        listing = DirectoryListing(None if racy else mtime, sorted(files), sorted(dirs), {})
+        self._listings[key] = listing
+        return listing
+
+    @staticmethod
+    def _batch_size(value: object) -> int:
+        if isinstance(value, int) and value > 0:
+            return min(value, MAX_BATCH_FILES)
+        return DEFAULT_BATCH_SIZE
+
     def _load_resolvers(self, config: Mapping[str, object]) -> List[Dict[str, object]]:
         custom = config.get("resolvers")
         if isinstance(custom, list) and custom:
@@ -217,6 +981,24 @@ class LintResolverAgent(BaseAgent):
             print(f"  patterns: {patterns!r}")
             if rules:
                 print(f"  rules: {rules!r}")
+            for section in (
+                "diagnostics", "commands", "verify", "batch_commands", "batch_verify", "version"
+            ):
+                groups = resolver.get(section) or []
+                for index, group in enumerate(groups):
+                    label = section if len(groups) == 1 else f"{section}[{index}]"
+                    print(f"  {label}: {self._describe_group(group)}")
+
+    def _describe_group(self, group: object) -> str:
+        choice, candidates = self._resolve_group(group)
+        if choice is None:
+            return "unavailable"
+        if choice < 0:
+            return "resolved per invocation"
+        command = " ".join(str(part) for part in candidates[choice])
+        if choice == 0:
+            return command
+        return f"{command} (fallback {choice + 1} of {len(candidates)})"
 
     def _resolve_target_path(self, value: str) -> Path:
         candidate = Path(value)
@@ -227,33 +1009,10 @@ class LintResolverAgent(BaseAgent):
     def _select_resolver(
         self, relative_path: str, rule: str | None
     ) -> Dict[str, object] | None:
-        for resolver in self.resolvers:
-            patterns = resolver.get("patterns")
-            if patterns and not self._matches_patterns(relative_path, patterns):
-                continue
+        return self.resolver_index.select(relative_path, rule or None)
 
-            rules = resolver.get("rules")
-            if rule and rules:
-                if not any(self._matches_rule(rule, candidate) for candidate in rules):
-                    continue
-
-            return resolver
-        return None
-
-    @staticmethod
-    def _matches_patterns(path: str, patterns: Iterable[object]) -> bool:
-        for pattern in patterns:
-            if not isinstance(pattern, str):
-                continue
-            if fnmatch.fnmatch(path, pattern):
-                return True
-        return False
-
-    @staticmethod
-    def _matches_rule(rule: str, candidate: object) -> bool:
-        if isinstance(candidate, str):
-            return fnmatch.fnmatch(rule, candidate)
-        return False
+    def _resolver_matches(self, resolver: Mapping[str, object], relative_path: str) -> bool:
+        return self.resolver_index.matches(resolver, relative_path)
 
     def _run_resolver(
         self,
@@ -261,26 +1020,31 @@ class LintResolverAgent(BaseAgent):
         context: Dict[str, str],
         *,
         dry_run: bool,
-    ) -> None:
+    ) -> bool:
+        """Run the fix commands, then verify; return whether a verify command ran."""
         commands = resolver.get("commands") or []
         if not isinstance(commands, list) or not commands:
             raise RuntimeError("resolver has no commands configured")
 
         environment = self._build_environment(resolver.get("env"), context)
+        resolver_id = str(resolver.get("id", "<unknown>"))
 
         for group in commands:
             cmd = self._pick_command(group, context)
             if cmd is None:
                 raise RuntimeError("no available command for resolver")
-            self._execute(cmd, environment, dry_run=dry_run)
+            self._execute(cmd, environment, dry_run=dry_run, metric=(resolver_id, "fix"))
 
+        verified = False
         verify_groups = resolver.get("verify") or []
         if isinstance(verify_groups, list) and verify_groups:
             for group in verify_groups:
                 cmd = self._pick_command(group, context)
                 if cmd is None:
                     continue
-                self._execute(cmd, environment, dry_run=dry_run)
+                self._execute(cmd, environment, dry_run=dry_run, metric=(resolver_id, "verify"))
+                verified = not dry_run
+        return verified
 
     def _build_environment(
         self,
@@ -300,32 +1064,97 @@ class LintResolverAgent(BaseAgent):
         self,
         group: object,
         context: Dict[str, str],
+        files: Optional[Sequence[str]] = None,
     ) -> List[str] | None:
-        candidates: List[List[str]] = []
+        """
+        Return the first available candidate of ``group``, formatted.
+
+        With ``files`` (batch commands), an argument that is exactly
+        ``{files}`` expands to one argument per file. Only the chosen
+        candidate is formatted; the choice is memoized (``_resolve_group``).
+        """
+        choice, candidates = self._resolve_group(group)
+        if choice is None:
+            return None
+        if choice >= 0:
+            return self._format_argv(candidates[choice], context, files)
 
+        for entry in candidates:
+            if self._command_available(str(entry[0]).format_map(context)):
+                return self._format_argv(entry, context, files)
+        return None
+
+    def _resolve_group(self, group: object) -> Tuple[Optional[int], List[Sequence[object]]]:
+        """
+        Return ``(index of the first available candidate, candidates)``.
+
+        The index is ``None`` when no candidate is available and ``-1`` when
+        an executable contains a placeholder, so availability can only be
+        decided per invocation. Memoized per group until ``PATH`` or the
+        registry changes (``_refresh_command_cache``).
+        """
+        cached = self._resolved_groups.get(id(group))
+        if cached is not None and cached[0] is group:
+            return cached[1], cached[2]
+
+        candidates: List[Sequence[object]] = []
         if isinstance(group, list):
             if group and all(isinstance(item, str) for item in group):
-                candidates.append([item.format_map(context) for item in group])
+                candidates.append(group)
             else:
-                for entry in group:
-                    if isinstance(entry, list) and entry:
-                        formatted = [part.format_map(context) for part in entry]
-                        candidates.append(formatted)
+                candidates.extend(
+                    entry for entry in group if isinstance(entry, list) and entry
+                )
         elif isinstance(group, tuple):
-            for entry in group:
-                if isinstance(entry, (list, tuple)):
-                    formatted = [str(part).format_map(context) for part in entry]
-                    candidates.append(formatted)
+            candidates.extend(
+                entry for entry in group if isinstance(entry, (list, tuple)) and entry
+            )
 
-        for candidate in candidates:
-            if not candidate:
-                continue
-            command = candidate
-            if self._command_available(command[0]):
-                return command
-        return None
+        choice: Optional[int] = None
+        if any("{" in str(entry[0]) for entry in candidates):
+            choice = -1
+        else:
+            for index, entry in enumerate(candidates):
+                if self._command_available(str(entry[0])):
+                    choice = index
+                    break
+        self._resolved_groups[id(group)] = (group, choice, candidates)
+        return choice, candidates
+
+    def _refresh_command_cache(self) -> None:
+        """Drop resolved commands when ``PATH`` or the registry file changed."""
+        try:
+            registry_mtime: Optional[int] = REGISTRY_PATH.stat().st_mtime_ns
+        except OSError:
+            registry_mtime = None
+        token = (os.environ.get("PATH", ""), registry_mtime)
+        if token != self._command_token:
+            self._command_token = token
+            self._resolved_groups.clear()
+            self._available.clear()
+
+    @staticmethod
+    def _format_argv(
+        entry: Iterable[object],
+        context: Dict[str, str],
+        files: Optional[Sequence[str]],
+    ) -> List[str]:
+        argv: List[str] = []
+        for part in entry:
+            if files is not None and part == "{files}":
+                argv.extend(files)
+            else:
+                argv.append(str(part).format_map(context))
+        return argv
 
     def _command_available(self, executable: str) -> bool:
+        available = self._available.get(executable)
+        if available is None:
+            available = self._probe_executable(executable)
+            self._available[executable] = available
+        return available
+
+    def _probe_executable(self, executable: str) -> bool:
         if os.path.isabs(executable):
             return os.access(executable, os.X_OK)
 
@@ -341,16 +1170,19 @@ class LintResolverAgent(BaseAgent):
         environment: Mapping[str, str],
         *,
         dry_run: bool,
+        metric: Tuple[str, str] = ("<unknown>", "other"),
     ) -> None:
         if dry_run:
             print("DRY RUN:", " ".join(command))
             return
+        started = time.monotonic()
         result = subprocess.run(
             command,
             cwd=self.repo_root,
             env=environment,
             check=False,
         )
+        self._record_spawn(metric, time.monotonic() - started)
         if result.returncode != 0:
             raise RuntimeError(
                 f"command '{' '.join(command)}' failed with code {result.returncode}"
@@ -370,133 +1202,598 @@ class LintResolverAgent(BaseAgent):
             f"{timestamp} - lint-resolver-agent - "
             f"{relative_file} -> {resolver_id} -> {status}{rule_fragment}"
         )
-        self.changelog_path.parent.mkdir(parents=True, exist_ok=True)
-        with self.changelog_path.open("a", encoding="utf-8") as handle:
-            handle.write(entry + "\n")
+        self.changelog().append(entry)
 
     # ----------------------------------------------------------------- watch mode
     def _run_watch_loop(
         self,
         *,
         interval: float,
+        debounce: float,
         max_iterations: int | None,
+        full_scan_every: int = 0,
+        initial_paths: Optional[Sequence[str]] = None,
         dry_run: bool,
     ) -> None:
+        """
+        Diagnose the whole tree (or ``initial_paths``) once, then only files
+        reported by the watcher.
+
+        Relevant changes (see ``_watch_targets``) arriving within ``debounce``
+        seconds of each other are merged into one pass, for at most
+        ``MAX_DEBOUNCE_FACTOR`` debounce periods; other events never extend
+        the window. Between bursts the loop blocks in the watcher, so an idle
+        tree costs no diagnostics runs at all. With ``full_scan_every`` every
+        Nth pass diagnoses the whole tree regardless.
+        """
+        roots = [(self.repo_root, True)]
+        watcher = fswatch.create_watcher(
+            roots,
+            exclude=self._watch_excluded,
+            poll_interval=interval,
+        )
         iteration = 0
+        # Watch mode runs indefinitely; do not hold entries until exit.
+        changelog = self.changelog()
+        changelog.start_flusher()
         try:
-            while True:
-                updates = self._process_all_resolvers(dry_run=dry_run)
-                iteration += 1
-
-                if max_iterations is not None and iteration >= max_iterations:
-                    break
+            self._process_all_resolvers(dry_run=dry_run, paths=initial_paths)
+            iteration += 1
+            while max_iterations is None or iteration < max_iterations:
+                changed = watcher.poll(timeout=60.0)
+                if watcher.failure is not None:
+                    watcher = fswatch.recover_watcher(
+                        watcher, roots, exclude=self._watch_excluded, poll_interval=interval
+                    )
+                    changed = {self.repo_root}  # events may have been lost
+                if not changed:
+                    continue
 
-                if not updates:
-                    time.sleep(interval)
+                targets = self._watch_targets(changed)
+                if full_scan_every and iteration % full_scan_every == 0:
+                    targets = None
+                elif targets is not None and not targets:
+                    continue
+                targets = self._debounce_targets(watcher, targets, debounce)
+                self._process_all_resolvers(dry_run=dry_run, paths=targets)
+                iteration += 1
         except KeyboardInterrupt:
             pass
+        finally:
+            watcher.close()
+            changelog.stop_flusher()
 
-    def _process_all_resolvers(self, *, dry_run: bool) -> bool:
-        any_updates = False
-        for resolver in self.resolvers:
-            issues = self._collect_issues_for_resolver(resolver, dry_run=dry_run)
-            if not issues:
+    def _debounce_targets(
+        self,
+        watcher: "fswatch.Watcher",
+        targets: Optional[List[str]],
+        debounce: float,
+    ) -> Optional[List[str]]:
+        """
+        Merge relevant changes into ``targets`` until ``debounce`` seconds
+        pass without one, or ``MAX_DEBOUNCE_FACTOR * debounce`` in total.
+        """
+        if debounce <= 0 or targets is None:
+            return targets
+        merged = set(targets)
+        now = time.monotonic()
+        quiet_at = now + debounce
+        deadline = now + debounce * MAX_DEBOUNCE_FACTOR
+        while now < quiet_at and now < deadline:
+            more = self._watch_targets(watcher.poll(timeout=min(quiet_at, deadline) - now))
+            now = time.monotonic()
+            if more is None:
+                return None
+            if more:
+                merged.update(more)
+                if len(merged) > MAX_TARGETED_PATHS:
+                    return None
+                quiet_at = now + debounce
+        return sorted(merged)
+
+    def _watch_excluded(self, name: str) -> bool:
+        return name in self.watch_exclude
+
+    # ----------------------------------------------------------------- git scope
+    def _changed_paths(self, base_ref: Optional[str]) -> Optional[List[str]]:
+        """
+        Existing files git reports as changed, relative to the repo root.
+
+        Covers staged, unstaged and untracked files, plus everything that
+        differs from the merge base of ``base_ref`` and ``HEAD``. ``None``
+        asks for a full-tree pass: git cannot answer, or the set is too large
+        to hand to the linter.
+        """
+        names: Set[str] = set()
+        try:
+            toplevel = Path(self._git("rev-parse", "--show-toplevel").strip()).resolve()
+            # "XY path" entries; renames and copies are followed by the source.
+            entries = iter(self._git("status", "--porcelain", "-z", "--untracked-files=all").split("\0"))
+            for entry in entries:
+                if len(entry) < 4:
+                    continue
+                names.add(entry[3:])
+                if entry[0] in "RC":
+                    next(entries, None)
+            if base_ref:
+                merge_base = self._git("merge-base", base_ref, "HEAD").strip()
+                diff = self._git("diff", "--name-only", "-z", merge_base, "--")
+                names.update(name for name in diff.split("\0") if name)
+        except RuntimeError as exc:
+            print(f"lint-resolver-agent: {exc}; diagnosing the whole tree", file=sys.stderr)
+            return None
+
+        changed: List[str] = []
+        for name in names:
+            path = toplevel / name
+            try:
+                relative = path.relative_to(self.repo_root)
+            except ValueError:
                 continue
+            if any(part in self.watch_exclude for part in relative.parts):
+                continue
+            if path.is_file():
+                changed.append(relative.as_posix())
+        if len(changed) > MAX_CHANGED_PATHS:
+            return None
+        return sorted(changed)
 
-            processed_files: set[str] = set()
-            for issue in issues:
-                relative = issue["relative"]
-                if relative in processed_files:
-                    continue
+    def _git(self, *args: str) -> str:
+        try:
+            result = subprocess.run(
+                ["git", *args],
+                cwd=self.repo_root,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+        except OSError as exc:
+            raise RuntimeError(f"git unavailable: {exc}") from exc
+        if result.returncode != 0:
+            raise RuntimeError(f"'git {' '.join(args)}' failed: {result.stderr.strip()}")
+        return result.stdout
+
+    def _watch_targets(self, changed: Iterable[Path]) -> Optional[List[str]]:
+        """
+        Map watcher events to repo-relative paths worth diagnosing.
+
+        Files are kept when some resolver pattern matches them and their
+        content changed since this agent last touched them; directories (new
+        subtrees, event overflow) are passed through whole. ``None`` asks for
+        a full-tree pass when too many paths changed at once.
+        """
+        targets: Set[str] = set()
+        for path in changed:
+            try:
+                relative_parts = path.relative_to(self.repo_root).parts
+            except ValueError:
+                continue
+            if any(part in self.watch_exclude for part in relative_parts):
+                continue
+            relative = "/".join(relative_parts)
+            if path.is_dir():
+                if relative:
+                    targets.add(relative)
+                else:
+                    return None
+                continue
+            if not path.is_file() or self._select_resolver(relative, None) is None:
+                continue
+            if self._is_settled(path):
+                continue
+            targets.add(relative)
+        if len(targets) > MAX_TARGETED_PATHS:
+            return None
+        return sorted(targets)
 
-                selected = self._select_resolver(relative, issue.get("rule"))
-                if selected is None:
-                    continue
+    def _mark_settled(self, abs_path: str) -> None:
+        try:
+            stat = os.stat(abs_path)
+        except OSError:
+            return
+        self._settled[abs_path] = (stat.st_mtime_ns, stat.st_size)
 
-                context = {
-                    "file": relative,
-                    "abs_file": issue["abs_path"],
-                    "rule": issue.get("rule", ""),
-                    "message": issue.get("message", ""),
-                    "repo_root": str(self.repo_root),
-                    "infra_root": str(self.infra_root),
-                }
+    def _is_settled(self, path: Path) -> bool:
+        signature = self._settled.pop(str(path), None)
+        if signature is None:
+            return False
+        try:
+            stat = path.stat()
+        except OSError:
+            return False
+        return signature == (stat.st_mtime_ns, stat.st_size)
 
-                try:
-                    self._run_resolver(selected, context, dry_run=dry_run)
-                except RuntimeError as exc:
-                    self._log_event(
-                        relative,
-                        selected.get("id", "<unknown>"),
-                        status=f"failure: {exc}",
-                        rule=issue.get("rule"),
+    def _process_all_resolvers(
+        self,
+        *,
+        dry_run: bool,
+        paths: Optional[Sequence[str]] = None,
+    ) -> bool:
+        """
+        Diagnose and fix issues for every resolver.
+
+        ``paths`` (repo-relative files or directories) narrows diagnostics to
+        those paths instead of the whole tree.
+        """
+        self._refresh_command_cache()
+        started = time.monotonic()
+        self.metrics.set("lint_resolver_queue_depth_peak", {}, 0)
+        any_updates = False
+        for resolver in self.resolvers:
+            scope = paths
+            candidates: List[str] = []
+            resolver_id = str(resolver.get("id", "<unknown>"))
+            if self.cache is not None:
+                # Only diagnose files not known to be clean; hand the linter
+                # the explicit list unless it is too long for one argv.
+                resolver_key = self._resolver_key(resolver)
+                handled = self._candidate_files(resolver, paths)
+                candidates = [
+                    relative
+                    for relative in handled
+                    if not self.cache.is_clean(resolver_key, str(self.repo_root / relative))
+                ]
+                self.metrics.inc(
+                    "lint_resolver_cache_lookups_total",
+                    {"resolver": resolver_id, "result": "hit"},
+                    len(handled) - len(candidates),
+                )
+                self.metrics.inc(
+                    "lint_resolver_cache_lookups_total",
+                    {"resolver": resolver_id, "result": "miss"},
+                    len(candidates),
+                )
+                if not candidates:
+                    continue
+                if len(candidates) <= MAX_TARGETED_PATHS:
+                    scope = candidates
+
+            # With a cache, diagnostics over a wider scope only count for
+            # the candidates; everything else is known clean.
+            wanted = set(candidates) if self.cache is not None and scope is not candidates else None
+            flagged: Set[str] = set()
+            complete = True
+
+            # Issues are dispatched while the linter is still reporting. A
+            # file lands in exactly one unit (its first issue selects the
+            # resolver) and the pool is drained before the next resolver
+            # diagnoses, so work on a file is never concurrent. Results are
+            # logged in submission order.
+            units: List[Tuple[Dict[str, object], List[Dict[str, Any]], Future]] = []
+            pending: Dict[int, Tuple[Dict[str, object], List[Dict[str, Any]]]] = {}
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+
+                def submit(selected: Dict[str, object], chunk: List[Dict[str, Any]]) -> None:
+                    run = self._run_batch if self._supports_batch(selected) else self._run_chains
+                    self.metrics.adjust(
+                        "lint_resolver_queue_depth", {}, 1, peak="lint_resolver_queue_depth_peak"
                     )
-                else:
-                    processed_files.add(relative)
-                    any_updates = True
+                    future = pool.submit(run, selected, chunk, dry_run=dry_run)
+                    future.add_done_callback(
+                        lambda _: self.metrics.adjust("lint_resolver_queue_depth", {}, -1)
+                    )
+                    units.append((selected, chunk, future))
+
+                try:
+                    for issue in self._iter_issues_for_resolver(resolver, paths=scope):
+                        relative = issue["relative"]
+                        if relative in flagged or (wanted is not None and relative not in wanted):
+                            continue
+                        flagged.add(relative)
+                        selected = self._select_resolver(relative, issue.get("rule"))
+                        if selected is None:
+                            continue
+                        if not self._supports_batch(selected):
+                            submit(selected, [issue])
+                            continue
+                        _, batch = pending.setdefault(id(selected), (selected, []))
+                        batch.append(issue)
+                        if len(batch) >= self.batch_size:
+                            submit(selected, pending.pop(id(selected))[1])
+                except RuntimeError:
+                    complete = False
+
+                # Whatever is left once the stream ends is spread over the pool.
+                for selected, batch in pending.values():
+                    size = max(1, min(self.batch_size, math.ceil(len(batch) / self.jobs)))
+                    for start in range(0, len(batch), size):
+                        submit(selected, batch[start:start + size])
+
+                for selected, chunk, future in units:
+                    files = {issue["relative"]: issue for issue in chunk}
+                    for relative, (error, verified) in future.result().items():
+                        issue = files[relative]
+                        self.metrics.inc(
+                            "lint_resolver_files_total",
+                            {
+                                "resolver": str(selected.get("id", "<unknown>")),
+                                "outcome": "fixed" if error is None else "failed",
+                            },
+                        )
+                        if error is not None:
+                            self._log_event(
+                                relative,
+                                selected.get("id", "<unknown>"),
+                                status=f"failure: {error}",
+                                rule=issue.get("rule"),
+                            )
+                        else:
+                            any_updates = True
+                            # Unverified fixes are diagnosed again next pass.
+                            if self.cache is not None and selected is resolver and verified:
+                                self.cache.mark_clean(resolver_key, issue["abs_path"])
+                        self._mark_settled(issue["abs_path"])
+
+            if dry_run and complete and not flagged:
+                print("No lint issues detected.")
+            # Candidates only count as clean if the linter finished cleanly.
+            if self.cache is not None and complete:
+                for relative in candidates:
+                    if relative not in flagged:
+                        self.cache.mark_clean(resolver_key, str(self.repo_root / relative))
+        if self.cache is not None:
+            self.cache.save()
+        self.metrics.inc("lint_resolver_passes_total", {})
+        self.metrics.observe("lint_resolver_pass_seconds", {}, time.monotonic() - started)
+        self.metrics.set("lint_resolver_last_pass_timestamp_seconds", {}, round(time.time(), 3))
+        self._publish_metrics()
         return any_updates
 
-    def _collect_issues_for_resolver(
+    def _record_spawn(self, metric: Tuple[str, str], seconds: float) -> None:
+        labels = {"resolver": metric[0], "phase": metric[1]}
+        self.metrics.inc("lint_resolver_process_spawns_total", labels)
+        self.metrics.observe("lint_resolver_phase_seconds", labels, seconds)
+
+    def _publish_metrics(self) -> None:
+        if self.metrics_path is None:
+            return
+        try:
+            self.metrics.write(self.metrics_path)
+        except OSError as exc:
+            print(f"lint-resolver-agent: cannot write metrics to {self.metrics_path}: {exc}", file=sys.stderr)
+
+    def _issue_context(self, issue: Mapping[str, Any]) -> Dict[str, str]:
+        return {
+            "file": issue["relative"],
+            "abs_file": issue["abs_path"],
+            "rule": issue.get("rule") or "",
+            "message": issue.get("message") or "",
+            "repo_root": str(self.repo_root),
+            "infra_root": str(self.infra_root),
+        }
+
+    def _run_single(
         self,
-        resolver: Dict[str, Any],
+        resolver: Dict[str, object],
+        issue: Mapping[str, Any],
+        *,
+        dry_run: bool,
+    ) -> FixResult:
+        """Run the per-file command chain."""
+        try:
+            verified = self._run_resolver(resolver, self._issue_context(issue), dry_run=dry_run)
+        except RuntimeError as exc:
+            return FixResult(str(exc), False)
+        return FixResult(None, verified)
+
+    def _run_chains(
+        self,
+        resolver: Dict[str, object],
+        issues: Sequence[Mapping[str, Any]],
         *,
         dry_run: bool,
-    ) -> List[Dict[str, Any]]:
+    ) -> Dict[str, FixResult]:
+        return {
+            issue["relative"]: self._run_single(resolver, issue, dry_run=dry_run)
+            for issue in issues
+        }
+
+    @staticmethod
+    def _supports_batch(resolver: Mapping[str, object]) -> bool:
+        batch = resolver.get("batch_commands")
+        return isinstance(batch, list) and bool(batch)
+
+    def _run_batch(
+        self,
+        resolver: Dict[str, object],
+        issues: Sequence[Mapping[str, Any]],
+        *,
+        dry_run: bool,
+    ) -> Dict[str, FixResult]:
+        """
+        Fix ``issues`` with the resolver's ``batch_commands`` (``{files}`` form).
+
+        Each command runs once for the whole chunk (callers keep chunks under
+        ``MAX_BATCH_FILES``). Per-file outcomes come from ``batch_verify``,
+        whose JSON diagnostics name the files that still have issues. When
+        there is no usable verify output and a batch command failed, the
+        chunk falls back to per-file chains so the failure is attributed to
+        the right files; without a failure the fixes stand but are not
+        verified, so the files are not cached as clean.
+        """
+        context = {"repo_root": str(self.repo_root), "infra_root": str(self.infra_root)}
+        environment = self._build_environment(resolver.get("env"), context)
+        files = [issue["relative"] for issue in issues]
+        resolver_id = str(resolver.get("id", "<unknown>"))
+
+        failed = False
+        for group in resolver.get("batch_commands") or []:
+            cmd = self._pick_command(group, context, files=files)
+            if cmd is None:
+                return {name: FixResult("no available command for resolver", False) for name in files}
+            try:
+                self._execute(cmd, environment, dry_run=dry_run, metric=(resolver_id, "batch_fix"))
+            except RuntimeError:
+                # Linters exit non-zero when unfixable issues remain; the
+                # verify output below decides which files those are.
+                failed = True
+
+        remaining = None
+        if not dry_run:
+            remaining = self._batch_verify(resolver, files, context, environment)
+        if remaining is not None:
+            return {
+                name: FixResult("issues remain after fix", False)
+                if name in remaining
+                else FixResult(None, True)
+                for name in files
+            }
+        if failed:
+            return self._run_chains(resolver, issues, dry_run=dry_run)
+        return {name: FixResult(None, False) for name in files}
+
+    def _batch_verify(
+        self,
+        resolver: Mapping[str, object],
+        files: Sequence[str],
+        context: Dict[str, str],
+        environment: Mapping[str, str],
+    ) -> Optional[Set[str]]:
+        """Relative paths ``batch_verify`` still reports, or ``None`` if it cannot tell."""
+        groups = resolver.get("batch_verify")
+        if not isinstance(groups, list) or not groups:
+            return None
+        remaining: Set[str] = set()
+        for group in groups:
+            cmd = self._pick_command(group, context, files=files)
+            if cmd is None:
+                return None
+            try:
+                output = self._run_command(
+                    cmd,
+                    environment,
+                    capture_output=True,
+                    dry_run=False,
+                    metric=(str(resolver.get("id", "<unknown>")), "batch_verify"),
+                )
+            except RuntimeError:
+                return None
+            issues = self._parse_diagnostics(output or "")
+            if issues is None:
+                return None
+            remaining.update(issue["relative"] for issue in issues)
+        return remaining
+
+    def _iter_issues_for_resolver(
+        self,
+        resolver: Dict[str, Any],
+        *,
+        paths: Optional[Sequence[str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield issues from the resolver's diagnostics command as they are parsed.
+
+        Output is read from the pipe in chunks and parsed incrementally, so
+        fixes can start before the linter exits and the report is never held
+        in memory whole. Raises ``RuntimeError`` once the stream ends if the
+        command failed or its output was not JSON diagnostics; issues already
+        yielded stand.
+        """
         diagnostics = resolver.get("diagnostics")
         if not diagnostics:
-            return []
+            return
 
-        command = self._pick_command(diagnostics, {"repo_root": str(self.repo_root)})
+        command = None
+        for group in diagnostics:
+            command = self._pick_command(group, {"repo_root": str(self.repo_root)})
+            if command is not None:
+                break
         if command is None:
-            return []
+            return
+
+        if paths is not None:
+            scoped = [
+                path
+                for path in paths
+                if (self.repo_root / path).is_dir()
+                or self._resolver_matches(resolver, path)
+            ]
+            if not scoped:
+                return
+            command = [*command, *scoped]
 
         environment = self._build_environment(resolver.get("env"), {})
+        resolver_id = str(resolver.get("id", "<unknown>"))
+        started = time.monotonic()
         try:
-            output = self._run_command(
+            process = subprocess.Popen(
                 command,
-                environment,
-                capture_output=True,
-                dry_run=False,
+                cwd=self.repo_root,
+                env=environment,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
             )
-        except RuntimeError:
-            return []
-
-        if output is None:
-            return []
+        except OSError as exc:
+            raise RuntimeError(f"command '{' '.join(command)}' failed: {exc}") from exc
 
+        drained = False
         try:
-            payload = json.loads(output)
-        except json.JSONDecodeError:
-            return []
+            for item in iter_json_objects(self._read_pipe(process.stdout)):
+                issue = self._issue_from_diagnostic(item)
+                if issue is not None:
+                    self.metrics.inc("lint_resolver_issues_total", {"resolver": resolver_id})
+                    yield issue
+            drained = True
+        except ValueError as exc:
+            raise RuntimeError(f"command '{' '.join(command)}': {exc}") from exc
+        finally:
+            # Also reached when the consumer stops early or parsing failed;
+            # only then is the linter killed. After EOF it may still be
+            # exiting (wrappers such as ``uv run``), so wait for its code.
+            if not drained and process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+            self._record_spawn((resolver_id, "diagnostics"), time.monotonic() - started)
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"command '{' '.join(command)}' failed with code {process.returncode}"
+            )
 
+    @staticmethod
+    def _read_pipe(stream: Any) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            data = stream.read1(DIAGNOSTICS_CHUNK_BYTES)
+            if not data:
+                break
+            yield decoder.decode(data)
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    def _parse_diagnostics(self, output: str) -> Optional[List[Dict[str, Any]]]:
+        """Turn ruff-style JSON diagnostics into issues; ``None`` if unparsable."""
         issues: List[Dict[str, Any]] = []
-        for item in payload or []:
-            filename = item.get("filename")
-            if not filename:
-                continue
-
-            abs_path = (self.repo_root / filename).resolve()
-            if not abs_path.exists():
-                continue
+        try:
+            for item in iter_json_objects([output]):
+                issue = self._issue_from_diagnostic(item)
+                if issue is not None:
+                    issues.append(issue)
+        except ValueError:
+            return None
+        return issues
 
-            try:
-                relative = abs_path.relative_to(self.repo_root).as_posix()
-            except ValueError:
-                continue
+    def _issue_from_diagnostic(self, item: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+        filename = item.get("filename")
+        if not filename:
+            return None
 
-            issues.append(
-                {
-                    "relative": relative,
-                    "abs_path": str(abs_path),
-                    "rule": item.get("code"),
-                    "message": item.get("message"),
-                }
-            )
+        abs_path = (self.repo_root / filename).resolve()
+        if not abs_path.exists():
+            return None
 
-        if not issues and dry_run:
-            print("No lint issues detected.")
+        try:
+            relative = abs_path.relative_to(self.repo_root).as_posix()
+        except ValueError:
+            return None
 
-        return issues
+        return {
+            "relative": relative,
+            "abs_path": str(abs_path),
+            "rule": item.get("code"),
+            "message": item.get("message"),
+        }
 
     def _run_command(
         self,
@@ -505,11 +1802,13 @@ class LintResolverAgent(BaseAgent):
         *,
         capture_output: bool,
         dry_run: bool,
+        metric: Tuple[str, str] = ("<unknown>", "other"),
     ) -> str | None:
         if dry_run:
             print("DRY RUN:", " ".join(command))
             return None
 
+        started = time.monotonic()
         result = subprocess.run(
             command,
             cwd=self.repo_root,
@@ -518,6 +1817,7 @@ class LintResolverAgent(BaseAgent):
             capture_output=capture_output,
             text=capture_output,
         )
+        self._record_spawn(metric, time.monotonic() - started)
         if result.returncode != 0:
             raise RuntimeError(
                 f"command '{' '.join(command)}' failed with code {result.returncode}"
@@ -6,31 +6,146 @@ Logger agent implementation.
 from __future__ import annotations
 
 import argparse
-import importlib.util
+import bz2
+import codecs
+import contextlib
+import fcntl
+import gzip
+import hashlib
 import datetime as dt
-import glob
 import json
+import lzma
 import socket
 import sys
 import os
+import time
 from pathlib import Path
-from typing import Dict, Iterable, List, Sequence
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
-BASE_MODULE_PATH = Path(__file__).resolve().parent / "base.py"
-BASE_MODULE_ID = "cursor_agent_base"
+if __package__:
+    from . import fswatch
+    from .base import RACY_MTIME_NS, BaseAgent
+else:  # executed as a script; .cursor/agents is sys.path[0]
+    import fswatch
+    from base import RACY_MTIME_NS, BaseAgent
 
-if BASE_MODULE_ID in sys.modules:
-    _base_module = sys.modules[BASE_MODULE_ID]
-else:
-    _base_spec = importlib.util.spec_from_file_location(
-        BASE_MODULE_ID, BASE_MODULE_PATH
-    )
-    if _base_spec is None or _base_spec.loader is None:
-        raise RuntimeError(f"unable to load base agent from {BASE_MODULE_PATH}")
-    _base_module = importlib.util.module_from_spec(_base_spec)
-    sys.modules[BASE_MODULE_ID] = _base_module
-    _base_spec.loader.exec_module(_base_module)
-BaseAgent = getattr(_base_module, "BaseAgent")
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Bumped when the layout of the discovery cache file changes.
+DISCOVERY_VERSION = 2
+
+# Leading bytes hashed into each offset record. They identify a log after
+# copytruncate or compression, when the inode no longer does.
+FINGERPRINT_BYTES = 256
+DECOMPRESSORS: Dict[str, Callable[[Path], IO[bytes]]] = {
+    ".gz": lambda path: gzip.open(path, "rb"),
+    ".bz2": lambda path: bz2.open(path, "rb"),
+    ".xz": lambda path: lzma.open(path, "rb"),
+}
+
+
+class RotatedSource(NamedTuple):
+    """A rotated copy of a source that still holds unread lines."""
+
+    path: Path
+    start: int
+    inode: str
+    head: bytes
+    open: Callable[[], IO[bytes]]
+
+
+class BlockWriter:
+    """
+    Stream CHANGE.log blocks to ``target`` (stdout when ``None``) in pieces.
+
+    The layout matches joining whole blocks: a blank line between blocks and
+    trailing newlines of each body dropped. The target is opened on the first
+    non-empty block, so runs without new entries never touch it; ``on_open``
+    is called with the target's size just before that first write. A file
+    target is ``flock``ed from then until ``close``.
+    """
+
+    def __init__(
+        self,
+        target: Optional[Path],
+        on_open: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        self.target = target
+        self.on_open = on_open
+        self.blocks = 0
+        self._stream: Optional[IO[str]] = None
+        self._separate = False
+        self._header = ""
+        self._held = 0
+        self._open = False
+
+    def start(self, header: str) -> None:
+        self._header = header
+        self._held = 0
+        self._open = False
+
+    def write(self, text: str) -> None:
+        body = text.rstrip("\n")
+        trailing = len(text) - len(body)
+        if not body:
+            self._held += trailing
+            return
+        stream = self._output()
+        if not self._open:
+            if self._separate:
+                stream.write("\n")
+            stream.write(self._header)
+            self._open = True
+        stream.write("\n" * self._held + body)
+        self._held = trailing
+
+    def finish(self) -> None:
+        if self._open:
+            self._output().write("\n")
+            self._separate = True
+            self.blocks += 1
+        self._open = False
+        self._held = 0
+
+    def close(self) -> None:
+        if self._stream is None:
+            return
+        self._stream.flush()
+        if self.target is not None:
+            os.fsync(self._stream.fileno())
+            self._stream.close()
+        self._stream = None
+
+    def _output(self) -> IO[str]:
+        if self._stream is None:
+            if self.target is None:
+                self._stream = sys.stdout
+            else:
+                self.target.parent.mkdir(parents=True, exist_ok=True)
+                self._stream = self.target.open("a", encoding="utf-8")
+                # Held until close(): other writers taking the same lock
+                # (ChangelogSink, _rollback_append) cannot land inside this
+                # append, and the size handed to on_open stays its start.
+                fcntl.flock(self._stream.fileno(), fcntl.LOCK_EX)
+                size = os.fstat(self._stream.fileno()).st_size
+                if self.on_open is not None:
+                    self.on_open(size)
+                self._separate = size > 0
+        return self._stream
 
 
 class LoggerAgent(BaseAgent):
@@ -73,6 +188,11 @@ class LoggerAgent(BaseAgent):
             "state_file", ".state/logger-agent.json"
         )
         self.state_file = self._resolve_with_root(state_setting)
+        # Discovery listings are a cache: kept out of the fsynced state file.
+        self.discovery_file = self.state_file.with_name(
+            self.state_file.stem + ".discovery.json"
+        )
+        self._discovery_dirty = False
 
         source_items = config.get("source_logs", [])
         direct: List[Path] = []
@@ -85,6 +205,9 @@ class LoggerAgent(BaseAgent):
 
         self.direct_sources = direct
         self.glob_patterns = patterns
+        self.glob_regexes = [fswatch.compile_glob(pattern) for pattern in patterns]
+        self.chunk_size = int(config.get("chunk_size", DEFAULT_CHUNK_SIZE))
+        self.max_bytes = int(config.get("max_bytes_per_run", DEFAULT_MAX_BYTES))
 
     # ------------------------------------------------------------------ helpers
     @staticmethod
@@ -117,6 +240,35 @@ class LoggerAgent(BaseAgent):
             action="store_true",
             help="Print planned CHANGE.log entries without writing files.",
         )
+        parser.add_argument(
+            "--follow",
+            action="store_true",
+            help="Keep running and tail sources as they change (inotify, polling fallback).",
+        )
+        parser.add_argument(
+            "--flush-interval",
+            type=float,
+            default=0.5,
+            help="Seconds to batch new lines before flushing CHANGE.log in --follow mode.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Stat polling interval when inotify is unavailable (--follow).",
+        )
+        parser.add_argument(
+            "--max-bytes",
+            type=int,
+            default=self.max_bytes,
+            help="Source bytes to ingest per run (per flush with --follow); 0 disables the limit.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=self.chunk_size,
+            help="Read size in bytes when streaming sources into CHANGE.log.",
+        )
         return parser
 
     # ----------------------------------------------------------------- lifecycle
@@ -125,39 +277,437 @@ class LoggerAgent(BaseAgent):
             parser.error(f"infra root not found at {self.infra_root}")
 
         host_label = self.resolve_host_label(args.host)
-        state = self.load_state()
-        blocks: List[str] = []
-        any_updates = False
+        self.chunk_size = max(args.chunk_size, 4096)
+        budget = args.max_bytes if args.max_bytes > 0 else None
+        if args.follow:
+            self.follow(
+                host_label,
+                flush_interval=max(args.flush_interval, 0.05),
+                poll_interval=max(args.poll_interval, 0.1),
+                budget=budget,
+                dry_run=args.dry_run,
+            )
+            return 0
 
-        for path in self.source_paths():
+        state = self.load_state(recover=not args.dry_run)
+        discovery = self.load_discovery()
+        paths = self.source_paths(discovery)
+        if not args.dry_run:
+            self.save_discovery(discovery)
+        # Start where the previous run ran out of budget so later sources
+        # are not starved by a busy one that sorts first.
+        resume = state.pop("resume_from", None)
+        if resume in map(str, paths):
+            index = [str(path) for path in paths].index(resume)
+            paths = paths[index:] + paths[:index]
+
+        writer = self.changelog_writer(state, dry_run=args.dry_run)
+        try:
+            remaining = self.stream_sources(
+                host_label, paths, state["sources"], writer, budget
+            )
+        finally:
+            writer.close()
+        if remaining:
+            state["resume_from"] = str(remaining[0])
+            sys.stderr.write(
+                f"[{self.name}] byte budget reached; {len(remaining)} source(s) "
+                "resume on the next run\n"
+            )
+
+        if args.dry_run:
+            if not writer.blocks:
+                sys.stdout.write("No new log entries detected.\n")
+        else:
+            self.commit_state(state)
+
+        return 0
+
+    def stream_sources(
+        self,
+        host: str,
+        paths: Iterable[Path],
+        offsets: Dict[str, Dict[str, Any]],
+        writer: BlockWriter,
+        budget: Optional[int],
+        handles: Optional[Dict[str, IO[bytes]]] = None,
+    ) -> List[Path]:
+        """
+        Stream new bytes of each source into ``writer``.
+
+        Returns the sources left unfinished because ``budget`` ran out (the
+        one that was cut first); their offsets point at the resume position.
+        """
+        paths = list(paths)
+        used = 0
+        for index, path in enumerate(paths):
+            allowance = None if budget is None else budget - used
+            if allowance is not None and allowance <= 0:
+                return paths[index:]
             try:
-                data = self.read_new_bytes(path, state)
+                consumed, drained = self.stream_source(
+                    host, path, offsets, writer, allowance, handles
+                )
             except FileNotFoundError:
+                if handles is not None and str(path) in handles:
+                    handles.pop(str(path)).close()
                 continue
+            used += consumed
+            if not drained:
+                return paths[index:]
+        return []
 
-            if not data:
-                continue
+    def stream_source(
+        self,
+        host: str,
+        path: Path,
+        offsets: Dict[str, Dict[str, Any]],
+        writer: BlockWriter,
+        budget: Optional[int] = None,
+        handles: Optional[Dict[str, IO[bytes]]] = None,
+    ) -> Tuple[int, bool]:
+        """
+        Copy bytes appended to ``path`` since its recorded offset into CHANGE.log.
 
-            try:
-                payload = data.decode("utf-8")
-            except UnicodeDecodeError:
-                payload = data.decode("utf-8", errors="replace")
+        If ``path`` was rotated since its offset was recorded, the unread rest of
+        the rotated file and any newer rotations are copied first (see
+        ``rotation_backlog``), each as its own block. When ``budget`` stops the
+        copy early the record points into whichever file was being read, so the
+        next run picks up there. Returns ``(bytes consumed, reached EOF)``.
+        """
+        key = str(path)
+        record = offsets.get(key)
+        stat = path.stat()
+        consumed = 0
 
-            block = self.build_block(host_label, path, payload)
-            if block:
-                blocks.append(block)
-                any_updates = True
+        if record and self.is_rotated(path, record, stat):
+            for rotated in self.rotation_backlog(path, record, handles):
+                allowance = None if budget is None else budget - consumed
+                handle = rotated.open()
+                try:
+                    used, drained = self.copy_block(
+                        host, rotated.path, handle, rotated.start, writer, allowance
+                    )
+                finally:
+                    handle.close()
+                consumed += used
+                if not drained:
+                    offsets[key] = self._source_record(
+                        rotated.inode, rotated.start + used, rotated.head
+                    )
+                    return consumed, False
+            record = None
+        elif record and int(record.get("offset", 0)) == stat.st_size:
+            mtime = self._trusted_mtime(stat)
+            if record.get("mtime") != mtime:
+                # The head was just checked; skip that on the next run.
+                offsets[key] = {**record, "mtime": mtime}
+            return 0, True
 
-        if any_updates:
-            self.append_blocks(blocks, dry_run=args.dry_run)
+        offset = int(record.get("offset", 0)) if record else 0
+        allowance = None if budget is None else budget - consumed
+        handle = self._open_source(path, stat, handles)
+        try:
+            used, drained = self.copy_block(host, path, handle, offset, writer, allowance)
+            head = b""
+            mtime = self._trusted_mtime(stat)
+            if record and int(record.get("head_len", 0)) >= FINGERPRINT_BYTES:
+                offsets[key] = {**record, "offset": offset + used, "mtime": mtime}
+            else:
+                head = os.pread(handle.fileno(), FINGERPRINT_BYTES, 0)
+                offsets[key] = self._source_record(
+                    f"{stat.st_ino}:{stat.st_dev}", offset + used, head, mtime
+                )
+        finally:
+            if handles is None:
+                handle.close()
+        return consumed + used, drained
 
-        if args.dry_run:
-            if not any_updates:
-                sys.stdout.write("No new log entries detected.\n")
+    def copy_block(
+        self,
+        host: str,
+        source: Path,
+        handle: IO[bytes],
+        offset: int,
+        writer: BlockWriter,
+        budget: Optional[int] = None,
+    ) -> Tuple[int, bool]:
+        """
+        Stream ``handle`` from ``offset`` into one CHANGE.log block.
+
+        Reads ``chunk_size`` pieces so memory stays flat however far behind the
+        offset is. When ``budget`` stops the read early, the cut is moved back
+        to the last line boundary (if the final chunk has one). Returns
+        ``(bytes consumed, reached EOF)``.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        consumed = 0
+        drained = True
+        handle.seek(offset)
+        writer.start(self.block_header(host, source))
+        while True:
+            size = self.chunk_size
+            if budget is not None:
+                size = min(size, budget - consumed)
+                if size <= 0:
+                    drained = False
+                    break
+            chunk = handle.read(size)
+            if not chunk:
+                break
+            if budget is not None and consumed + len(chunk) >= budget:
+                drained = not handle.read(1)
+                cut = chunk.rfind(b"\n") + 1
+                if cut and not drained:
+                    chunk = chunk[:cut]
+                writer.write(decoder.decode(chunk))
+                consumed += len(chunk)
+                break
+            writer.write(decoder.decode(chunk))
+            consumed += len(chunk)
+        if drained:
+            writer.write(decoder.decode(b"", final=True))
         else:
-            self.save_state(state)
+            # Leave a split multi-byte character for the next run.
+            consumed -= len(decoder.getstate()[0])
+        writer.finish()
+        return consumed, drained
 
-        return 0
+    # ---------------------------------------------------------------- rotation
+    def is_rotated(self, path: Path, record: Dict[str, Any], stat: os.stat_result) -> bool:
+        """Whether ``record`` no longer describes the file currently at ``path``."""
+        if record.get("inode") != f"{stat.st_ino}:{stat.st_dev}":
+            return True
+        offset = int(record.get("offset", 0))
+        if offset > stat.st_size:
+            return True
+        if not record.get("head_len"):
+            return False
+        # A file still at the offset with the recorded mtime is untouched and
+        # costs only the stat. Growth is checked: copytruncate keeps the inode
+        # and may refill past the old offset.
+        if stat.st_size == offset and record.get("mtime") == stat.st_mtime_ns:
+            return False
+        # Same inode but different leading bytes: copytruncate (or delete and
+        # recreate reusing the inode), then refilled, possibly to the same size.
+        return not self._head_matches(path, record)
+
+    def rotation_backlog(
+        self,
+        path: Path,
+        record: Dict[str, Any],
+        handles: Optional[Dict[str, IO[bytes]]] = None,
+    ) -> List[RotatedSource]:
+        """
+        Rotated files holding lines of ``path`` that were never copied, oldest first.
+
+        The file ``record`` was tracking is located by inode among ``path``'s
+        rotation siblings (``app.log.1``, ``app.log-20240101.gz``, ...), or by
+        its head fingerprint once it was copied or compressed; with
+        ``--follow`` a still-open handle is drained even if the file was
+        unlinked. It resumes at the recorded offset and is followed by every
+        newer rotation from the start. If the tracked file cannot be found the
+        backlog is empty and ``path`` is read from the beginning, as before.
+        """
+        inode = record.get("inode")
+        offset = int(record.get("offset", 0))
+        siblings = self.rotated_siblings(path)
+        found: Optional[RotatedSource] = None
+        found_mtime = 0
+
+        handle = handles.pop(str(path), None) if handles is not None else None
+        if handle is not None:
+            opened = os.fstat(handle.fileno())
+            if f"{opened.st_ino}:{opened.st_dev}" == inode:
+                head = os.pread(handle.fileno(), FINGERPRINT_BYTES, 0)
+                found = RotatedSource(path, offset, inode, head, lambda: handle)
+                found_mtime = opened.st_mtime_ns
+            else:
+                handle.close()
+
+        if found is None:
+            by_inode = [item for item in siblings if self._inode(item[1]) == inode]
+            by_head = [
+                item for item in reversed(siblings)
+                if record.get("head_len") and self._head_matches(item[0], record)
+            ]
+            for candidate, stat in (by_inode or by_head)[:1]:
+                found = RotatedSource(
+                    candidate,
+                    offset,
+                    self._inode(stat),
+                    self._read_head(candidate, FINGERPRINT_BYTES),
+                    self._opener(candidate),
+                )
+                found_mtime = stat.st_mtime_ns
+        if found is None:
+            return []
+
+        backlog = [found]
+        for candidate, stat in siblings:
+            if stat.st_mtime_ns > found_mtime and self._inode(stat) != found.inode:
+                backlog.append(
+                    RotatedSource(candidate, 0, self._inode(stat), b"", self._opener(candidate))
+                )
+        return backlog
+
+    def rotated_siblings(self, path: Path) -> List[Tuple[Path, os.stat_result]]:
+        """Rotated copies of ``path`` in its directory, oldest first by mtime."""
+        siblings: List[Tuple[Path, os.stat_result]] = []
+        prefixes = (path.name + ".", path.name + "-")
+        try:
+            with os.scandir(path.parent) as entries:
+                for entry in entries:
+                    if not entry.name.startswith(prefixes):
+                        continue
+                    try:
+                        if entry.is_file():
+                            siblings.append((Path(entry.path), entry.stat()))
+                    except OSError:
+                        continue
+        except OSError:
+            return []
+        siblings.sort(key=lambda item: (item[1].st_mtime_ns, item[0].name))
+        return siblings
+
+    @staticmethod
+    def _opener(path: Path) -> Callable[[], IO[bytes]]:
+        decompress = DECOMPRESSORS.get(path.suffix)
+        if decompress is not None:
+            return lambda: decompress(path)
+        return lambda: path.open("rb")
+
+    def _read_head(self, path: Path, length: int) -> bytes:
+        try:
+            with self._opener(path)() as fh:
+                return fh.read(length)
+        except (OSError, EOFError, lzma.LZMAError):
+            return b""
+
+    def _head_matches(self, path: Path, record: Dict[str, Any]) -> bool:
+        length = int(record.get("head_len", 0))
+        head = self._read_head(path, length)
+        return len(head) == length and hashlib.sha1(head).hexdigest() == record.get("head")
+
+    @staticmethod
+    def _inode(stat: os.stat_result) -> str:
+        return f"{stat.st_ino}:{stat.st_dev}"
+
+    def _trusted_mtime(self, stat: os.stat_result) -> Optional[int]:
+        """``stat``'s mtime, or ``None`` while too recent to trust (see ``is_rotated``)."""
+        if time.time_ns() - stat.st_mtime_ns < RACY_MTIME_NS:
+            return None
+        return stat.st_mtime_ns
+
+    @staticmethod
+    def _source_record(
+        inode: str, offset: int, head: bytes, mtime: Optional[int] = None
+    ) -> Dict[str, Any]:
+        return {
+            "inode": inode,
+            "offset": offset,
+            "mtime": mtime,
+            "head": hashlib.sha1(head).hexdigest(),
+            "head_len": len(head),
+        }
+
+    # ------------------------------------------------------------------ follow
+    def follow(
+        self,
+        host: str,
+        *,
+        flush_interval: float,
+        poll_interval: float,
+        budget: Optional[int],
+        dry_run: bool,
+    ) -> None:
+        """
+        Tail every source until interrupted.
+
+        Only paths reported by the watcher are read; open handles and offsets
+        stay in memory and changed sources are streamed into CHANGE.log (and
+        the state file saved) at most every ``flush_interval`` seconds.
+        """
+        state = self.load_state(recover=not dry_run)
+        offsets = state["sources"]
+        handles: Dict[str, IO[bytes]] = {}
+        discovery = self.load_discovery()
+        sources: Set[Path] = set(self.source_paths(discovery))
+        if not dry_run:
+            self.save_discovery(discovery)
+        roots = self.watch_roots()
+        watcher = fswatch.create_watcher(
+            roots,
+            exclude=fswatch.exclude_hidden,
+            poll_interval=poll_interval,
+        )
+        pending: Set[Path] = set(sources)
+        last_flush = 0.0
+
+        def flush() -> None:
+            nonlocal pending, last_flush
+            if pending:
+                writer = self.changelog_writer(state, dry_run=dry_run)
+                try:
+                    remaining = self.stream_sources(
+                        host, sorted(pending), offsets, writer, budget, handles
+                    )
+                finally:
+                    writer.close()
+                if not dry_run:
+                    self.commit_state(state)
+                pending = set(remaining)
+            last_flush = time.monotonic()
+
+        try:
+            while True:
+                wait = flush_interval if pending else max(flush_interval, 1.0)
+                changed = watcher.poll(timeout=wait)
+                rescan = False
+                if watcher.failure is not None:
+                    watcher = fswatch.recover_watcher(
+                        watcher, roots, exclude=fswatch.exclude_hidden, poll_interval=poll_interval
+                    )
+                    rescan = True  # events may have been lost
+                    pending |= sources
+                for path in changed:
+                    if path in sources:
+                        pending.add(path)
+                    elif self.matches_source(path):
+                        sources.add(path)
+                        pending.add(path)
+                    elif path.is_dir():
+                        rescan = True
+                if rescan:
+                    discovered = set(self.source_paths(discovery))
+                    if not dry_run:
+                        self.save_discovery(discovery)
+                    pending |= discovered - sources
+                    sources = discovered
+                if pending and time.monotonic() - last_flush >= flush_interval:
+                    flush()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            flush()
+            for handle in handles.values():
+                handle.close()
+            watcher.close()
+
+    def watch_roots(self) -> List[tuple[Path, bool]]:
+        """Directories to watch for ``--follow`` as ``(path, recursive)`` pairs."""
+        roots: Dict[Path, bool] = {}
+        for src in self.direct_sources:
+            roots.setdefault(src.parent, False)
+        for base, recursive in self.glob_roots():
+            path = Path(base)
+            roots[path] = roots.get(path, False) or recursive
+        return [(path, recursive) for path, recursive in roots.items() if path.is_dir()]
+
+    def matches_source(self, path: Path) -> bool:
+        if path == self.target_log or path in self.direct_sources:
+            return path != self.target_log
+        return self._matches_glob(str(path))
 
     # ------------------------------------------------------------------ behavior
     def resolve_host_label(self, cli_host: str | None) -> str:
@@ -178,100 +728,374 @@ class LoggerAgent(BaseAgent):
 
         return hostname
 
-    def load_state(self) -> Dict[str, Dict[str, int]]:
-        if not self.state_file.exists():
-            return {}
+    # -------------------------------------------------------------------- state
+    def changelog_writer(self, state: Dict[str, Any], *, dry_run: bool) -> BlockWriter:
+        """
+        Return a ``BlockWriter`` for this run that logs a write-ahead intent.
+
+        Before the first byte is appended, a small ``append_intent`` file
+        records CHANGE.log's current size and the next state ``serial``. The
+        caller commits the state (carrying that serial, see ``commit_state``)
+        once the fsynced append is complete, so offsets and CHANGE.log move
+        together: an intent newer than the saved state is rolled back by
+        ``load_state``.
+        """
+        if dry_run:
+            return BlockWriter(None)
+
+        def record_intent(size: int) -> None:
+            inode = ""
+            if self.target_log.exists():
+                inode = self._inode(self.target_log.stat())
+            state["serial"] = int(state.get("serial", 0)) + 1
+            intent = {
+                "target": str(self.target_log),
+                "inode": inode,
+                "size": size,
+                "serial": state["serial"],
+            }
+            self.write_atomic(self.append_intent, json.dumps(intent).encode("utf-8"))
+
+        return BlockWriter(self.target_log, on_open=record_intent)
+
+    def load_state(self, recover: bool = True) -> Dict[str, Any]:
+        """
+        Return ``{"sources": {path: record}}``.
+
+        State files written before the discovery cache existed hold the
+        per-source offsets at the top level, and later ones a ``discovery``
+        key (now in ``discovery_file``); both are migrated transparently.
+        An unreadable state file falls back to the ``.bak`` copy kept by
+        ``save_state``; if that is unusable too, every source starts at its
+        current size instead of being re-read from offset 0. With ``recover``
+        an append interrupted by a crash is rolled back (see
+        ``changelog_writer``), and so is everything appended after the
+        ``.bak`` copy was committed, since its offsets re-read exactly that.
+        """
+        backup = self.state_backup
+        existed = self.state_file.exists() or backup.exists()
+        data = self._read_state(self.state_file)
+        baseline = False
+        from_backup = False
+        if data is None and existed:
+            data = self._read_state(backup)
+            from_backup = data is not None
+            if data is not None:
+                sys.stderr.write(
+                    f"[{self.name}] state file {self.state_file} unreadable; using {backup}\n"
+                )
+        if data is None and existed:
+            sys.stderr.write(
+                f"[{self.name}] state file {self.state_file} and backup unreadable; "
+                "tailing sources from their current size\n"
+            )
+            data = {"sources": self.baseline_offsets()}
+            baseline = True
+        data = data or {}
+
+        if "sources" not in data:
+            data = {"sources": data}
+        data.pop("discovery", None)
+
+        # State files from before append_intent carry the intent inline.
+        pending = data.pop("pending_append", None)
+        intent = self._read_state(self.append_intent)
+        if intent and int(intent.get("serial", 0)) > int(data.get("serial", 0)) and not baseline:
+            pending = intent
+        if recover:
+            committed = data.get("changelog")
+            if from_backup and isinstance(committed, dict):
+                self._rollback_append(committed)
+            if pending:
+                self._rollback_append(pending)
+            if intent is not None:
+                self.clear_append_intent()
+        return data
+
+    def commit_state(self, state: Dict[str, Any]) -> None:
+        """
+        Save ``state`` after an append, recording CHANGE.log's size as
+        committed, and drop the append intent.
+        """
+        try:
+            stat = self.target_log.stat()
+        except FileNotFoundError:
+            state.pop("changelog", None)
+        else:
+            state["changelog"] = {
+                "target": str(self.target_log),
+                "inode": self._inode(stat),
+                "size": stat.st_size,
+            }
+        self.save_state(state)
+        self.clear_append_intent()
+
+    def save_state(self, state: Dict[str, Any]) -> None:
+        """Atomically replace the state file, keeping the previous one as ``.bak``."""
+        payload = json.dumps(state, indent=2, sort_keys=True).encode("utf-8")
+        if self.state_file.exists():
+            staged = self.state_backup.with_name(self.state_backup.name + ".tmp")
+            with contextlib.suppress(OSError):
+                staged.unlink(missing_ok=True)
+                os.link(self.state_file, staged)
+                os.replace(staged, self.state_backup)
+        self.write_atomic(self.state_file, payload)
+
+    @property
+    def state_backup(self) -> Path:
+        return self.state_file.with_name(self.state_file.name + ".bak")
+
+    @property
+    def append_intent(self) -> Path:
+        return self.state_file.with_name(self.state_file.name + ".intent")
+
+    def clear_append_intent(self) -> None:
+        with contextlib.suppress(OSError):
+            self.append_intent.unlink(missing_ok=True)
+
+    @staticmethod
+    def _read_state(path: Path) -> Optional[Dict[str, Any]]:
         try:
-            with self.state_file.open("r", encoding="utf-8") as fh:
-                return json.load(fh)
-        except (json.JSONDecodeError, OSError):
+            with path.open("r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (json.JSONDecodeError, UnicodeDecodeError, OSError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _rollback_append(self, pending: Dict[str, Any]) -> None:
+        """
+        Truncate CHANGE.log back to ``pending["size"]``: its size before an
+        unfinished append, or its last committed size in a recovered state.
+
+        Holds the ``flock`` that ``ChangelogSink`` and ``BlockWriter`` take
+        for their appends, so no append in progress is cut in half. Appends
+        made by other writers after the interrupted one finished still sit
+        past ``size`` and are rolled back with it.
+        """
+        target = Path(pending.get("target") or self.target_log)
+        size = int(pending.get("size", 0))
+        try:
+            fh = target.open("r+b")
+        except FileNotFoundError:
+            return
+        with fh:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            stat = os.fstat(fh.fileno())
+            if pending.get("inode") and pending["inode"] != self._inode(stat):
+                return
+            if stat.st_size > size:
+                sys.stderr.write(
+                    f"[{self.name}] rolling back uncommitted append to {target} "
+                    f"({stat.st_size - size} bytes)\n"
+                )
+                fh.truncate(size)
+                os.fsync(fh.fileno())
+
+    def baseline_offsets(self) -> Dict[str, Dict[str, Any]]:
+        """Offset records positioned at the current end of every source."""
+        offsets: Dict[str, Dict[str, Any]] = {}
+        for path in self.source_paths():
+            try:
+                with path.open("rb") as fh:
+                    stat = os.fstat(fh.fileno())
+                    head = fh.read(FINGERPRINT_BYTES)
+            except OSError:
+                continue
+            offsets[str(path)] = self._source_record(
+                self._inode(stat), stat.st_size, head, self._trusted_mtime(stat)
+            )
+        return offsets
+
+    # ---------------------------------------------------------------- discovery
+    def load_discovery(self) -> Dict[str, Any]:
+        """
+        Return the cached directory listings for ``source_paths``.
+
+        The cache only holds names matching the glob patterns, so it is
+        dropped when ``source_logs`` changes.
+        """
+        self._discovery_dirty = False
+        data = self._read_state(self.discovery_file)
+        if (
+            data is None
+            or data.get("version") != DISCOVERY_VERSION
+            or data.get("patterns") != self.glob_patterns
+            or not isinstance(data.get("directories"), dict)
+        ):
             return {}
+        return data["directories"]
+
+    def save_discovery(self, discovery: Dict[str, Any]) -> None:
+        """Write the listings back if ``source_paths`` changed them (not fsynced)."""
+        if not self._discovery_dirty:
+            return
+        payload = {
+            "version": DISCOVERY_VERSION,
+            "patterns": self.glob_patterns,
+            "directories": discovery,
+        }
+        try:
+            self.write_atomic(
+                self.discovery_file,
+                json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8"),
+                durable=False,
+            )
+        except OSError as exc:
+            sys.stderr.write(f"[{self.name}] unable to write {self.discovery_file}: {exc}\n")
+            return
+        self._discovery_dirty = False
 
-    def save_state(self, state: Dict[str, Dict[str, int]]) -> None:
-        self.ensure_parent(self.state_file)
-        with self.state_file.open("w", encoding="utf-8") as fh:
-            json.dump(state, fh, indent=2, sort_keys=True)
+    def source_paths(self, discovery: Optional[Dict[str, Any]] = None) -> List[Path]:
+        """
+        Expand direct sources and glob patterns into existing files.
 
-    def source_paths(self) -> List[Path]:
-        paths: List[Path] = []
+        ``discovery`` maps directory -> ``{"mtime", "files", "links", "dirs", "dir_links"}``
+        and is updated in place; ``files`` and ``links`` only keep names that
+        match a glob pattern. A directory whose mtime is unchanged reuses its
+        cached listing, so an unchanged tree costs one ``stat`` per directory
+        instead of a full ``scandir`` walk.
+        """
+        paths: Set[Path] = set()
 
         for src in self.direct_sources:
             if src.exists():
-                resolved = src.resolve()
-                if resolved not in paths:
-                    paths.append(resolved)
+                paths.add(src.resolve())
 
-        for pattern in self.glob_patterns:
-            for match in glob.glob(pattern, recursive=True):
-                path = Path(match)
-                if not path.is_file():
-                    continue
-                resolved = path.resolve()
-                if resolved == self.target_log:
-                    continue
-                if resolved not in paths:
-                    paths.append(resolved)
+        if discovery is None:
+            discovery = {}
+        visited: Dict[str, Dict[str, Any]] = {}
+        seen_inodes: Set[tuple[int, int]] = set()
+        for root, recursive in self.glob_roots():
+            self._discover(root, recursive, discovery, visited, seen_inodes, paths)
 
+        for stale in set(discovery) - set(visited):
+            del discovery[stale]
+            self._discovery_dirty = True
+
+        paths.discard(self.target_log)
         return sorted(paths)
 
-    @staticmethod
-    def inode_id(path: Path) -> str:
-        stat = path.stat()
-        return f"{stat.st_ino}:{stat.st_dev}"
+    def glob_roots(self) -> List[tuple[str, bool]]:
+        roots: Dict[str, bool] = {}
+        for pattern in self.glob_patterns:
+            base, recursive = fswatch.glob_base(pattern)
+            roots[base] = roots.get(base, False) or recursive
+        return sorted(roots.items())
 
-    def read_new_bytes(
-        self, path: Path, state: Dict[str, Dict[str, int]]
-    ) -> bytes:
-        record = state.get(str(path))
-        current_inode = self.inode_id(path)
-        offset = 0
-
-        if record and record.get("inode") == current_inode:
-            offset = int(record.get("offset", 0))
-            current_size = path.stat().st_size
-            if offset > current_size:
-                offset = 0
-        else:
-            offset = 0
+    def _discover(
+        self,
+        root: str,
+        recursive: bool,
+        discovery: Dict[str, Any],
+        visited: Dict[str, Dict[str, Any]],
+        seen_inodes: Set[tuple[int, int]],
+        paths: Set[Path],
+    ) -> None:
+        # Real directories are walked before symlinked ones so a file reachable
+        # both ways is reported (and its offset tracked) under its real path.
+        stack = [(root, False)]
+        linked: List[tuple[str, bool]] = []
+        while stack or linked:
+            directory, via_link = stack.pop() if stack else linked.pop()
+            listing = visited.get(directory)
+            if listing is None:
+                cached = discovery.get(directory)
+                listing = self._list_directory(directory, cached, seen_inodes)
+                if listing is None:
+                    continue
+                if listing is not cached:
+                    self._discovery_dirty = True
+                visited[directory] = discovery[directory] = listing
+                prefix = directory.rstrip("/") + "/"
+                for name in listing["files"]:
+                    path = Path(prefix + name)
+                    paths.add(path.resolve() if via_link else path)
+                for name in listing["links"]:
+                    paths.add(Path(prefix + name).resolve())
+            if recursive:
+                prefix = directory.rstrip("/") + "/"
+                stack.extend((prefix + name, via_link) for name in listing["dirs"])
+                linked.extend((prefix + name, True) for name in listing["dir_links"])
 
-        with path.open("rb") as fh:
-            fh.seek(offset)
-            data = fh.read()
+    def _list_directory(
+        self,
+        directory: str,
+        cached: Optional[Dict[str, Any]],
+        seen_inodes: Set[tuple[int, int]],
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            stat = os.stat(directory)
+        except OSError:
+            return None
+        # Symlinked directories may point back into the tree; walk each once.
+        key = (stat.st_dev, stat.st_ino)
+        if key in seen_inodes:
+            return None
+        seen_inodes.add(key)
 
-        state[str(path)] = {"inode": current_inode, "offset": path.stat().st_size}
-        return data
+        if cached and cached.get("mtime") == stat.st_mtime_ns:
+            return cached
 
-    def build_block(self, host: str, source: Path, payload: str) -> str:
-        timestamp = dt.datetime.now(dt.timezone.utc).isoformat()
-        header = f"# {timestamp} — {host} — {self.name}"
-        subheader = f"## source: {source}"
-        body = payload.rstrip("\n")
-        if not body:
-            return ""
-        return "\n".join([header, subheader, body, ""])
+        prefix = directory.rstrip("/") + "/"
+        files: List[str] = []
+        links: List[str] = []
+        dirs: List[str] = []
+        dir_links: List[str] = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if not fswatch.exclude_hidden(entry.name):
+                                (dir_links if entry.is_symlink() else dirs).append(entry.name)
+                        elif entry.is_file() and self._matches_glob(prefix + entry.name):
+                            (links if entry.is_symlink() else files).append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
 
-    def append_blocks(self, blocks: Iterable[str], dry_run: bool = False) -> None:
-        rendered = [block for block in blocks if block]
-        if not rendered:
-            return
+        racy = time.time_ns() - stat.st_mtime_ns < RACY_MTIME_NS
+        return {
+            "mtime": None if racy else stat.st_mtime_ns,
+            "files": sorted(files),
+            "links": sorted(links),
+            "dirs": sorted(dirs),
+            "dir_links": sorted(dir_links),
+        }
 
-        output = (
-            "\n\n".join(block.strip("\n") for block in rendered).rstrip() + "\n"
-        )
+    def _matches_glob(self, text: str) -> bool:
+        return any(regex.match(text) for regex in self.glob_regexes)
 
-        if dry_run:
-            sys.stdout.write(output)
-            return
+    def _open_source(
+        self,
+        path: Path,
+        stat: os.stat_result,
+        handles: Optional[Dict[str, IO[bytes]]] = None,
+    ) -> IO[bytes]:
+        """
+        Open ``path`` for reading.
 
-        self.ensure_parent(self.target_log)
-        needs_leading_newline = (
-            self.target_log.exists() and self.target_log.stat().st_size > 0
-        )
+        When ``handles`` is given (``--follow``) the file stays open between
+        calls and is only reopened after rotation.
+        """
+        key = str(path)
+        handle = handles.get(key) if handles is not None else None
+        if handle is not None:
+            if self._inode(os.fstat(handle.fileno())) != self._inode(stat):
+                handle.close()
+                handle = None
+        if handle is None:
+            handle = path.open("rb")
+            if handles is not None:
+                handles[key] = handle
+        return handle
 
-        with self.target_log.open("a", encoding="utf-8") as fh:
-            if needs_leading_newline:
-                fh.write("\n")
-            fh.write(output)
+    def block_header(self, host: str, source: Path) -> str:
+        timestamp = dt.datetime.now(dt.timezone.utc).isoformat()
+        header = f"# {timestamp} — {host} — {self.name}"
+        subheader = f"## source: {source}"
+        return f"{header}\n{subheader}\n"
 
 
 def main(argv: Sequence[str] | None = None) -> int:
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Concurrent multi-agent execution behind ``runner.py run-many``.
+
+A plan is a list of steps, each naming an agent, its arguments and the steps
+it must run ``after``. Steps whose dependencies have succeeded run
+concurrently (up to ``jobs`` at a time), each in its own
+``runner.py run`` process so agents keep their usual ``sys.exit`` /
+stdout behaviour. Their output is multiplexed line by line with a
+``[step]`` prefix. Steps depending on a failed step are skipped.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
+
+RUNNER_PATH = Path(__file__).resolve().parent / "runner.py"
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+
+class Step(NamedTuple):
+    """One agent invocation in a ``run-many`` plan."""
+
+    id: str
+    agent: str
+    args: List[str]
+    after: List[str]
+
+
+def parse_step(item: Any, index: int) -> Step:
+    """
+    Build a ``Step`` from a plan entry.
+
+    Entries are either ``"agent [args...]"`` strings (shell-style quoting) or
+    objects with ``agent`` and optional ``id``, ``args`` (list of strings or a
+    string) and ``after`` (list of step ids or a single id).
+    """
+    if isinstance(item, str):
+        words = shlex.split(item)
+        if not words:
+            raise ValueError(f"step {index}: empty agent spec")
+        return Step(id=words[0], agent=words[0], args=words[1:], after=[])
+    if not isinstance(item, dict) or not isinstance(item.get("agent"), str):
+        raise ValueError(f"step {index}: expected a string or an object with 'agent'")
+    args = item.get("args", [])
+    if isinstance(args, str):
+        try:
+            args = shlex.split(args)
+        except ValueError as exc:
+            raise ValueError(f"step {index}: 'args': {exc}") from None
+    after = item.get("after", [])
+    if isinstance(after, str):
+        after = [after]
+    for key, value in (("args", args), ("after", after)):
+        if not isinstance(value, list) or not all(isinstance(word, str) for word in value):
+            raise ValueError(
+                f"step {index}: '{key}' must be a string or a list of strings, got {value!r}"
+            )
+    return Step(
+        id=str(item.get("id", item["agent"])),
+        agent=item["agent"],
+        args=args,
+        after=after,
+    )
+
+
+def load_plan(path: str) -> Dict[str, Any]:
+    """Read a JSON plan: ``{"jobs": N, "steps": [...]}`` or a bare step list."""
+    if path == "-":
+        plan = json.load(sys.stdin)
+    else:
+        with open(path, "r", encoding="utf-8") as fh:
+            plan = json.load(fh)
+    if isinstance(plan, list):
+        plan = {"steps": plan}
+    if not isinstance(plan, dict) or not isinstance(plan.get("steps"), list):
+        raise ValueError(f"{path}: plan must be a list of steps or an object with 'steps'")
+    return plan
+
+
+def plan_jobs(plan: Dict[str, Any]) -> Optional[int]:
+    """The plan's ``jobs`` value, if any; it must be a positive integer."""
+    jobs = plan.get("jobs")
+    if jobs is None:
+        return None
+    if isinstance(jobs, bool) or not isinstance(jobs, int) or jobs < 1:
+        raise ValueError(f"plan 'jobs' must be a positive integer, got {jobs!r}")
+    return jobs
+
+
+def validate_steps(steps: Sequence[Step], agents: Iterable[str]) -> None:
+    """Reject unknown agents, duplicate ids, dangling ``after`` and cycles."""
+    known = set(agents)
+    ids: Set[str] = set()
+    for step in steps:
+        if step.agent not in known:
+            raise ValueError(f"step '{step.id}': agent '{step.agent}' is not registered")
+        if step.id in ids:
+            raise ValueError(f"duplicate step id '{step.id}'; give repeated agents an 'id'")
+        ids.add(step.id)
+    for step in steps:
+        missing = [dep for dep in step.after if dep not in ids]
+        if missing:
+            raise ValueError(f"step '{step.id}': unknown 'after' step(s): {', '.join(missing)}")
+
+    # Kahn's algorithm: whatever cannot be ordered sits on a cycle.
+    pending = {step.id: set(step.after) for step in steps}
+    while pending:
+        ready = [step_id for step_id, deps in pending.items() if not deps]
+        if not ready:
+            raise ValueError(f"'after' cycle between steps: {', '.join(sorted(pending))}")
+        for step_id in ready:
+            del pending[step_id]
+        for deps in pending.values():
+            deps.difference_update(ready)
+
+
+class MultiRunner:
+    """Schedule plan steps over a worker pool and multiplex their output."""
+
+    def __init__(
+        self,
+        steps: Sequence[Step],
+        *,
+        jobs: int,
+        fail_fast: bool = False,
+        stdout: IO[str] = sys.stdout,
+        stderr: IO[str] = sys.stderr,
+    ) -> None:
+        self.steps = list(steps)
+        self.jobs = max(1, jobs)
+        self.fail_fast = fail_fast
+        self.stdout = stdout
+        self.stderr = stderr
+        self.width = max((len(step.id) for step in self.steps), default=0)
+        self._write_lock = threading.Lock()
+
+    # ------------------------------------------------------------------ run
+    def run(self) -> Dict[str, Any]:
+        """Execute the plan and return the summary (see ``summary``)."""
+        started = time.monotonic()
+        results: Dict[str, Dict[str, Any]] = {}
+        waiting = list(self.steps)
+        running: Dict[Future, Step] = {}
+        stop = False
+
+        with ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="run-many") as pool:
+            while waiting or running:
+                for step in list(waiting):
+                    failed_deps = [
+                        dep for dep in step.after
+                        if dep in results and results[dep]["status"] != STATUS_OK
+                    ]
+                    if failed_deps or stop:
+                        waiting.remove(step)
+                        reason = (
+                            f"after {', '.join(failed_deps)} did not succeed"
+                            if failed_deps
+                            else "stopped by --fail-fast"
+                        )
+                        results[step.id] = self._skipped(step, reason)
+                        self._emit(self.stderr, step.id, f"skipped: {reason}\n")
+                    elif all(dep in results for dep in step.after) and len(running) < self.jobs:
+                        waiting.remove(step)
+                        running[pool.submit(self._run_step, step, started)] = step
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    results[step.id] = future.result()
+                    if results[step.id]["status"] != STATUS_OK and self.fail_fast:
+                        stop = True
+
+        return self.summary(results, time.monotonic() - started)
+
+    def summary(self, results: Dict[str, Dict[str, Any]], wall: float) -> Dict[str, Any]:
+        """
+        Summarise a finished plan.
+
+        ``exit_code`` is 0 when every step succeeded, otherwise the exit code
+        of the first failed step in plan order (``128 + signal`` when it was
+        killed). Skipped steps never decide it; they follow from a failure.
+        """
+        ordered = [results[step.id] for step in self.steps]
+        failed = [result for result in ordered if result["status"] == STATUS_FAILED]
+        exit_code = failed[0]["exit_code"] if failed else 0
+        if exit_code < 0:
+            exit_code = 128 - exit_code  # killed by a signal, shell convention
+        return {
+            "exit_code": exit_code,
+            "wall_s": round(wall, 3),
+            "jobs": self.jobs,
+            "counts": {
+                status: sum(1 for result in ordered if result["status"] == status)
+                for status in (STATUS_OK, STATUS_FAILED, STATUS_SKIPPED)
+            },
+            "steps": ordered,
+        }
+
+    # ----------------------------------------------------------------- steps
+    def _run_step(self, step: Step, plan_started: float) -> Dict[str, Any]:
+        command = [sys.executable, str(RUNNER_PATH), "run", step.agent, "--", *step.args]
+        env = dict(os.environ, PYTHONUNBUFFERED="1")
+        started = time.monotonic()
+        try:
+            proc = subprocess.Popen(
+                command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+            )
+        except OSError as exc:
+            self._emit(self.stderr, step.id, f"unable to start: {exc}\n")
+            exit_code = 127
+        else:
+            pumps = [
+                threading.Thread(target=self._pump, args=(proc.stdout, self.stdout, step.id), daemon=True),
+                threading.Thread(target=self._pump, args=(proc.stderr, self.stderr, step.id), daemon=True),
+            ]
+            for pump in pumps:
+                pump.start()
+            exit_code = proc.wait()
+            for pump in pumps:
+                pump.join()
+        finished = time.monotonic()
+        return {
+            **self._describe(step),
+            "status": STATUS_OK if exit_code == 0 else STATUS_FAILED,
+            "exit_code": exit_code,
+            "started_s": round(started - plan_started, 3),
+            "duration_s": round(finished - started, 3),
+        }
+
+    def _skipped(self, step: Step, reason: str) -> Dict[str, Any]:
+        return {
+            **self._describe(step),
+            "status": STATUS_SKIPPED,
+            "exit_code": None,
+            "reason": reason,
+            "started_s": None,
+            "duration_s": None,
+        }
+
+    @staticmethod
+    def _describe(step: Step) -> Dict[str, Any]:
+        return {"id": step.id, "agent": step.agent, "args": step.args, "after": step.after}
+
+    # ---------------------------------------------------------------- output
+    def _pump(self, pipe: IO[bytes], stream: IO[str], step_id: str) -> None:
+        with pipe:
+            for raw in iter(pipe.readline, b""):
+                line = raw.decode("utf-8", errors="replace")
+                self._emit(stream, step_id, line if line.endswith("\n") else line + "\n")
+
+    def _emit(self, stream: IO[str], step_id: str, line: str) -> None:
+        with self._write_lock:
+            stream.write(f"[{step_id:<{self.width}}] {line}")
+            stream.flush()
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    counts = summary["counts"]
+    lines = [
+        f"run-many: {len(summary['steps'])} step(s) in {summary['wall_s']:.2f}s: "
+        f"{counts[STATUS_OK]} ok, {counts[STATUS_FAILED]} failed, {counts[STATUS_SKIPPED]} skipped"
+    ]
+    width = max((len(result["id"]) for result in summary["steps"]), default=0)
+    for result in summary["steps"]:
+        timing = "" if result["duration_s"] is None else f" {result['duration_s']:.2f}s"
+        code = "" if result["exit_code"] is None else f" (exit {result['exit_code']})"
+        lines.append(f"  {result['id']:<{width}} {result['status']}{code}{timing}")
+    return "\n".join(lines)
+
+
+def write_summary(summary: Dict[str, Any], path: Optional[str]) -> None:
+    if not path:
+        return
+    payload = json.dumps(summary, indent=2) + "\n"
+    if path == "-":
+        sys.stdout.write(payload)
+    else:
+        Path(path).write_text(payload, encoding="utf-8")
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Result cache behind the registry's ``cache_ttl`` field.
+
+For agents that are idempotent and read-only, the runner memoizes stdout and
+the exit code per argument vector for ``cache_ttl`` seconds. Identical calls
+that arrive while one is executing wait on the same ``flock`` and replay its
+result, so a burst of requests costs a single run (single-flight).
+
+A miss runs the agent in this process (warm under ``runner.py serve``) with
+file descriptor 1 redirected through a pipe, so the output of its
+subprocesses is captured too, and tees it to the real stdout. Once the agent
+returns, the pipe is drained for at most ``CAPTURE_DRAIN_SECONDS``: a
+background child that inherited fd 1 cannot hold the run open, but its
+result is then incomplete and not cached.
+
+Entries live under ``.state/agent-cache/<agent>/<key>``. Each one is a JSON
+header line followed by the raw stdout bytes, written atomically. stderr is
+passed through and not cached. Every write prunes expired entries of the
+agent together with their lock files.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import selectors
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from .base import BaseAgent, exit_code_of
+
+CACHE_VERSION = 1
+READ_CHUNK_BYTES = 64 * 1024
+# How long the pipe may stay open after the agent returned, and how often the
+# tee checks whether it did.
+CAPTURE_DRAIN_SECONDS = 2.0
+CAPTURE_POLL_SECONDS = 0.2
+
+
+class ResultCache:
+    """Single-flight stdout/exit-code cache for one agent."""
+
+    def __init__(self, root: Path, agent: str, ttl: float) -> None:
+        self.directory = root / agent
+        self.agent = agent
+        self.ttl = ttl
+
+    def key(self, argv: Sequence[str], config: Mapping[str, Any]) -> str:
+        """Cache key: the argument vector plus the agent's registry entry."""
+        payload = json.dumps(
+            {"agent": self.agent, "argv": list(argv), "config": config},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def run(self, argv: Sequence[str], config: Mapping[str, Any], execute: Callable[[], int]) -> int:
+        """
+        Replay a fresh entry for ``argv`` or call ``execute`` and record it.
+
+        ``execute`` runs the agent without the cache and returns its exit code
+        (``SystemExit`` counts as one). Its stdout is streamed through as it
+        is produced; an exception propagates and records nothing.
+        """
+        key = self.key(argv, config)
+        entry_path = self.directory / key
+        cached = self._load(entry_path)
+        if cached is not None:
+            return self._replay(*cached)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._locked(self.directory / f"{key}.lock"):
+            # Whoever held the lock may just have produced our entry.
+            cached = self._load(entry_path)
+            if cached is not None:
+                return self._replay(*cached)
+
+            exit_code, stdout, complete = self._capture(execute)
+            if not complete:
+                print(
+                    f"{self.agent}: stdout still open {CAPTURE_DRAIN_SECONDS:g}s after the run "
+                    "(background process?); result not cached",
+                    file=sys.stderr,
+                )
+                return exit_code
+            header = {
+                "version": CACHE_VERSION,
+                "agent": self.agent,
+                "argv": list(argv),
+                "created": time.time(),
+                "exit_code": exit_code,
+            }
+            try:
+                BaseAgent.write_atomic(entry_path, json.dumps(header).encode("utf-8") + b"\n" + stdout)
+            except OSError as exc:
+                print(f"{self.agent}: unable to write result cache: {exc}", file=sys.stderr)
+            self.prune(keep=key)
+            return exit_code
+
+    def prune(self, keep: Optional[str] = None) -> None:
+        """
+        Delete entries (and leftover temp files) older than the TTL, plus the
+        lock files of expired or missing entries. Locks held by a running
+        miss are skipped, as is the ``keep`` key.
+        """
+        try:
+            with os.scandir(self.directory) as it:
+                names = [(entry.name, entry.stat().st_mtime) for entry in it]
+        except OSError:
+            return
+        now = time.time()
+        for name, mtime in names:
+            if now - mtime < self.ttl:
+                continue
+            key = name[: -len(".lock")] if name.endswith(".lock") else name
+            if key == keep:
+                continue
+            if name.startswith("."):
+                with contextlib.suppress(OSError):
+                    os.unlink(self.directory / name)  # write_atomic temp file of a crashed run
+                continue
+            self._remove(key, now)
+
+    # --------------------------------------------------------------- helpers
+    def _remove(self, key: str, now: float) -> None:
+        entry_path = self.directory / key
+        lock_path = self.directory / f"{key}.lock"
+        try:
+            fd = os.open(lock_path, os.O_RDWR)
+        except FileNotFoundError:
+            with contextlib.suppress(OSError):
+                os.unlink(entry_path)
+            return
+        except OSError:
+            return
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # a miss is executing this key right now
+            with contextlib.suppress(FileNotFoundError):
+                if now - entry_path.stat().st_mtime < self.ttl:
+                    return  # written again since the directory was listed
+                os.unlink(entry_path)
+            with contextlib.suppress(OSError):
+                os.unlink(lock_path)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _locked(path: Path) -> Iterator[None]:
+        """
+        Hold ``flock`` on ``path``, retrying if ``prune`` unlinked the file
+        between our ``open`` and ``flock`` (the lock would then be private).
+        """
+        while True:
+            with open(path, "a+b") as lock:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                try:
+                    current = os.stat(path).st_ino == os.fstat(lock.fileno()).st_ino
+                except FileNotFoundError:
+                    current = False
+                if current:
+                    yield
+                    return
+
+    def _load(self, path: Path) -> Optional[Tuple[int, bytes]]:
+        try:
+            raw = path.read_bytes()
+        except OSError:
+            return None
+        header_line, _, stdout = raw.partition(b"\n")
+        try:
+            header: Dict[str, Any] = json.loads(header_line)
+            created = float(header["created"])
+            exit_code = int(header["exit_code"])
+        except (ValueError, KeyError, TypeError):
+            return None
+        if header.get("version") != CACHE_VERSION:
+            return None
+        age = time.time() - created
+        if age < 0 or age >= self.ttl:
+            return None
+        return exit_code, stdout
+
+    @staticmethod
+    def _replay(exit_code: int, stdout: bytes) -> int:
+        sys.stdout.flush()
+        sys.stdout.buffer.write(stdout)
+        sys.stdout.buffer.flush()
+        return exit_code
+
+    @staticmethod
+    def _capture(execute: Callable[[], int]) -> Tuple[int, bytes, bool]:
+        """
+        Call ``execute`` with fd 1 teed into a buffer; returns (exit code,
+        stdout, whether the pipe reached EOF within the drain period).
+        """
+        sys.stdout.flush()
+        saved = os.dup(1)
+        read_fd, write_fd = os.pipe()
+        os.dup2(write_fd, 1)
+        os.close(write_fd)
+        chunks: List[bytes] = []
+        finished = threading.Event()
+        eof = threading.Event()
+        tee = threading.Thread(
+            target=_tee, args=(read_fd, saved, chunks, finished, eof), daemon=True
+        )
+        tee.start()
+        try:
+            try:
+                exit_code = execute()
+            except SystemExit as exc:
+                exit_code = exit_code_of(exc)
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)  # drops our pipe writer; children may still hold one
+            finished.set()
+            tee.join()  # bounded by CAPTURE_DRAIN_SECONDS
+            os.close(read_fd)
+            os.close(saved)
+        return exit_code, b"".join(chunks), eof.is_set()
+
+
+def _tee(
+    read_fd: int,
+    out_fd: int,
+    chunks: List[bytes],
+    finished: threading.Event,
+    eof: threading.Event,
+) -> None:
+    """Copy ``read_fd`` to ``out_fd`` until EOF, or the drain period after ``finished``."""
+    deadline: Optional[float] = None
+    with selectors.DefaultSelector() as selector:
+        selector.register(read_fd, selectors.EVENT_READ)
+        while True:
+            if deadline is None and finished.is_set():
+                deadline = time.monotonic() + CAPTURE_DRAIN_SECONDS
+            timeout = CAPTURE_POLL_SECONDS
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    return
+            if not selector.select(timeout):
+                continue
+            chunk = os.read(read_fd, READ_CHUNK_BYTES)
+            if not chunk:
+                eof.set()
+                return
+            chunks.append(chunk)
+            view = memoryview(chunk)
+            while view:
+                try:
+                    view = view[os.write(out_fd, view):]
+                except OSError:
+                    break  # caller's stdout went away; keep capturing
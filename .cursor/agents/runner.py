@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 """
 Runner for Cursor automation agents.
+
+``list`` and ``describe`` only need registry metadata: they are served from a
+marshal snapshot of ``registry.json`` and never import ``base.py`` or agent
+code. ``run`` imports exactly the requested agent module, and the daemon
+machinery behind ``serve`` lives in ``daemon.py``, loaded on demand.
 """
 
 from __future__ import annotations
@@ -8,36 +13,147 @@ from __future__ import annotations
 import argparse
 import importlib
 import importlib.util
-import json
+import marshal
+import os
 import sys
+import time
 from pathlib import Path
 from types import ModuleType
-from typing import Any, Dict, Iterable, Optional, Sequence
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Sequence
+
+if TYPE_CHECKING:
+    from .base import BaseAgent
 
 REGISTRY_PATH = Path(__file__).resolve().parent / "registry.json"
+AGENTS_DIR = REGISTRY_PATH.parent
 REPO_ROOT = REGISTRY_PATH.parents[2]
-BASE_MODULE_PATH = REGISTRY_PATH.parent / "base.py"
-BASE_MODULE_ID = "cursor_agent_base"
-
-if BASE_MODULE_ID in sys.modules:
-    _base_module = sys.modules[BASE_MODULE_ID]
-else:
-    _base_spec = importlib.util.spec_from_file_location(
-        BASE_MODULE_ID, BASE_MODULE_PATH
+
+# ``.cursor`` is importable as the ``cursor`` package (see ``ensure_package``).
+PACKAGE_NAME = "cursor"
+PACKAGE_ROOT = AGENTS_DIR.parent
+AGENTS_PACKAGE = f"{PACKAGE_NAME}.agents"
+
+DEFAULT_SOCKET_PATH = REPO_ROOT / ".state" / "agent-runner.sock"
+
+# Memoized results of agents that declare ``cache_ttl`` (see resultcache.py).
+RESULT_CACHE_DIR = REPO_ROOT / ".state" / "agent-cache"
+
+# Parsed registry keyed by registry.json's (mtime, size) and content hash.
+REGISTRY_SNAPSHOT_PATH = REPO_ROOT / ".state" / "registry.snapshot"
+REGISTRY_SNAPSHOT_VERSION = 2
+
+
+def ensure_package() -> None:
+    """
+    Register ``.cursor`` as the ``cursor`` package.
+
+    The leading dot keeps the directory off ``sys.path`` lookups, so the
+    package module is created from ``.cursor/__init__.py`` with an explicit
+    search location. ``cursor.agents.*`` then imports through the regular
+    path finder: agents use ``from .base import BaseAgent`` and every module is
+    imported once, whichever agent asks for it first.
+    """
+    if PACKAGE_NAME in sys.modules:
+        return
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME,
+        PACKAGE_ROOT / "__init__.py",
+        submodule_search_locations=[str(PACKAGE_ROOT)],
     )
-    if _base_spec is None or _base_spec.loader is None:
-        raise RuntimeError(f"unable to load base agent from {BASE_MODULE_PATH}")
-    _base_module = importlib.util.module_from_spec(_base_spec)
-    sys.modules[BASE_MODULE_ID] = _base_module
-    _base_spec.loader.exec_module(_base_module)
-BaseAgent = getattr(_base_module, "BaseAgent")
+    if spec is None or spec.loader is None:
+        raise RuntimeError(f"unable to load the {PACKAGE_NAME} package from {PACKAGE_ROOT}")
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = package
+    spec.loader.exec_module(package)
+
+
+def import_agents_module(name: str) -> ModuleType:
+    """Import ``cursor.agents.<name>``."""
+    ensure_package()
+    return importlib.import_module(f"{AGENTS_PACKAGE}.{name}")
+
+
+def base_agent_class() -> type:
+    """``BaseAgent``, importing ``base.py`` on first use."""
+    return import_agents_module("base").BaseAgent
+
+
+def __getattr__(name: str) -> Any:
+    # ``runner.BaseAgent`` keeps working without importing base.py eagerly.
+    if name == "BaseAgent":
+        return base_agent_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def load_registry() -> Dict[str, Any]:
-    if not REGISTRY_PATH.exists():
-        raise FileNotFoundError(f"registry not found at {REGISTRY_PATH}")
-    with REGISTRY_PATH.open("r", encoding="utf-8") as fh:
-        return json.load(fh)
+    """
+    Return the parsed registry, from the snapshot when it is still current.
+
+    The snapshot matches when registry.json's ``(mtime, size)`` is unchanged
+    (and the mtime was not racy when it was taken, see ``base.RACY_MTIME_NS``)
+    or, failing that, when the SHA-256 of the file still matches. Otherwise
+    the JSON is parsed and the snapshot rewritten; snapshot I/O errors never
+    affect the result.
+    """
+    try:
+        stat = REGISTRY_PATH.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"registry not found at {REGISTRY_PATH}") from None
+
+    snapshot = _read_registry_snapshot()
+    if (
+        snapshot is not None
+        and snapshot["mtime_ns"] == stat.st_mtime_ns
+        and snapshot["size"] == stat.st_size
+        and snapshot["trusted"]
+    ):
+        return snapshot["registry"]
+
+    import hashlib
+    import json
+
+    data = REGISTRY_PATH.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    if snapshot is not None and snapshot["sha256"] == digest:
+        registry = snapshot["registry"]
+    else:
+        registry = json.loads(data.decode("utf-8"))
+    # Decided here so the fast path above never imports base.py.
+    racy_ns = import_agents_module("base").RACY_MTIME_NS
+    _write_registry_snapshot(
+        {
+            "version": REGISTRY_SNAPSHOT_VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": digest,
+            "trusted": time.time_ns() - stat.st_mtime_ns >= racy_ns,
+            "registry": registry,
+        }
+    )
+    return registry
+
+
+def _read_registry_snapshot() -> Optional[Dict[str, Any]]:
+    try:
+        snapshot = marshal.loads(REGISTRY_SNAPSHOT_PATH.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != REGISTRY_SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def _write_registry_snapshot(snapshot: Dict[str, Any]) -> None:
+    tmp_path = REGISTRY_SNAPSHOT_PATH.with_name(f".{REGISTRY_SNAPSHOT_PATH.name}.{os.getpid()}")
+    try:
+        REGISTRY_SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_bytes(marshal.dumps(snapshot))
+        os.replace(tmp_path, REGISTRY_SNAPSHOT_PATH)
+    except (OSError, ValueError):
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
 
 
 def iter_agents(registry: Dict[str, Any]) -> Iterable[tuple[str, Dict[str, Any]]]:
@@ -56,7 +172,11 @@ def load_module(name: str, config: Dict[str, Any]) -> ModuleType:
             path = REPO_ROOT / path
         if not path.exists():
             raise FileNotFoundError(f"module path not found for agent '{name}': {path}")
+        if path.suffix == ".py" and path.resolve().parent == AGENTS_DIR:
+            return import_agents_module(path.stem)
 
+        # Out-of-tree agents can still ``from cursor.agents.base import BaseAgent``.
+        ensure_package()
         module_id = f"cursor_agent_{name.replace('-', '_')}"
         spec = importlib.util.spec_from_file_location(module_id, path)
         if spec is None or spec.loader is None:
@@ -67,21 +187,30 @@ def load_module(name: str, config: Dict[str, Any]) -> ModuleType:
         return module
 
     if module_name:
+        ensure_package()
         return importlib.import_module(module_name)
 
     raise ValueError(f"agent '{name}' missing module_path or module")
 
 
-def instantiate_agent(name: str, registry: Dict[str, Any]) -> BaseAgent:
+# Agent instances kept alive by ``serve``; keyed by agent name.
+_WARM_AGENTS: Dict[str, "BaseAgent"] = {}
+
+
+def instantiate_agent(name: str, registry: Dict[str, Any]) -> "BaseAgent":
     agents = registry.get("agents", {})
     if name not in agents:
         raise KeyError(f"agent '{name}' not found in registry")
 
     config = agents[name]
+    warm = _WARM_AGENTS.get(name)
+    if warm is not None and warm.config is config:
+        return warm
+
     class_name = config.get("class", "Agent")
     module = load_module(name, config)
     cls = getattr(module, class_name)
-    if not issubclass(cls, BaseAgent):
+    if not issubclass(cls, base_agent_class()):
         raise TypeError(f"{class_name} is not a BaseAgent subclass")
 
     return cls(name=name, config=config)
@@ -110,6 +239,11 @@ def build_main_parser() -> argparse.ArgumentParser:
     describe_parser.set_defaults(handler=handle_describe)
 
     run_parser = subparsers.add_parser("run", help="Execute an agent")
+    run_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always execute, ignoring the agent's cache_ttl result cache",
+    )
     run_parser.add_argument("agent", help="Agent name to execute")
     run_parser.add_argument(
         "agent_args",
@@ -118,6 +252,50 @@ def build_main_parser() -> argparse.ArgumentParser:
     )
     run_parser.set_defaults(handler=handle_run)
 
+    run_many_parser = subparsers.add_parser(
+        "run-many",
+        help="Execute several agents concurrently, honouring 'after' ordering",
+    )
+    run_many_parser.add_argument(
+        "agents",
+        nargs="*",
+        metavar="SPEC",
+        help="Independent steps as 'agent [args...]' (quote each spec)",
+    )
+    run_many_parser.add_argument(
+        "--plan",
+        help="JSON plan file ('-' for stdin): a list of steps or {\"jobs\": N, \"steps\": [...]}; "
+        "steps are specs or objects with agent, id, args and after",
+    )
+    run_many_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Maximum concurrent agents (default: plan 'jobs', else CPU count)",
+    )
+    run_many_parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="Skip steps that have not started once any step fails",
+    )
+    run_many_parser.add_argument(
+        "--summary-json",
+        metavar="PATH",
+        help="Write the JSON summary with timings to PATH ('-' for stdout)",
+    )
+    run_many_parser.set_defaults(handler=handle_run_many)
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Run a warm agent daemon on a Unix socket",
+    )
+    serve_parser.add_argument(
+        "--socket",
+        default=os.environ.get("CURSOR_AGENT_SOCKET", str(DEFAULT_SOCKET_PATH)),
+        help="Unix socket path to listen on (env: CURSOR_AGENT_SOCKET)",
+    )
+    serve_parser.set_defaults(handler=handle_serve)
+
     return parser
 
 
@@ -136,6 +314,8 @@ def handle_describe(args: argparse.Namespace, registry: Dict[str, Any]) -> int:
 
     config = agents[name]
     if args.format == "json":
+        import json
+
         json.dump(config, sys.stdout, indent=2, sort_keys=True)
         print()
     else:
@@ -160,6 +340,9 @@ def handle_describe(args: argparse.Namespace, registry: Dict[str, Any]) -> int:
         if state_file:
             lines.append(f"state_file: {state_file}")
 
+        if config.get("cache_ttl"):
+            lines.append(f"cache_ttl: {config['cache_ttl']}s")
+
         print("\n".join(lines))
     return 0
 
@@ -189,14 +372,54 @@ def handle_run(args: argparse.Namespace, registry: Dict[str, Any]) -> int:
         # Execute script with agent context
         return execute_script(script_content, agent, registry, script_path)
     
+    ttl = cache_ttl(args.agent, registry)
+    if ttl and not args.no_cache:
+        resultcache = import_agents_module("resultcache")
+        cache = resultcache.ResultCache(RESULT_CACHE_DIR, args.agent, ttl)
+        return cache.run(
+            agent_args,
+            registry["agents"][args.agent],
+            lambda: instantiate_agent(args.agent, registry).run(agent_args),
+        )
+
     # Normal agent execution
     agent = instantiate_agent(args.agent, registry)
     return agent.run(agent_args)
 
 
+def cache_ttl(name: str, registry: Dict[str, Any]) -> float:
+    """The agent's ``cache_ttl`` in seconds; 0 when results are not cached."""
+    value = registry.get("agents", {}).get(name, {}).get("cache_ttl", 0)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise SystemExit(f"agent '{name}': cache_ttl must be a non-negative number of seconds")
+    return float(value)
+
+
+def handle_run_many(args: argparse.Namespace, registry: Dict[str, Any]) -> int:
+    multirun = import_agents_module("multirun")
+    try:
+        plan = multirun.load_plan(args.plan) if args.plan else {"steps": []}
+        items = plan["steps"] + list(args.agents)
+        steps = [multirun.parse_step(item, index) for index, item in enumerate(items)]
+        if not steps:
+            raise ValueError("nothing to run; pass agent specs or --plan")
+        multirun.validate_steps(steps, registry.get("agents", {}))
+        plan_jobs = multirun.plan_jobs(plan)
+    except (OSError, ValueError) as exc:
+        print(f"run-many: {exc}", file=sys.stderr)
+        return 2
+
+    jobs = args.jobs or plan_jobs or os.cpu_count() or 1
+    runner = multirun.MultiRunner(steps, jobs=jobs, fail_fast=args.fail_fast)
+    summary = runner.run()
+    print(multirun.format_summary(summary), file=sys.stderr)
+    multirun.write_summary(summary, args.summary_json)
+    return summary["exit_code"]
+
+
 def execute_script(
     script_content: str,
-    agent: BaseAgent,
+    agent: "BaseAgent",
     registry: Dict[str, Any],
     script_path: Path,
 ) -> int:
@@ -218,15 +441,15 @@ def execute_script(
         "REPO_ROOT": REPO_ROOT,
         "Path": Path,
         "sys": sys,
-        "json": json,
     }
     
     # Add common imports to context
-    import os
+    import json
     import subprocess
     import tempfile
     context.update({
         "os": os,
+        "json": json,
         "subprocess": subprocess,
         "tempfile": tempfile,
     })
@@ -252,16 +475,50 @@ def execute_script(
         return 1
 
 
-def main(argv: Optional[Sequence[str]] = None) -> int:
+# -------------------------------------------------------------------- daemon
+def warm_agents(registry: Dict[str, Any]) -> None:
+    """Instantiate every registered agent so forked workers inherit them."""
+    _WARM_AGENTS.clear()
+    for name, _config in iter_agents(registry):
+        try:
+            _WARM_AGENTS[name] = instantiate_agent(name, registry)
+        except Exception as exc:  # noqa: BLE001 - loaded lazily per request instead
+            print(f"serve: unable to preload agent '{name}': {exc}", file=sys.stderr)
+
+
+def handle_serve(args: argparse.Namespace, registry: Dict[str, Any]) -> int:
+    daemon = import_agents_module("daemon")
+    return daemon.serve(
+        Path(args.socket),
+        registry_path=REGISTRY_PATH,
+        load_registry=load_registry,
+        warm_agents=warm_agents,
+        dispatch=dispatch,
+    )
+
+
+def dispatch(
+    argv: Optional[Sequence[str]],
+    registry: Optional[Dict[str, Any]] = None,
+    *,
+    allow_serve: bool = True,
+) -> int:
     parser = build_main_parser()
     args = parser.parse_args(argv)
-    registry = load_registry()
     handler = getattr(args, "handler", None)
     if handler is None:
         parser.error("no handler associated with command")
+    if handler is handle_serve and not allow_serve:
+        parser.error("serve cannot be forwarded to a running daemon")
+    if registry is None:
+        registry = load_registry()
     return handler(args, registry)
 
 
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    return dispatch(argv)
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
 
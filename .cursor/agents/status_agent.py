@@ -7,28 +7,15 @@ from __future__ import annotations
 
 import argparse
 import datetime as dt
-import importlib.util
 import os
 import subprocess
-import sys
 from pathlib import Path
 from typing import Dict, Sequence
 
-BASE_MODULE_PATH = Path(__file__).resolve().parent / "base.py"
-BASE_MODULE_ID = "cursor_agent_base"
-
-if BASE_MODULE_ID in sys.modules:
-    _base_module = sys.modules[BASE_MODULE_ID]
-else:
-    _base_spec = importlib.util.spec_from_file_location(
-        BASE_MODULE_ID, BASE_MODULE_PATH
-    )
-    if _base_spec is None or _base_spec.loader is None:
-        raise RuntimeError(f"unable to load base agent from {BASE_MODULE_PATH}")
-    _base_module = importlib.util.module_from_spec(_base_spec)
-    sys.modules[BASE_MODULE_ID] = _base_module
-    _base_spec.loader.exec_module(_base_module)
-BaseAgent = getattr(_base_module, "BaseAgent")
+if __package__:
+    from .base import BaseAgent
+else:  # executed as a script; .cursor/agents is sys.path[0]
+    from base import BaseAgent
 
 
 class StatusAgent(BaseAgent):
@@ -103,10 +90,7 @@ class StatusAgent(BaseAgent):
 
     def _log_event(self, message: str) -> None:
         timestamp = dt.datetime.now(dt.timezone.utc).isoformat()
-        entry = f"{timestamp} - status-agent - {message}"
-        self.changelog_path.parent.mkdir(parents=True, exist_ok=True)
-        with self.changelog_path.open("a", encoding="utf-8") as fh:
-            fh.write(entry + "\n")
+        self.changelog().append(f"{timestamp} - status-agent - {message}")
 
 
 def main(argv: Sequence[str] | None = None) -> int:
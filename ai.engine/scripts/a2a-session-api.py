@@ -1,23 +1,29 @@
 #!/usr/bin/env python3
 #
 # A2A Session Management API Server
-# HTTP API wrapper for a2a-session.sh
+# HTTP API over the a2a-session.sh session directory, served in-process by
+# a2a_session_store (no subprocess per request)
 #
 # Usage:
 #   python3 a2a-session-api.py
 #   Listens on http://0.0.0.0:8082
 #
 
-import json
-import subprocess
 import sys
+import time
 from flask import Flask, request, jsonify
 from pathlib import Path
 
+SCRIPT_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from a2a_session_store import (  # noqa: E402
+    SessionNotFound, SessionStore, list_sessions_from_query
+)
+
 app = Flask(__name__)
 
-SCRIPT_DIR = Path(__file__).parent
-A2A_SESSION_SCRIPT = SCRIPT_DIR / "a2a-session.sh"
+store = SessionStore()
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -28,33 +34,25 @@ def create_session():
     """Create a new A2A session"""
     try:
         data = request.get_json() or {}
-        task_id = data.get('task_id', f'task-{int(__import__("time").time())}')
-        task_metadata = json.dumps(data.get('task_metadata', {
+        task_id = data.get('task_id', f'task-{int(time.time())}')
+        task_metadata = data.get('task_metadata', {
             'type': data.get('task_type', 'single-agent'),
             'priority': data.get('priority', 'normal'),
             'timeout': data.get('timeout', 3600),
             'agents': data.get('agents', [])
-        }))
-        
-        # Call a2a-session.sh create
-        result = subprocess.run(
-            [str(A2A_SESSION_SCRIPT), 'create', task_id, task_metadata],
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        })
         
-        session_id = result.stdout.strip()
+        session = store.create(task_id, task_metadata)
         
         return jsonify({
             "status": "success",
-            "session_id": session_id,
+            "session_id": session['session_id'],
             "task_id": task_id
         })
-    except subprocess.CalledProcessError as e:
+    except OSError as e:
         return jsonify({
             "status": "error",
-            "message": f"Failed to create session: {e.stderr}"
+            "message": f"Failed to create session: {e}"
         }), 500
     except Exception as e:
         return jsonify({
@@ -62,28 +60,27 @@ def create_session():
             "message": str(e)
         }), 500
 
+@app.route('/api/v1/sessions', methods=['GET'])
+def list_sessions():
+    """List sessions from the session index with filters and cursor pagination"""
+    body, status = list_sessions_from_query(store, request.args)
+    return jsonify(body), status
+
 @app.route('/api/v1/sessions/<session_id>', methods=['GET'])
 def get_session(session_id):
     """Get session data"""
     try:
-        result = subprocess.run(
-            [str(A2A_SESSION_SCRIPT), 'get', session_id],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        
-        session_data = json.loads(result.stdout)
+        session_data = store.get(session_id)
         return jsonify({
             "status": "success",
             "session": session_data
         })
-    except subprocess.CalledProcessError as e:
+    except SessionNotFound:
         return jsonify({
             "status": "error",
             "message": f"Session not found: {session_id}"
         }), 404
-    except json.JSONDecodeError:
+    except ValueError:
         return jsonify({
             "status": "error",
             "message": "Invalid session data"
@@ -109,28 +106,23 @@ def update_session(session_id):
                 "message": "agent_id required"
             }), 400
         
-        # Call a2a-session.sh update
-        cmd = [str(A2A_SESSION_SCRIPT), 'update', session_id, agent_id, status]
-        if output_file:
-            cmd.append(output_file)
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        store.update(session_id, agent_id, status, output_file)
         
         return jsonify({
             "status": "success",
-            "message": result.stdout.strip(),
+            "message": f"Session updated: {session_id}",
             "session_id": session_id,
             "agent_id": agent_id
         })
-    except subprocess.CalledProcessError as e:
+    except SessionNotFound:
         return jsonify({
             "status": "error",
-            "message": f"Failed to update session: {e.stderr}"
+            "message": f"Session not found: {session_id}"
+        }), 404
+    except (OSError, ValueError) as e:
+        return jsonify({
+            "status": "error",
+            "message": f"Failed to update session: {e}"
         }), 500
     except Exception as e:
         return jsonify({
@@ -142,22 +134,16 @@ def update_session(session_id):
 def delete_session(session_id):
     """Delete a session"""
     try:
-        result = subprocess.run(
-            [str(A2A_SESSION_SCRIPT), 'delete', session_id],
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        if not store.delete(session_id):
+            return jsonify({
+                "status": "error",
+                "message": "Session not found"
+            }), 404
         
         return jsonify({
             "status": "success",
-            "message": result.stdout.strip()
+            "message": f"Session deleted: {session_id}"
         })
-    except subprocess.CalledProcessError:
-        return jsonify({
-            "status": "error",
-            "message": "Session not found"
-        }), 404
     except Exception as e:
         return jsonify({
             "status": "error",
@@ -165,15 +151,7 @@ def delete_session(session_id):
         }), 500
 
 if __name__ == '__main__':
-    # Check if script exists
-    if not A2A_SESSION_SCRIPT.exists():
-        print(f"Error: a2a-session.sh not found at {A2A_SESSION_SCRIPT}", file=sys.stderr)
-        sys.exit(1)
-    
-    # Make script executable
-    A2A_SESSION_SCRIPT.chmod(0o755)
-    
     print(f"A2A Session API Server starting on http://0.0.0.0:8082")
-    print(f"Using script: {A2A_SESSION_SCRIPT}")
-    app.run(host='0.0.0.0', port=8082, debug=False)
+    print(f"Using sessions directory: {store.sessions_dir}")
+    app.run(host='0.0.0.0', port=8082, debug=False, threaded=True)
 
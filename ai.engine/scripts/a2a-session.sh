@@ -9,18 +9,43 @@
 #   a2a-session.sh update <session_id> <agent_id> <status> [output_file]
 #   a2a-session.sh delete <session_id>
 #   a2a-session.sh cleanup [max_age_hours]
+#   a2a-session.sh cleanup-expired
+#
+# Set A2A_SESSION_STORAGE=journal to append agent updates to
+# <session_id>.journal instead of rewriting the session JSON (see
+# a2a_session_store.py, which compacts journals into the snapshot).
 #
 
 set -euo pipefail
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 INFRA_DIR="/root/infra"
-SESSIONS_DIR="${INFRA_DIR}/.workspace/a2a-sessions"
+SESSIONS_DIR="${A2A_SESSIONS_DIR:-${INFRA_DIR}/.workspace/a2a-sessions}"
 SESSION_TIMEOUT=3600  # 1 hour in seconds
+STORAGE="${A2A_SESSION_STORAGE:-snapshot}"
+EXPIRY_INDEX="${SESSIONS_DIR}/.expiry-index"
+# Appends and rewrites of the index take this lock (shared with
+# a2a_session_store.py); the index itself is replaced on rewrite.
+EXPIRY_LOCK="${SESSIONS_DIR}/.expiry-index.lock"
 
 # Ensure sessions directory exists
 mkdir -p "$SESSIONS_DIR"
 
+# Lock the expiry index; call inside a group redirected with 9>>"$EXPIRY_LOCK"
+lock_expiry_index() {
+    if command -v flock >/dev/null 2>&1; then
+        flock 9
+    fi
+}
+
+# Lock a session (shared with a2a_session_store.py); call inside a group
+# redirected with 9>>"${SESSIONS_DIR}/<session_id>.journal.lock"
+lock_session() {
+    if command -v flock >/dev/null 2>&1; then
+        flock "$@" 9
+    fi
+}
+
 # Generate session ID
 generate_session_id() {
     local timestamp=$(date -u +%Y%m%d%H%M%S)
@@ -31,7 +56,9 @@ generate_session_id() {
 # Create new session
 create_session() {
     local task_id="${1:-task-$(uuidgen 2>/dev/null || echo "task-$(date +%s)")}"
-    local task_metadata="${2:-{}}"
+    # "${2:-{}}" would append a stray "}" to any supplied metadata
+    local task_metadata="${2:-}"
+    [ -n "$task_metadata" ] || task_metadata='{}'
     local session_id=$(generate_session_id)
     local expires_at=$(date -u -d "+1 hour" +"%Y-%m-%dT%H:%M:%SZ" 2>/dev/null || date -u -v+1H +"%Y-%m-%dT%H:%M:%SZ" 2>/dev/null || echo "$(date -u +"%Y-%m-%dT%H:%M:%SZ")")
     
@@ -54,6 +81,10 @@ create_session() {
   "status": "active"
 }
 EOF
+    {
+        lock_expiry_index
+        echo "$(( $(date +%s) + SESSION_TIMEOUT )) $session_id" >> "$EXPIRY_INDEX"
+    } 9>>"$EXPIRY_LOCK"
     
     echo "$session_id"
 }
@@ -68,7 +99,20 @@ get_session() {
         exit 1
     fi
     
-    cat "$session_file"
+    local journal="${SESSIONS_DIR}/${session_id}.journal"
+    if command -v jq >/dev/null 2>&1 && { [ -s "$journal" ] || [ -s "${journal}.compacting" ]; }; then
+        # Fold pending journal entries into the output without rewriting the
+        # file. A .compacting batch whose fold_id the snapshot already records
+        # was written by a fold that crashed before removing it.
+        jq --slurpfile folding <(cat "${journal}.compacting" 2>/dev/null) \
+            --slurpfile entries <(cat "$journal" 2>/dev/null) \
+            '([$folding[] | select(has("fold_id")) | .fold_id][0]) as $fold_id
+             | ((if $fold_id != null and .journal_fold == $fold_id then []
+                 else [$folding[] | select(has("fold_id") | not)] end) + $entries) as $new
+             | .agents += $new | .context.previous_agents += $new' "$session_file"
+    else
+        cat "$session_file"
+    fi
 }
 
 # Update session with agent result
@@ -84,8 +128,24 @@ update_session() {
         exit 1
     fi
     
+    if [ "$STORAGE" = "journal" ]; then
+        # One O_APPEND write per update; compaction happens on read. The
+        # shared lock keeps the append out of a concurrent fold.
+        {
+            lock_session -s
+            if command -v jq >/dev/null 2>&1; then
+                jq -cn --arg agent_id "$agent_id" --arg status "$status" --arg output_file "$output_file" \
+                    --arg timestamp "$(date -u +"%Y-%m-%dT%H:%M:%SZ")" \
+                    '{agent_id: $agent_id, status: $status, output_file: $output_file, timestamp: $timestamp}' \
+                    >> "${SESSIONS_DIR}/${session_id}.journal"
+            else
+                printf '{"agent_id":"%s","status":"%s","output_file":"%s","timestamp":"%s"}\n' \
+                    "$agent_id" "$status" "$output_file" "$(date -u +"%Y-%m-%dT%H:%M:%SZ")" \
+                    >> "${SESSIONS_DIR}/${session_id}.journal"
+            fi
+        } 9>>"${SESSIONS_DIR}/${session_id}.journal.lock"
     # Use jq to update session if available, otherwise use sed
-    if command -v jq >/dev/null 2>&1; then
+    elif command -v jq >/dev/null 2>&1; then
         local agent_entry=$(cat <<EOF
 {
   "agent_id": "$agent_id",
@@ -95,7 +155,10 @@ update_session() {
 }
 EOF
 )
-        jq --argjson agent "$agent_entry" '.agents += [$agent] | .context.previous_agents += [$agent]' "$session_file" > "${session_file}.tmp" && mv "${session_file}.tmp" "$session_file"
+        {
+            lock_session
+            jq --argjson agent "$agent_entry" '.agents += [$agent] | .context.previous_agents += [$agent]' "$session_file" > "${session_file}.tmp" && mv "${session_file}.tmp" "$session_file"
+        } 9>>"${SESSIONS_DIR}/${session_id}.journal.lock"
     else
         # Fallback: append to agents array manually
         local agent_entry="{\"agent_id\":\"$agent_id\",\"status\":\"$status\",\"output_file\":\"$output_file\",\"timestamp\":\"$(date -u +"%Y-%m-%dT%H:%M:%SZ")\"}"
@@ -112,7 +175,7 @@ delete_session() {
     local session_file="${SESSIONS_DIR}/${session_id}.json"
     
     if [ -f "$session_file" ]; then
-        rm -f "$session_file"
+        rm -f "$session_file" "${SESSIONS_DIR:?}/${session_id:?}.journal" "${SESSIONS_DIR:?}/${session_id:?}.journal.compacting" "${SESSIONS_DIR:?}/${session_id:?}.journal.lock"
         echo "Session deleted: $session_id"
     else
         echo "Warning: Session not found: $session_id" >&2
@@ -130,7 +193,7 @@ cleanup_sessions() {
         if [ -f "$session_file" ]; then
             local file_age=$(($current_time - $(stat -c %Y "$session_file" 2>/dev/null || stat -f %m "$session_file" 2>/dev/null)))
             if [ $file_age -gt $max_age_seconds ]; then
-                rm -f "$session_file"
+                rm -f "$session_file" "${session_file%.json}.journal" "${session_file%.json}.journal.compacting" "${session_file%.json}.journal.lock"
                 cleaned=$((cleaned + 1))
             fi
         fi
@@ -139,11 +202,40 @@ cleanup_sessions() {
     echo "Cleaned up $cleaned expired sessions"
 }
 
+# Cleanup sessions past expires_at using the expiry index (no per-file reads)
+cleanup_expired_sessions() {
+    local current_time=$(date +%s)
+    local cleaned=0
+    local survivors="${EXPIRY_INDEX}.tmp.$$"
+    
+    if [ ! -f "$EXPIRY_INDEX" ]; then
+        echo "Cleaned up 0 expired sessions"
+        return
+    fi
+    
+    {
+        lock_expiry_index
+        : > "$survivors"
+        while read -r expires session_id; do
+            [ -n "${session_id:-}" ] || continue
+            if [ "$expires" -gt "$current_time" ]; then
+                echo "$expires $session_id" >> "$survivors"
+            elif [ -f "${SESSIONS_DIR}/${session_id}.json" ]; then
+                rm -f "${SESSIONS_DIR:?}/${session_id:?}.json" "${SESSIONS_DIR:?}/${session_id:?}.journal" "${SESSIONS_DIR:?}/${session_id:?}.journal.compacting" "${SESSIONS_DIR:?}/${session_id:?}.journal.lock"
+                cleaned=$((cleaned + 1))
+            fi
+        done < "$EXPIRY_INDEX"
+        mv "$survivors" "$EXPIRY_INDEX"
+    } 9>>"$EXPIRY_LOCK"
+    
+    echo "Cleaned up $cleaned expired sessions"
+}
+
 # Main
 main() {
     case "${1:-}" in
         create)
-            create_session "${2:-}" "${3:-{}}"
+            create_session "${2:-}" "${3:-}"
             ;;
         get)
             if [ -z "${2:-}" ]; then
@@ -169,6 +261,9 @@ main() {
         cleanup)
             cleanup_sessions "${2:-24}"
             ;;
+        cleanup-expired)
+            cleanup_expired_sessions
+            ;;
         *)
             cat <<EOF
 Usage: $0 <command> [args]
@@ -179,6 +274,7 @@ Commands:
   update <session_id> <agent_id> <status> [output_file]  - Update session
   delete <session_id>                     - Delete session
   cleanup [max_age_hours]                 - Cleanup expired sessions (default: 24)
+  cleanup-expired                         - Cleanup sessions past expires_at (uses .expiry-index)
 
 Examples:
   $0 create "task-123" '{"priority":"normal","timeout":3600}'
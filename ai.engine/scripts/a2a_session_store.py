@@ -0,0 +1,721 @@
+#!/usr/bin/env python3
+#
+# A2A Session Store
+# In-process replacement for the a2a-session.sh subprocess calls made by the
+# session HTTP APIs. Keeps the on-disk layout and JSON schema of
+# a2a-session.sh (one <session_id>.json per session under
+# .workspace/a2a-sessions) so the shell script and the APIs can share the
+# directory.
+#
+# Sessions are cached in memory and revalidated against the file's stat
+# signature, so edits made by a2a-session.sh are picked up. Writes go to a
+# temp file that is fsync'd and renamed over the session file; updates to one
+# session are serialized by a per-session lock.
+#
+# Storage modes (A2A_SESSION_STORAGE, same variable as a2a-session.sh):
+#   snapshot  every update rewrites <session_id>.json (default)
+#   journal   every update appends one JSON line to <session_id>.journal;
+#             the journal is folded into the snapshot on get and every
+#             COMPACT_EVERY updates, so orchestrator sessions with many
+#             agents no longer rewrite the whole document per result.
+#             A fold tags the renamed journal with a {"fold_id": ...} line
+#             and records that id as "journal_fold" in the snapshot, so a
+#             fold retried after a crash is skipped by id, not by content.
+#
+# Created sessions are also appended to .expiry-index ("<epoch> <session_id>"
+# per line) so cleanup_expired() can expire by expires_at without opening
+# every session file. Appends and the cleanup rewrite hold an flock on
+# .expiry-index.lock (the index itself is replaced on rewrite), shared with
+# a2a-session.sh and every process using this store.
+#
+# Session metadata (status, task_id, created_at, agent IDs) is mirrored into a
+# SQLite index (index.sqlite3 in the sessions directory) on create, update and
+# delete, so list_sessions() can filter and paginate without a directory walk.
+# Sessions written by a2a-session.sh are picked up by sync_index(), which runs
+# when the store starts and again before a listing whenever the directory
+# mtime or the size of a pending journal has changed since the last sync.
+#
+
+import base64
+import contextlib
+import fcntl
+import json
+import os
+import re
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+INFRA_DIR = Path(os.environ.get('INFRA_DIR', '/root/infra'))
+DEFAULT_SESSIONS_DIR = Path(
+    os.environ.get('A2A_SESSIONS_DIR', INFRA_DIR / '.workspace' / 'a2a-sessions')
+)
+SESSION_TIMEOUT = 3600  # 1 hour in seconds, same as a2a-session.sh
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+# Names generate_session_id() (and a2a-session.sh) produce; sync_index only
+# scans these, skipping agent output files that share the directory.
+GENERATED_SESSION_ID_PATTERN = re.compile(r'^a2a-[0-9]{14}-[0-9a-f]{8}$')
+STORAGE_MODES = ('snapshot', 'journal')
+DEFAULT_STORAGE = os.environ.get('A2A_SESSION_STORAGE', 'snapshot')
+COMPACT_EVERY = 50
+EXPIRY_INDEX_NAME = '.expiry-index'
+EXPIRY_LOCK_NAME = '.expiry-index.lock'
+SESSION_INDEX_NAME = 'index.sqlite3'
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class SessionNotFound(KeyError):
+    """Raised when a session file does not exist"""
+
+
+def utc_timestamp(epoch=None):
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(epoch))
+
+
+def generate_session_id():
+    return f"a2a-{time.strftime('%Y%m%d%H%M%S', time.gmtime())}-{secrets.token_hex(4)}"
+
+
+def validate_timestamp(value):
+    """Raise ValueError unless value uses the session timestamp format"""
+    time.strptime(value, TIMESTAMP_FORMAT)
+    return value
+
+
+def encode_cursor(created_at, session_id):
+    raw = json.dumps([created_at, session_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        created_at, session_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError(f"invalid cursor: {cursor}") from None
+    return str(created_at), str(session_id)
+
+
+class SessionIndex:
+    """SQLite index of session metadata used for listing and filtering"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            task_id TEXT,
+            status TEXT,
+            created_at TEXT,
+            expires_at TEXT,
+            agent_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS session_agents (
+            session_id TEXT NOT NULL,
+            agent_id TEXT NOT NULL,
+            PRIMARY KEY (session_id, agent_id)
+        );
+        CREATE INDEX IF NOT EXISTS sessions_created ON sessions (created_at, session_id);
+        CREATE INDEX IF NOT EXISTS sessions_status ON sessions (status, created_at);
+        CREATE INDEX IF NOT EXISTS sessions_task ON sessions (task_id, created_at);
+        CREATE INDEX IF NOT EXISTS session_agents_agent ON session_agents (agent_id);
+        CREATE TABLE IF NOT EXISTS ignored_files (
+            name TEXT PRIMARY KEY,
+            signature TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS synced_files (
+            session_id TEXT PRIMARY KEY,
+            signature TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        # One shared connection guarded by a lock; WAL lets the two API
+        # servers (and readers) share the file across processes.
+        self._conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+
+    def upsert(self, session):
+        agents = session.get('agents') or []
+        agent_ids = {entry.get('agent_id') for entry in agents if entry.get('agent_id')}
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO sessions '
+                '(session_id, task_id, status, created_at, expires_at, agent_count) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (session['session_id'], session.get('task_id'), session.get('status'),
+                 session.get('created_at'), session.get('expires_at'), len(agents))
+            )
+            self._conn.execute('DELETE FROM session_agents WHERE session_id = ?',
+                               (session['session_id'],))
+            self._conn.executemany(
+                'INSERT INTO session_agents (session_id, agent_id) VALUES (?, ?)',
+                [(session['session_id'], agent_id) for agent_id in sorted(agent_ids)]
+            )
+
+    def add_agent(self, session_id, agent_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE sessions SET agent_count = agent_count + 1 WHERE session_id = ?',
+                (session_id,)
+            )
+            self._conn.execute(
+                'INSERT OR IGNORE INTO session_agents (session_id, agent_id) VALUES (?, ?)',
+                (session_id, agent_id)
+            )
+
+    def remove(self, session_id):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+            self._conn.execute('DELETE FROM session_agents WHERE session_id = ?', (session_id,))
+            self._conn.execute('DELETE FROM synced_files WHERE session_id = ?', (session_id,))
+
+    def session_ids(self):
+        with self._lock:
+            return {row[0] for row in self._conn.execute('SELECT session_id FROM sessions')}
+
+    def ignored_files(self):
+        """name -> stat signature of session-named files that are not sessions"""
+        with self._lock:
+            return dict(self._conn.execute('SELECT name, signature FROM ignored_files'))
+
+    def ignore_file(self, name, signature):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO ignored_files (name, signature) VALUES (?, ?)',
+                (name, signature)
+            )
+
+    def forget_ignored(self, names):
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM ignored_files WHERE name = ?',
+                                   [(name,) for name in names])
+
+    def synced_files(self):
+        """session_id -> file signature the indexed row was last read from"""
+        with self._lock:
+            return dict(self._conn.execute('SELECT session_id, signature FROM synced_files'))
+
+    def mark_synced(self, session_id, signature):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO synced_files (session_id, signature) VALUES (?, ?)',
+                (session_id, signature)
+            )
+
+    def query(self, status=None, task_id=None, agent_id=None, created_after=None,
+              created_before=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Return (rows, next_cursor), newest first"""
+        clauses = []
+        params = []
+        if status:
+            clauses.append('s.status = ?')
+            params.append(status)
+        if task_id:
+            clauses.append('s.task_id = ?')
+            params.append(task_id)
+        if agent_id:
+            clauses.append(
+                'EXISTS (SELECT 1 FROM session_agents a '
+                'WHERE a.session_id = s.session_id AND a.agent_id = ?)'
+            )
+            params.append(agent_id)
+        if created_after:
+            clauses.append('s.created_at >= ?')
+            params.append(created_after)
+        if created_before:
+            clauses.append('s.created_at < ?')
+            params.append(created_before)
+        if cursor:
+            last_created, last_id = decode_cursor(cursor)
+            clauses.append('(s.created_at < ? OR (s.created_at = ? AND s.session_id < ?))')
+            params.extend([last_created, last_created, last_id])
+
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        sql = (
+            'SELECT s.session_id, s.task_id, s.status, s.created_at, s.expires_at, '
+            's.agent_count FROM sessions s'
+        )
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY s.created_at DESC, s.session_id DESC LIMIT ?'
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        keys = ('session_id', 'task_id', 'status', 'created_at', 'expires_at', 'agent_count')
+        sessions = [dict(zip(keys, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = sessions[-1]
+            next_cursor = encode_cursor(last['created_at'], last['session_id'])
+        return sessions, next_cursor
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def list_sessions_from_query(store, args):
+    """
+    Serve GET /api/v1/sessions for the session APIs: parse the query
+    arguments, query the store and return (response body, HTTP status)
+    """
+    try:
+        filters = {
+            'status': args.get('status'),
+            'task_id': args.get('task_id'),
+            'agent_id': args.get('agent_id'),
+            'created_after': args.get('created_after'),
+            'created_before': args.get('created_before'),
+            'cursor': args.get('cursor'),
+            'limit': int(args.get('limit', DEFAULT_PAGE_SIZE))
+        }
+        for key in ('created_after', 'created_before'):
+            if filters[key]:
+                validate_timestamp(filters[key])
+        sessions, next_cursor = store.list_sessions(**filters)
+    except ValueError as e:
+        return {
+            "status": "error",
+            "message": f"Invalid query: {e}"
+        }, 400
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }, 500
+
+    return {
+        "status": "success",
+        "sessions": sessions,
+        "count": len(sessions),
+        "next_cursor": next_cursor
+    }, 200
+
+
+class SessionStore:
+    """Thread-safe store for A2A session JSON documents"""
+
+    def __init__(self, sessions_dir=DEFAULT_SESSIONS_DIR, storage=DEFAULT_STORAGE,
+                 compact_every=COMPACT_EVERY, index=True):
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"unknown session storage mode: {storage}")
+        self.sessions_dir = Path(sessions_dir)
+        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        self.storage = storage
+        self.compact_every = compact_every
+        self.expiry_index = self.sessions_dir / EXPIRY_INDEX_NAME
+        self.expiry_lock = self.sessions_dir / EXPIRY_LOCK_NAME
+        self._cache = {}  # session_id -> (stat signature, session dict)
+        self._pending = {}  # session_id -> journal entries appended since compaction
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._expiry_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_marker = None  # _index_marker() as of the last sync_index()
+        self._synced_journals = ()
+        self.index = None
+        if index:
+            self.index = SessionIndex(self.sessions_dir / SESSION_INDEX_NAME)
+            self.sync_index()
+
+    # ------------------------------------------------------------------ helpers
+    def _path(self, session_id):
+        if not SESSION_ID_PATTERN.match(session_id or ''):
+            raise SessionNotFound(session_id)
+        return self.sessions_dir / f'{session_id}.json'
+
+    def _journal_path(self, session_id):
+        return self._path(session_id).with_suffix('.journal')
+
+    def _session_lock_path(self, session_id):
+        # flock'ed by every process that rewrites the snapshot or folds the
+        # journal, and shared by journal appenders (a2a-session.sh uses fd 9)
+        return self._path(session_id).with_suffix('.journal.lock')
+
+    @staticmethod
+    def _append_line(path, line):
+        """Append one line with a single O_APPEND write"""
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode('utf-8'))
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _flock(path, shared=False):
+        """Hold an advisory lock on path (exclusive unless shared) across processes"""
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    @contextlib.contextmanager
+    def _expiry_locked(self):
+        with self._expiry_lock, self._flock(self.expiry_lock):
+            yield
+
+    @staticmethod
+    def _apply_entries(session, entries):
+        agents = session.setdefault('agents', [])
+        previous = session.setdefault('context', {}).setdefault('previous_agents', [])
+        for entry in entries:
+            agents.append(entry)
+            previous.append(dict(entry))
+
+    def _lock(self, session_id):
+        with self._locks_guard:
+            lock = self._locks.get(session_id)
+            if lock is None:
+                lock = self._locks[session_id] = threading.Lock()
+            return lock
+
+    @staticmethod
+    def _signature(stat):
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, session_id):
+        """Return the cached session, re-reading the file if it changed on disk"""
+        path = self._path(session_id)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._cache.pop(session_id, None)
+            raise SessionNotFound(session_id) from None
+
+        signature = self._signature(stat)
+        cached = self._cache.get(session_id)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        with path.open('r', encoding='utf-8') as fh:
+            session = json.load(fh)
+        if not isinstance(session, dict):
+            raise ValueError(f"{path}: not a session document")
+        self._cache[session_id] = (signature, session)
+        self._index_session(session_id, session)
+        return session
+
+    def _index_session(self, session_id, session):
+        # Agent output files (<session_id>-<agent>.json) share the directory
+        if self.index and session.get('session_id') == session_id:
+            self.index.upsert(session)
+
+    def _compact(self, session_id):
+        """Fold the session journal into the snapshot (caller holds the lock)"""
+        journal = self._journal_path(session_id)
+        # The thread lock only covers this process; other stores (both API
+        # servers) fold the same journal, so folds also take a per-session flock.
+        with self._flock(self._session_lock_path(session_id)):
+            self._compact_locked(session_id, journal)
+
+    def _compact_locked(self, session_id, journal):
+        compacting = journal.with_suffix('.journal.compacting')
+        # Renaming first lets concurrent appenders (a2a-session.sh) start a
+        # fresh journal instead of racing with the fold. A leftover
+        # .compacting file means an earlier fold crashed and is retried here.
+        if not compacting.exists():
+            try:
+                os.replace(journal, compacting)
+            except FileNotFoundError:
+                self._pending.pop(session_id, None)
+                return
+
+        entries = []
+        fold_id = None
+        with compacting.open('r', encoding='utf-8') as fh:
+            for line in fh:
+                line = line.strip()
+                if line:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn trailing write
+                    if isinstance(entry, dict) and 'fold_id' in entry:
+                        fold_id = entry['fold_id']
+                    else:
+                        entries.append(entry)
+        if fold_id is None:
+            # Tag this batch before the snapshot can include it; appenders
+            # are excluded by the session flock the caller holds.
+            fold_id = secrets.token_hex(8)
+            with compacting.open('a', encoding='utf-8') as fh:
+                fh.write(json.dumps({'fold_id': fold_id}) + '\n')
+                fh.flush()
+                os.fsync(fh.fileno())
+
+        session = json.loads(json.dumps(self._load(session_id)))
+        # A crashed fold may already have written this batch into the snapshot.
+        if entries and session.get('journal_fold') != fold_id:
+            self._apply_entries(session, entries)
+            session['journal_fold'] = fold_id
+            self._write(session_id, session)
+        compacting.unlink(missing_ok=True)
+        self._pending.pop(session_id, None)
+
+    def _has_journal(self, session_id):
+        journal = self._journal_path(session_id)
+        return journal.exists() or journal.with_suffix('.journal.compacting').exists()
+
+    def _write(self, session_id, session):
+        """Atomically persist a session: temp file, fsync, rename"""
+        path = self._path(session_id)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.sessions_dir, prefix=f'.{session_id}.', suffix='.tmp'
+        )
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+                json.dump(session, fh, indent=2)
+                fh.write('\n')
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self._cache[session_id] = (self._signature(path.stat()), session)
+        self._index_session(session_id, session)
+
+    # ------------------------------------------------------------------ commands
+    def create(self, task_id=None, task_metadata=None):
+        """Create a new session and return its document"""
+        now = time.time()
+        session_id = generate_session_id()
+        session = {
+            'session_id': session_id,
+            'orchestrator': 'orchestrator-agent',
+            'created_at': utc_timestamp(now),
+            'expires_at': utc_timestamp(now + SESSION_TIMEOUT),
+            'task_id': task_id or f'task-{int(now)}',
+            'task_metadata': task_metadata if task_metadata is not None else {},
+            'agents': [],
+            'context': {
+                'previous_agents': [],
+                'shared_data': {},
+                'constraints': {}
+            },
+            'status': 'active'
+        }
+        with self._lock(session_id):
+            self._write(session_id, session)
+        with self._expiry_locked():
+            self._append_line(
+                self.expiry_index, f"{int(now + SESSION_TIMEOUT)} {session_id}\n"
+            )
+        return session
+
+    def get(self, session_id):
+        """Return a copy of the session document, compacting any journal first"""
+        with self._lock(session_id):
+            if self._has_journal(session_id):
+                self._compact(session_id)
+            return json.loads(json.dumps(self._load(session_id)))
+
+    def update(self, session_id, agent_id, status, output_file=''):
+        """Record an agent result on the session and return the agent entry"""
+        entry = {
+            'agent_id': agent_id,
+            'status': status,
+            'output_file': output_file or '',
+            'timestamp': utc_timestamp()
+        }
+        with self._lock(session_id):
+            if self.storage == 'journal':
+                if not self._path(session_id).exists():
+                    raise SessionNotFound(session_id)
+                # Shared with other appenders; excludes a fold, which would
+                # otherwise unlink a .compacting file this write landed in.
+                with self._flock(self._session_lock_path(session_id), shared=True):
+                    self._append_line(
+                        self._journal_path(session_id),
+                        json.dumps(entry, separators=(',', ':')) + '\n'
+                    )
+                pending = self._pending.get(session_id, 0) + 1
+                self._pending[session_id] = pending
+                if self.index:
+                    self.index.add_agent(session_id, agent_id)
+                if pending >= self.compact_every:
+                    self._compact(session_id)
+                return entry
+
+            # Other processes rewrite the same snapshot; hold the session flock
+            # from load to rename so no update is overwritten.
+            with self._flock(self._session_lock_path(session_id)):
+                session = json.loads(json.dumps(self._load(session_id)))
+                self._apply_entries(session, [entry])
+                self._write(session_id, session)
+        return entry
+
+    def delete(self, session_id):
+        """Delete a session; returns False if it did not exist"""
+        with self._lock(session_id):
+            self._cache.pop(session_id, None)
+            self._pending.pop(session_id, None)
+            try:
+                path = self._path(session_id)
+            except SessionNotFound:
+                return False
+            if self.index:
+                self.index.remove(session_id)
+            journal = self._journal_path(session_id)
+            for leftover in (journal, journal.with_suffix('.journal.compacting'),
+                             journal.with_suffix('.journal.lock')):
+                try:
+                    leftover.unlink()
+                except FileNotFoundError:
+                    pass
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                return False
+        with self._locks_guard:
+            self._locks.pop(session_id, None)
+        return True
+
+    def list_sessions(self, **filters):
+        """Query the session index; see SessionIndex.query for filters"""
+        if not self.index:
+            raise RuntimeError('session index is disabled')
+        if self._index_marker(self._synced_journals) != self._synced_marker:
+            self.sync_index()
+        return self.index.query(**filters)
+
+    def _index_marker(self, journals):
+        """
+        Cheap change check for sync_index: the directory mtime moves when
+        a2a-session.sh creates, renames or removes a file, but appends to an
+        existing journal only show up in the journal's own size.
+        """
+        sizes = []
+        for journal in journals:
+            try:
+                sizes.append(journal.stat().st_size)
+            except OSError:
+                sizes.append(-1)
+        return (self.sessions_dir.stat().st_mtime_ns, tuple(sizes))
+
+    def _file_signature(self, session_id):
+        """Stat signature of a session's snapshot and journal, as a string"""
+        path = self._path(session_id)
+        parts = [':'.join(map(str, self._signature(path.stat())))]
+        try:
+            parts.append(':'.join(map(str, self._signature(
+                self._journal_path(session_id).stat()))))
+        except FileNotFoundError:
+            pass
+        return '|'.join(parts)
+
+    def sync_index(self):
+        """
+        Reconcile the index with the directory (sessions made, updated or
+        removed by a2a-session.sh). Sessions whose snapshot or journal changed
+        since they were last indexed are re-read; session-named files that
+        turn out not to be sessions are remembered by stat signature and not
+        parsed again until they change.
+        """
+        with self._sync_lock:
+            # Taken before the scan, so a change racing with it triggers
+            # another sync on the next listing.
+            journals = tuple(sorted(self.sessions_dir.glob('a2a-*.journal')))
+            marker = self._index_marker(journals)
+
+            indexed = self.index.session_ids()
+            on_disk = {
+                path.stem for path in self.sessions_dir.glob('a2a-*.json')
+                if GENERATED_SESSION_ID_PATTERN.match(path.stem)
+            }
+            for session_id in indexed - on_disk:
+                self.index.remove(session_id)
+            ignored = self.index.ignored_files()
+            self.index.forget_ignored(set(ignored) - on_disk)
+            synced = self.index.synced_files()
+            for session_id in sorted(on_disk):
+                try:
+                    signature = self._file_signature(session_id)
+                except OSError:
+                    continue
+                if session_id in indexed:
+                    if synced.get(session_id) == signature:
+                        continue
+                elif ignored.get(session_id) == signature:
+                    continue
+                try:
+                    session = self.get(session_id)  # indexes the session as it is loaded
+                except SessionNotFound:
+                    continue
+                except (ValueError, OSError):
+                    session = None
+                if session is None or session.get('session_id') != session_id:
+                    self.index.remove(session_id)
+                    self.index.ignore_file(session_id, signature)
+                    continue
+                try:
+                    # get() may have folded the journal; record what is on disk now
+                    self.index.mark_synced(session_id, self._file_signature(session_id))
+                except OSError:
+                    continue
+
+            self._synced_journals = journals
+            self._synced_marker = marker
+
+    def cleanup(self, max_age_hours=24):
+        """Delete session files older than max_age_hours (by mtime), like a2a-session.sh cleanup"""
+        cutoff = time.time() - max_age_hours * 3600
+        cleaned = 0
+        for path in self.sessions_dir.glob('*.json'):
+            try:
+                mtime = path.stat().st_mtime
+                journal = path.with_suffix('.journal')
+                if journal.exists():
+                    mtime = max(mtime, journal.stat().st_mtime)
+                if mtime < cutoff:
+                    if self.delete(path.stem):
+                        cleaned += 1
+            except FileNotFoundError:
+                continue
+        return cleaned
+
+    def cleanup_expired(self, now=None):
+        """Delete sessions past expires_at using the expiry index only"""
+        now = time.time() if now is None else now
+        with self._expiry_locked():
+            try:
+                with self.expiry_index.open('r', encoding='utf-8') as fh:
+                    lines = fh.readlines()
+            except FileNotFoundError:
+                return 0
+
+            cleaned = 0
+            survivors = []
+            for line in lines:
+                parts = line.split()
+                if len(parts) != 2 or not parts[0].isdigit():
+                    continue
+                expires_at, session_id = int(parts[0]), parts[1]
+                if expires_at > now:
+                    survivors.append(line)
+                elif self.delete(session_id):
+                    cleaned += 1
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.sessions_dir, prefix='.expiry-index.')
+            with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+                fh.writelines(survivors)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_path, self.expiry_index)
+        return cleaned
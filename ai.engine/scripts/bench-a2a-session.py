@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+#
+# A2A Session Benchmark
+# Compares the per-request cost of the session backends behind the session
+# HTTP routes: spawning a2a-session.sh (previous behaviour) versus the
+# in-process a2a_session_store.
+#
+# Each backend runs the same workload in a throwaway sessions directory:
+# create a session, record --updates agent results on it, then get it.
+# The store runs once per storage mode (snapshot and journal).
+#
+# Usage:
+#   python3 bench-a2a-session.py [--sessions 50] [--updates 10] [--threads 1]
+#
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from a2a_session_store import SessionStore  # noqa: E402
+
+A2A_SESSION_SCRIPT = SCRIPT_DIR / "a2a-session.sh"
+
+
+class ScriptBackend:
+    name = "a2a-session.sh"
+
+    def __init__(self, sessions_dir):
+        self.env = dict(os.environ, A2A_SESSIONS_DIR=str(sessions_dir))
+
+    def _run(self, *args):
+        result = subprocess.run(
+            ["bash", str(A2A_SESSION_SCRIPT), *args],
+            capture_output=True,
+            text=True,
+            check=True,
+            env=self.env
+        )
+        return result.stdout.strip()
+
+    def create(self, task_id):
+        return self._run("create", task_id, '{"priority":"normal"}')
+
+    def update(self, session_id, agent_id):
+        self._run("update", session_id, agent_id, "completed", "/tmp/out.json")
+
+    def get(self, session_id):
+        self._run("get", session_id)
+
+
+class StoreBackend:
+    name = "a2a_session_store"
+    storage = "snapshot"
+
+    def __init__(self, sessions_dir):
+        self.store = SessionStore(sessions_dir, storage=self.storage)
+
+    def create(self, task_id):
+        return self.store.create(task_id, {"priority": "normal"})["session_id"]
+
+    def update(self, session_id, agent_id):
+        self.store.update(session_id, agent_id, "completed", "/tmp/out.json")
+
+    def get(self, session_id):
+        self.store.get(session_id)
+
+
+class JournalStoreBackend(StoreBackend):
+    name = "store (journal)"
+    storage = "journal"
+
+
+def workload(backend, index, updates):
+    session_id = backend.create(f"bench-{index}")
+    for n in range(updates):
+        backend.update(session_id, f"agent-{n}")
+    backend.get(session_id)
+    return 2 + updates
+
+
+def run(backend_cls, sessions, updates, threads):
+    with tempfile.TemporaryDirectory(prefix="a2a-bench-") as tmp:
+        backend = backend_cls(tmp)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            requests = sum(pool.map(
+                lambda i: workload(backend, i, updates), range(sessions)
+            ))
+        elapsed = time.perf_counter() - start
+    return requests, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark a2a-session.sh against the in-process session store"
+    )
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--updates", type=int, default=10,
+                        help="agent updates per session")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="concurrent sessions in flight")
+    parser.add_argument("--skip-script", action="store_true",
+                        help="only benchmark the in-process store")
+    args = parser.parse_args()
+
+    backends = [StoreBackend, JournalStoreBackend]
+    if not args.skip_script:
+        backends.insert(0, ScriptBackend)
+    results = {}
+    print(f"{'backend':<20} {'requests':>9} {'seconds':>9} {'req/s':>10}")
+    for backend_cls in backends:
+        requests, elapsed = run(backend_cls, args.sessions, args.updates, args.threads)
+        results[backend_cls.name] = requests / elapsed
+        print(f"{backend_cls.name:<20} {requests:>9} {elapsed:>9.3f} {requests / elapsed:>10.1f}")
+
+    if ScriptBackend.name in results:
+        before = results[ScriptBackend.name]
+        for backend_cls in backends[1:]:
+            print(f"speedup ({backend_cls.name}): {results[backend_cls.name] / before:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
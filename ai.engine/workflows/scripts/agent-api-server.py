@@ -2,19 +2,190 @@
 """
 Simple API server for executing AI Engine agent scripts
 Called by n8n workflows to trigger agents
+
+Agent invocations run synchronously by default. Pass "async": true in the
+invoke payload (or ?async=1) to get a 202 with a job ID instead; jobs run on a
+bounded worker pool (AGENT_API_MAX_WORKERS, default 4) and are exposed via
+GET /api/v1/jobs/<id> and GET /api/v1/jobs/<id>/stream. At most
+AGENT_API_MAX_QUEUED (default 32) jobs may wait for a worker; further async
+requests get a 429.
 """
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
+from concurrent.futures import ThreadPoolExecutor
 import subprocess
 import json
 import os
+import signal
+import sys
+import threading
+import time
+import uuid
 from datetime import datetime
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+
+from a2a_session_store import (  # noqa: E402
+    SessionNotFound, SessionStore, list_sessions_from_query
+)
+
 app = Flask(__name__)
 
 AGENT_SCRIPT = "/root/infra/ai.engine/workflows/scripts/trigger-agent.sh"
 ORCHESTRATION_DIR = "/root/infra/orchestration"
-A2A_SESSION_SCRIPT = Path("/root/infra/ai.engine/scripts/a2a-session.sh")
+AGENT_TIMEOUT = 300
+MAX_WORKERS = int(os.environ.get('AGENT_API_MAX_WORKERS', '4'))
+MAX_QUEUED = int(os.environ.get('AGENT_API_MAX_QUEUED', '32'))
+# Seconds to wait for output readers once the agent has exited; grandchildren
+# that still hold the pipes are killed after that.
+READER_JOIN_TIMEOUT = 5
+JOB_RETENTION_SECONDS = int(os.environ.get('AGENT_API_JOB_RETENTION', '3600'))
+
+session_store = SessionStore()
+
+
+class Job:
+    """State of one asynchronous agent invocation"""
+
+    def __init__(self, agent, output_file, trigger):
+        self.id = uuid.uuid4().hex
+        self.agent = agent
+        self.output_file = output_file
+        self.trigger = trigger
+        self.status = 'queued'
+        self.returncode = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.lines = []  # (stream, text) in arrival order
+        self.cond = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ('succeeded', 'failed', 'timeout')
+
+    def append(self, stream, text):
+        with self.cond:
+            self.lines.append((stream, text))
+            self.cond.notify_all()
+
+    def finish(self, status, returncode=None, error=None):
+        with self.cond:
+            self.status = status
+            self.returncode = returncode
+            self.error = error
+            self.finished_at = time.time()
+            self.cond.notify_all()
+
+    def to_dict(self):
+        with self.cond:
+            stdout = ''.join(text for stream, text in self.lines if stream == 'stdout')
+            stderr = ''.join(text for stream, text in self.lines if stream == 'stderr')
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'agent': self.agent,
+                'output_file': self.output_file,
+                'trigger': self.trigger,
+                'returncode': self.returncode,
+                'error': self.error,
+                'created_at': _isoformat(self.created_at),
+                'started_at': _isoformat(self.started_at),
+                'finished_at': _isoformat(self.finished_at),
+                'stdout': stdout,
+                'stderr': stderr
+            }
+
+
+def _isoformat(timestamp):
+    if timestamp is None:
+        return None
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='agent-job')
+jobs = {}
+jobs_lock = threading.Lock()
+
+
+def _prune_jobs():
+    """Drop finished jobs older than JOB_RETENTION_SECONDS"""
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    with jobs_lock:
+        expired = [job_id for job_id, job in jobs.items()
+                   if job.done and job.finished_at < cutoff]
+        for job_id in expired:
+            del jobs[job_id]
+
+
+def _pump(job, pipe, stream):
+    for line in iter(pipe.readline, ''):
+        job.append(stream, line)
+    pipe.close()
+
+
+def _kill_group(process):
+    """Kill the agent's whole process group (trigger-agent.sh and its children)"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _join_readers(process, readers):
+    for reader in readers:
+        reader.join(READER_JOIN_TIMEOUT)
+    if any(reader.is_alive() for reader in readers):
+        _kill_group(process)
+        for reader in readers:
+            reader.join(READER_JOIN_TIMEOUT)
+
+
+def _run_job(job):
+    """Execute trigger-agent.sh for a job, streaming output into the job"""
+    with job.cond:
+        job.status = 'running'
+        job.started_at = time.time()
+        job.cond.notify_all()
+    try:
+        process = subprocess.Popen(
+            [AGENT_SCRIPT, job.agent, job.output_file, job.trigger],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            cwd="/root/infra",
+            start_new_session=True
+        )
+    except OSError as e:
+        job.finish('failed', error=str(e))
+        return
+
+    readers = [
+        threading.Thread(target=_pump, args=(job, process.stdout, 'stdout'), daemon=True),
+        threading.Thread(target=_pump, args=(job, process.stderr, 'stderr'), daemon=True)
+    ]
+    for reader in readers:
+        reader.start()
+
+    try:
+        returncode = process.wait(timeout=AGENT_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        _kill_group(process)
+        process.wait()
+        _join_readers(process, readers)
+        job.finish('timeout', returncode=process.returncode,
+                   error=f'Agent execution timeout (exceeded {AGENT_TIMEOUT} seconds)')
+        return
+
+    _join_readers(process, readers)
+    job.finish('succeeded' if returncode == 0 else 'failed', returncode=returncode)
+
+
+def _get_job(job_id):
+    with jobs_lock:
+        return jobs.get(job_id)
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -29,6 +200,7 @@ def invoke_agent():
         agent = data.get('agent')
         output_file = data.get('output_file')
         trigger = data.get('trigger', 'webhook')
+        run_async = data.get('async', request.args.get('async', '')) in (True, 'true', '1', 'yes')
         
         if not agent:
             return jsonify({
@@ -44,6 +216,28 @@ def invoke_agent():
         # Ensure orchestration directory exists
         os.makedirs(ORCHESTRATION_DIR, exist_ok=True)
         
+        if run_async:
+            _prune_jobs()
+            job = Job(agent, output_file, trigger)
+            with jobs_lock:
+                queued = sum(1 for queued_job in jobs.values() if queued_job.status == 'queued')
+                if queued >= MAX_QUEUED:
+                    return jsonify({
+                        'status': 'error',
+                        'message': f'Job queue full ({queued} jobs waiting); retry later'
+                    }), 429
+                jobs[job.id] = job
+            executor.submit(_run_job, job)
+            return jsonify({
+                'status': 'accepted',
+                'job_id': job.id,
+                'agent': agent,
+                'output_file': output_file,
+                'trigger': trigger,
+                'status_url': f'/api/v1/jobs/{job.id}',
+                'stream_url': f'/api/v1/jobs/{job.id}/stream'
+            }), 202
+        
         # Execute agent script
         script_args = [AGENT_SCRIPT, agent, output_file, trigger]
         
@@ -51,7 +245,7 @@ def invoke_agent():
             script_args,
             capture_output=True,
             text=True,
-            timeout=300,
+            timeout=AGENT_TIMEOUT,
             cwd="/root/infra"
         )
         
@@ -71,7 +265,7 @@ def invoke_agent():
     except subprocess.TimeoutExpired:
         return jsonify({
             'status': 'error',
-            'message': 'Agent execution timeout (exceeded 300 seconds)'
+            'message': f'Agent execution timeout (exceeded {AGENT_TIMEOUT} seconds)'
         }), 500
     except Exception as e:
         return jsonify({
@@ -79,6 +273,48 @@ def invoke_agent():
             'message': str(e)
         }), 500
 
+@app.route('/api/v1/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get status and output collected so far for an async agent job"""
+    job = _get_job(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Job not found: {job_id}'
+        }), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/api/v1/jobs/<job_id>/stream', methods=['GET'])
+def stream_job(job_id):
+    """Stream job output as server-sent events until the job finishes"""
+    job = _get_job(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Job not found: {job_id}'
+        }), 404
+
+    def generate():
+        position = 0
+        while True:
+            with job.cond:
+                if position >= len(job.lines) and not job.done:
+                    job.cond.wait(timeout=15)
+                pending = job.lines[position:]
+                position += len(pending)
+                done = job.done and position >= len(job.lines)
+            for stream, text in pending:
+                yield f'event: {stream}\ndata: {json.dumps(text)}\n\n'
+            if done:
+                summary = {'status': job.status, 'returncode': job.returncode, 'error': job.error}
+                yield f'event: end\ndata: {json.dumps(summary)}\n\n'
+                return
+            if not pending:
+                yield ': keep-alive\n\n'
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/v1/agents/list', methods=['GET'])
 def list_agents():
     """List available agents"""
@@ -89,7 +325,7 @@ def list_agents():
     ]
     return jsonify({'agents': agents}), 200
 
-# A2A Session Management Endpoints
+# A2A Session Management Endpoints (served in-process by a2a_session_store)
 
 @app.route('/api/v1/sessions/create', methods=['POST'])
 def create_session():
@@ -97,51 +333,24 @@ def create_session():
     try:
         data = request.get_json() or {}
         task_id = data.get('task_id', f'task-{int(datetime.now().timestamp())}')
-        task_metadata = json.dumps(data.get('task_metadata', {
+        task_metadata = data.get('task_metadata', {
             'type': data.get('task_type', 'single-agent'),
             'priority': data.get('priority', 'normal'),
             'timeout': data.get('timeout', 3600),
             'agents': data.get('agents', [])
-        }))
-        
-        if not A2A_SESSION_SCRIPT.exists():
-            # Fallback: generate session ID client-side
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-            import random
-            random_str = ''.join(random.choices('abcdef0123456789', k=8))
-            session_id = f'a2a-{timestamp}-{random_str}'
-            return jsonify({
-                "status": "success",
-                "session_id": session_id,
-                "task_id": task_id,
-                "note": "a2a-session.sh not found, using client-side generation"
-            })
-        
-        # Call a2a-session.sh create
-        result = subprocess.run(
-            [str(A2A_SESSION_SCRIPT), 'create', task_id, task_metadata],
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=10
-        )
+        })
         
-        session_id = result.stdout.strip()
+        session = session_store.create(task_id, task_metadata)
         
         return jsonify({
             "status": "success",
-            "session_id": session_id,
+            "session_id": session['session_id'],
             "task_id": task_id
         })
-    except subprocess.TimeoutExpired:
-        return jsonify({
-            "status": "error",
-            "message": "Session creation timeout"
-        }), 500
-    except subprocess.CalledProcessError as e:
+    except OSError as e:
         return jsonify({
             "status": "error",
-            "message": f"Failed to create session: {e.stderr}"
+            "message": f"Failed to create session: {e}"
         }), 500
     except Exception as e:
         return jsonify({
@@ -149,35 +358,27 @@ def create_session():
             "message": str(e)
         }), 500
 
+@app.route('/api/v1/sessions', methods=['GET'])
+def list_sessions():
+    """List sessions from the session index with filters and cursor pagination"""
+    body, status = list_sessions_from_query(session_store, request.args)
+    return jsonify(body), status
+
 @app.route('/api/v1/sessions/<session_id>', methods=['GET'])
 def get_session(session_id):
     """Get session data"""
     try:
-        if not A2A_SESSION_SCRIPT.exists():
-            return jsonify({
-                "status": "error",
-                "message": "a2a-session.sh not found"
-            }), 503
-        
-        result = subprocess.run(
-            [str(A2A_SESSION_SCRIPT), 'get', session_id],
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=10
-        )
-        
-        session_data = json.loads(result.stdout)
+        session_data = session_store.get(session_id)
         return jsonify({
             "status": "success",
             "session": session_data
         })
-    except subprocess.CalledProcessError:
+    except SessionNotFound:
         return jsonify({
             "status": "error",
             "message": f"Session not found: {session_id}"
         }), 404
-    except json.JSONDecodeError:
+    except ValueError:
         return jsonify({
             "status": "error",
             "message": "Invalid session data"
@@ -203,42 +404,23 @@ def update_session(session_id):
                 "message": "agent_id required"
             }), 400
         
-        if not A2A_SESSION_SCRIPT.exists():
-            return jsonify({
-                "status": "success",
-                "message": "Session update logged (a2a-session.sh not available)",
-                "session_id": session_id,
-                "agent_id": agent_id
-            })
-        
-        # Call a2a-session.sh update
-        cmd = [str(A2A_SESSION_SCRIPT), 'update', session_id, agent_id, status]
-        if output_file:
-            cmd.append(output_file)
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=10
-        )
+        session_store.update(session_id, agent_id, status, output_file)
         
         return jsonify({
             "status": "success",
-            "message": result.stdout.strip(),
+            "message": f"Session updated: {session_id}",
             "session_id": session_id,
             "agent_id": agent_id
         })
-    except subprocess.TimeoutExpired:
+    except SessionNotFound:
         return jsonify({
             "status": "error",
-            "message": "Session update timeout"
-        }), 500
-    except subprocess.CalledProcessError as e:
+            "message": f"Session not found: {session_id}"
+        }), 404
+    except (OSError, ValueError) as e:
         return jsonify({
             "status": "error",
-            "message": f"Failed to update session: {e.stderr}"
+            "message": f"Failed to update session: {e}"
         }), 500
     except Exception as e:
         return jsonify({
@@ -250,5 +432,6 @@ if __name__ == '__main__':
     # Run on all interfaces, port 8081
     # Accessible from Docker containers via host.docker.internal:8081
     # Includes both agent invocation and A2A session management
-    app.run(host='0.0.0.0', port=8081, debug=False)
+    # threaded=True so job polling/streaming is served alongside invocations
+    app.run(host='0.0.0.0', port=8081, debug=False, threaded=True)
 
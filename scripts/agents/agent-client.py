@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Thin client for the warm agent daemon (`runner.py serve`).
+
+Forwards its argv, working directory and environment to the daemon socket and
+streams stdout/stderr and the exit code back. Falls back to a regular
+`run-agent.py` invocation when no daemon is listening, so callers can switch
+over unconditionally. The protocol does not carry stdin (daemon workers read
+/dev/null), so invocations that pass `-` as an argument or have a pipe or file
+on stdin also run through `run-agent.py`.
+
+Only the standard library modules needed for the socket round trip are
+imported; the agent code stays loaded in the daemon.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+RUN_AGENT_PATH = os.path.join(REPO_ROOT, "scripts", "agents", "run-agent.py")
+DEFAULT_SOCKET_PATH = os.path.join(REPO_ROOT, ".state", "agent-runner.sock")
+
+# Wire protocol (keep in sync with .cursor/agents/daemon.py).
+FRAME_HEADER = struct.Struct("!BI")
+FRAME_REQUEST = 0
+FRAME_STDOUT = 1
+FRAME_STDERR = 2
+FRAME_EXIT = 3
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes | None:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _fallback(argv: list[str]) -> int:
+    os.execv(sys.executable, [sys.executable, RUN_AGENT_PATH, *argv])
+    return 127  # pragma: no cover - execv does not return
+
+
+def _needs_stdin(args: list[str]) -> bool:
+    """Whether the invocation may read stdin, which the daemon cannot forward."""
+    if "-" in args:
+        return True
+    try:
+        mode = os.fstat(sys.stdin.fileno()).st_mode
+    except (OSError, ValueError, AttributeError):
+        return False
+    # A terminal or /dev/null is fine; a pipe, file or socket carries input.
+    return stat.S_ISFIFO(mode) or stat.S_ISREG(mode) or stat.S_ISSOCK(mode)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    socket_path = os.environ.get("CURSOR_AGENT_SOCKET", DEFAULT_SOCKET_PATH)
+    if _needs_stdin(args):
+        return _fallback(args)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return _fallback(args)
+
+    request = json.dumps(
+        {"argv": args, "cwd": os.getcwd(), "env": dict(os.environ)}
+    ).encode("utf-8")
+    sock.sendall(FRAME_HEADER.pack(FRAME_REQUEST, len(request)) + request)
+
+    streams = {FRAME_STDOUT: sys.stdout.buffer, FRAME_STDERR: sys.stderr.buffer}
+    try:
+        while True:
+            header = _recv_exact(sock, FRAME_HEADER.size)
+            if header is None:
+                print("agent-client: daemon closed the connection", file=sys.stderr)
+                return 1
+            channel, length = FRAME_HEADER.unpack(header)
+            payload = _recv_exact(sock, length) if length else b""
+            if payload is None:
+                print("agent-client: truncated frame from daemon", file=sys.stderr)
+                return 1
+            if channel == FRAME_EXIT:
+                return struct.unpack("!i", payload)[0]
+            stream = streams.get(channel)
+            if stream is not None:
+                stream.write(payload)
+                stream.flush()
+    except BrokenPipeError:
+        # The reader went away (``| head``). Point stdout at devnull so the
+        # interpreter's final flush does not raise again, and exit quietly.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        os.close(devnull)
+        return 1
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the Cursor agent runner.
+
+Runs ``runner.py list`` and ``runner.py run <agent> -- --help`` for every
+registered agent under ``python -X importtime`` and reports, per case:
+
+  wall     median wall time of ``--repeat`` runs (interpreter start included)
+  imports  total import time (sum of the per-module "self" column)
+  modules  number of modules imported
+  top      the slowest top-level imports by cumulative time
+
+``--budget-ms`` turns the report into a check: the exit status is 1 when any
+case's import time goes over budget, so start-up regressions show up in CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+RUNNER_PATH = REPO_ROOT / ".cursor" / "agents" / "runner.py"
+REGISTRY_PATH = REPO_ROOT / ".cursor" / "agents" / "registry.json"
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse ``-X importtime`` lines into ``{module, self_us, cumulative_us, depth}``."""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|", 2)
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # column header
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        records.append(
+            {
+                "module": stripped,
+                "self_us": int(fields[0]),
+                "cumulative_us": int(fields[1]),
+                "depth": (len(name) - len(stripped) - 1) // 2,
+            }
+        )
+    return records
+
+
+def measure(label: str, argv: List[str], *, repeat: int, top: int) -> Dict[str, Any]:
+    command = [sys.executable, "-X", "importtime", str(RUNNER_PATH), *argv]
+    # One unmeasured run so every case starts from warm bytecode caches.
+    subprocess.run(command, capture_output=True, check=False)
+
+    walls: List[float] = []
+    records: List[Dict[str, Any]] = []
+    returncode = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completed = subprocess.run(command, capture_output=True, text=True, check=False)
+        walls.append(time.perf_counter() - started)
+        records = parse_importtime(completed.stderr)
+        returncode = completed.returncode
+
+    top_level = sorted(
+        (record for record in records if record["depth"] == 0),
+        key=lambda record: record["cumulative_us"],
+        reverse=True,
+    )
+    return {
+        "case": label,
+        "argv": argv,
+        "returncode": returncode,
+        "wall_ms": statistics.median(walls) * 1000,
+        "import_ms": sum(record["self_us"] for record in records) / 1000,
+        "modules": len(records),
+        "top": [
+            {"module": record["module"], "cumulative_ms": record["cumulative_us"] / 1000}
+            for record in top_level[:top]
+        ],
+    }
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (default: 5)")
+    parser.add_argument("--top", type=int, default=5, help="Slowest top-level imports to show (default: 5)")
+    parser.add_argument(
+        "--agent",
+        action="append",
+        default=[],
+        help="Only benchmark this agent (repeatable; default: every registered agent)",
+    )
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        help="Exit 1 when any case spends more than this many ms importing modules",
+    )
+    parser.add_argument("--json", action="store_true", help="Emit JSON instead of a table")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    with REGISTRY_PATH.open("r", encoding="utf-8") as fh:
+        agents = list(json.load(fh).get("agents", {}))
+    unknown = [name for name in args.agent if name not in agents]
+    if unknown:
+        print(f"unknown agent(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    cases = [("list", ["list"])]
+    cases += [(f"run {name}", ["run", name, "--", "--help"]) for name in args.agent or agents]
+    results = [measure(label, argv, repeat=max(1, args.repeat), top=args.top) for label, argv in cases]
+    over_budget = [
+        result["case"]
+        for result in results
+        if args.budget_ms is not None and result["import_ms"] > args.budget_ms
+    ]
+
+    if args.json:
+        print(json.dumps({"budget_ms": args.budget_ms, "results": results}, indent=2))
+    else:
+        print(f"{'case':<26} {'wall ms':>8} {'imports ms':>11} {'modules':>8}  slowest top-level imports")
+        for result in results:
+            slowest = ", ".join(f"{item['module']} {item['cumulative_ms']:.1f}" for item in result["top"])
+            flag = "  (failed)" if result["returncode"] else ""
+            print(
+                f"{result['case']:<26} {result['wall_ms']:>8.1f} {result['import_ms']:>11.1f} "
+                f"{result['modules']:>8}  {slowest}{flag}"
+            )
+        if over_budget:
+            print(f"over the {args.budget_ms:g} ms import budget: {', '.join(over_budget)}")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
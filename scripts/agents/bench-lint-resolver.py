@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the lint resolver agent.
+
+Generates a synthetic repository (``--files`` Python modules, a share of them
+carrying ``--issues-per-file`` lint issues), puts a stub ``ruff`` on PATH that
+speaks ruff's JSON diagnostics, and runs ``LintResolverAgent`` through these
+scenarios, each in a fresh worker process:
+
+  cold   first full pass over the tree (empty clean-file cache)
+  warm   second full pass (issues fixed, cache populated)
+  watch  --watch passes, each triggered by editing a few files
+
+Every scenario reports wall time, per-pass time, linter spawns and peak RSS
+of the agent and of its largest child. The agent flags that matter for
+performance (--jobs, --no-cache, --batch-size, plus --no-batch here) are
+forwarded, so two runs with different flags compare like for like.
+
+Nothing outside the temporary directory is touched and no real linter or
+network access is needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import importlib.util
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+RUNNER_PATH = REPO_ROOT / ".cursor" / "agents" / "runner.py"
+REGISTRY_PATH = REPO_ROOT / ".cursor" / "agents" / "registry.json"
+
+SCENARIOS = ("cold", "warm", "watch")
+ISSUE_MARKER = "# BENCH_ISSUE"
+
+# Stand-in for ruff: same CLI subset and JSON shape as the registry commands
+# use. Every invocation is appended to $BENCH_SPAWN_LOG; BENCH_STARTUP_MS and
+# BENCH_PER_FILE_US simulate interpreter start-up and per-file lint cost.
+STUB_LINTER = r'''
+import json, os, sys, time
+
+ISSUE, FIXED = "# BENCH_ISSUE", "# BENCH_FIXED"
+args = sys.argv[1:]
+command, options, paths, output_format = args[0], set(), [], None
+rest = iter(args[1:])
+for arg in rest:
+    if arg in ("--format", "--output-format"):
+        output_format = next(rest, None)
+    elif arg.startswith("-"):
+        options.add(arg)
+    else:
+        paths.append(arg)
+
+fd = os.open(os.environ["BENCH_SPAWN_LOG"], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+os.write(fd, (" ".join([command, *sorted(options)]) + "\n").encode())
+os.close(fd)
+time.sleep(float(os.environ.get("BENCH_STARTUP_MS", "0")) / 1e3)
+per_file = float(os.environ.get("BENCH_PER_FILE_US", "0")) / 1e6
+
+if command == "--version":
+    print("ruff 0.0.0 (bench stub)")
+    sys.exit(0)
+
+def files():
+    for path in paths or ["."]:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for directory, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(name for name in dirnames if not name.startswith("."))
+            for name in sorted(filenames):
+                if name.endswith(".py"):
+                    yield os.path.join(directory, name)
+
+def issues(path):
+    with open(path, encoding="utf-8") as fh:
+        for row, line in enumerate(fh, 1):
+            if ISSUE in line:
+                yield {
+                    "code": "B001",
+                    "message": "synthetic issue",
+                    "filename": os.path.abspath(path),
+                    "location": {"row": row, "column": line.index(ISSUE) + 1},
+                    "end_location": {"row": row, "column": len(line.rstrip())},
+                    "fix": None,
+                    "noqa_row": row,
+                }
+
+found = []
+for path in files():
+    time.sleep(per_file)
+    if command == "format":
+        continue
+    if "--fix" in options:
+        with open(path, encoding="utf-8") as fh:
+            text = fh.read()
+        if ISSUE in text:
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write(text.replace(ISSUE, FIXED))
+        continue
+    found.extend(issues(path))
+
+if output_format is not None:
+    if output_format == "json-lines":
+        sys.stdout.write("".join(json.dumps(item) + "\n" for item in found))
+    else:
+        json.dump(found, sys.stdout, indent=2)
+    sys.exit(0)
+sys.exit(1 if found and "--exit-zero" not in options else 0)
+'''
+
+
+# --------------------------------------------------------------------- tree
+def module_source(index: int, issues: int) -> str:
+    lines = [
+        f'"""Synthetic module {index}."""',
+        "",
+        "",
+        f"def handler_{index}(value):",
+        "    return value * 2",
+        "",
+    ]
+    lines.extend(f"value_{n} = {n}  {ISSUE_MARKER}" for n in range(issues))
+    return "\n".join(lines) + "\n"
+
+
+def build_tree(root: Path, *, files: int, issues_per_file: int, dirty_ratio: float, seed: int) -> int:
+    """Write the synthetic repo; return how many files carry issues."""
+    rng = random.Random(seed)
+    dirty = set(rng.sample(range(files), round(files * dirty_ratio)))
+    for index in range(files):
+        path = root / f"pkg{index // 100:03d}" / f"mod{index:05d}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(module_source(index, issues_per_file if index in dirty else 0), encoding="utf-8")
+    return len(dirty)
+
+
+def install_stub(bin_dir: Path) -> None:
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    stub = bin_dir / "ruff"
+    stub.write_text(f"#!{sys.executable}\n{STUB_LINTER.lstrip()}", encoding="utf-8")
+    stub.chmod(0o755)
+
+
+# ------------------------------------------------------------------- worker
+def load_agent_module() -> Any:
+    spec = importlib.util.spec_from_file_location("cursor_agent_runner", RUNNER_PATH)
+    if spec is None or spec.loader is None:
+        raise RuntimeError(f"unable to load Cursor runner from {RUNNER_PATH}")
+    runner = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(runner)
+    return runner.import_agents_module("lint_resolver_agent")
+
+
+def agent_config(work: Path, *, no_batch: bool) -> Dict[str, Any]:
+    with REGISTRY_PATH.open("r", encoding="utf-8") as fh:
+        registry = json.load(fh)
+    config = copy.deepcopy(registry["agents"]["lint-resolver-agent"])
+    config["infra_root"] = str(work)
+    config["cache_file"] = str(work / "cache.json")
+    if no_batch:
+        for resolver in config.get("resolvers") or []:
+            resolver.pop("batch_commands", None)
+            resolver.pop("batch_verify", None)
+    return config
+
+
+def run_worker(spec: Dict[str, Any]) -> Dict[str, Any]:
+    work = Path(spec["work"])
+    repo = work / "repo"
+    spawn_log = work / "spawns.log"
+    spawn_log.write_text("", encoding="utf-8")
+    # Only the stub is reachable, so the registry's uv/ruff fallbacks
+    # resolve to it even on machines with real tools installed.
+    os.environ["PATH"] = str(work / "bin")
+    os.environ["BENCH_SPAWN_LOG"] = str(spawn_log)
+    os.environ["BENCH_STARTUP_MS"] = str(spec["startup_ms"])
+    os.environ["BENCH_PER_FILE_US"] = str(spec["per_file_us"])
+
+    module = load_agent_module()
+    agent = module.LintResolverAgent("lint-resolver-agent", agent_config(work, no_batch=spec["no_batch"]))
+    agent.repo_root = repo
+
+    pass_times: List[float] = []
+    pass_done = threading.Event()
+    process_all = agent._process_all_resolvers
+
+    def timed_pass(**kwargs: Any) -> bool:
+        started = time.perf_counter()
+        try:
+            return process_all(**kwargs)
+        finally:
+            pass_times.append(time.perf_counter() - started)
+            pass_done.set()
+
+    agent._process_all_resolvers = timed_pass
+
+    rounds = spec["watch_rounds"] if spec["scenario"] == "watch" else 0
+    argv = [
+        "--watch",
+        "--max-iterations", str(1 + rounds),
+        "--debounce", "0.05",
+        "--jobs", str(spec["jobs"]),
+        "--batch-size", str(spec["batch_size"]),
+    ]
+    if spec["no_cache"]:
+        argv.append("--no-cache")
+
+    started = time.perf_counter()
+    thread = threading.Thread(target=agent.run, args=(argv,), daemon=True)
+    thread.start()
+
+    latencies: List[float] = []
+    timed_out = False
+    if rounds:
+        rng = random.Random(spec["seed"])
+        modules = sorted(repo.rglob("*.py"))
+        if not pass_done.wait(timeout=600):
+            timed_out = True
+        for _ in range(rounds if not timed_out else 0):
+            pass_done.clear()
+            edited = time.perf_counter()
+            for path in rng.sample(modules, min(spec["watch_edits"], len(modules))):
+                with path.open("a", encoding="utf-8") as fh:
+                    fh.write(f"edited = 1  {ISSUE_MARKER}\n")
+            if not pass_done.wait(timeout=120):
+                timed_out = True
+                break
+            latencies.append(time.perf_counter() - edited)
+    thread.join(timeout=600)
+    wall = time.perf_counter() - started
+
+    spawns: Dict[str, int] = {}
+    for line in spawn_log.read_text(encoding="utf-8").splitlines():
+        spawns[line] = spawns.get(line, 0) + 1
+    return {
+        "scenario": spec["scenario"],
+        "wall_s": round(wall, 4),
+        "passes": len(pass_times),
+        "pass_s": [round(value, 4) for value in pass_times],
+        "watch_latency_s": [round(value, 4) for value in latencies],
+        "spawns": sum(spawns.values()),
+        "spawns_by_command": dict(sorted(spawns.items())),
+        "agent_peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "child_peak_rss_kib": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        "timed_out": timed_out or thread.is_alive(),
+    }
+
+
+# ------------------------------------------------------------------- driver
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--files", type=int, default=1000, help="Modules in the synthetic tree.")
+    parser.add_argument("--issues-per-file", type=int, default=3, help="Issues in each dirty module.")
+    parser.add_argument("--dirty-ratio", type=float, default=0.2, help="Share of modules with issues.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for dirty and edited file choice.")
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help=f"Comma separated subset of {', '.join(SCENARIOS)} (run in order on one tree).",
+    )
+    parser.add_argument("--watch-rounds", type=int, default=5, help="Edit rounds in the watch scenario.")
+    parser.add_argument("--watch-edits", type=int, default=5, help="Files edited per watch round.")
+    parser.add_argument("--startup-ms", type=float, default=30.0, help="Simulated linter start-up cost.")
+    parser.add_argument("--per-file-us", type=float, default=200.0, help="Simulated per-file lint cost.")
+    parser.add_argument("--jobs", type=int, default=1, help="Forwarded to the agent.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Forwarded to the agent.")
+    parser.add_argument("--no-cache", action="store_true", help="Forwarded to the agent.")
+    parser.add_argument(
+        "--no-batch",
+        action="store_true",
+        help="Drop batch_commands/batch_verify so every file runs its own fix chain.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary tree and print its path.")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        return 0
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"unknown scenario(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    work = Path(tempfile.mkdtemp(prefix="bench-lint-resolver-"))
+    try:
+        install_stub(work / "bin")
+        dirty = build_tree(
+            work / "repo",
+            files=args.files,
+            issues_per_file=args.issues_per_file,
+            dirty_ratio=args.dirty_ratio,
+            seed=args.seed,
+        )
+        results = []
+        for scenario in scenarios:
+            spec = {
+                "scenario": scenario,
+                "work": str(work),
+                "seed": args.seed,
+                "jobs": args.jobs,
+                "batch_size": args.batch_size,
+                "no_cache": args.no_cache,
+                "no_batch": args.no_batch,
+                "startup_ms": args.startup_ms,
+                "per_file_us": args.per_file_us,
+                "watch_rounds": args.watch_rounds,
+                "watch_edits": args.watch_edits,
+            }
+            completed = subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), "--worker", json.dumps(spec)],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            lines = completed.stdout.strip().splitlines()
+            if completed.returncode != 0 or not lines:
+                print(f"{scenario}: worker failed\n{completed.stderr}", file=sys.stderr)
+                return 1
+            results.append(json.loads(lines[-1]))
+    finally:
+        if args.keep:
+            print(f"tree kept at {work}", file=sys.stderr)
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+    summary = {
+        "files": args.files,
+        "dirty_files": dirty,
+        "issues_per_file": args.issues_per_file,
+        "jobs": args.jobs,
+        "batch": not args.no_batch,
+        "batch_size": args.batch_size,
+        "cache": not args.no_cache,
+        "results": results,
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+
+    print(
+        f"{args.files} files ({dirty} dirty x {args.issues_per_file} issues), jobs={args.jobs}, "
+        f"batch={'off' if args.no_batch else args.batch_size}, cache={'off' if args.no_cache else 'on'}"
+    )
+    print(f"{'scenario':<8} {'wall s':>8} {'passes':>6} {'median s':>9} {'spawns':>7} {'agent MiB':>10} {'child MiB':>10}")
+    for result in results:
+        timings = result["watch_latency_s"] or result["pass_s"]
+        median = statistics.median(timings) if timings else 0.0
+        flag = "  (timed out)" if result["timed_out"] else ""
+        print(
+            f"{result['scenario']:<8} {result['wall_s']:>8.3f} {result['passes']:>6} {median:>9.3f} "
+            f"{result['spawns']:>7} {result['agent_peak_rss_kib'] / 1024:>10.1f} "
+            f"{result['child_peak_rss_kib'] / 1024:>10.1f}{flag}"
+        )
+    print("median s: per pass (cold/warm) or edit-to-pass-done latency (watch)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Rotation regression check for the logger agent.
+
+Replays source-log histories in a scratch infra root, runs ``LoggerAgent``
+after each step and checks that CHANGE.log ends up holding every source line
+exactly once, in order. Scenarios:
+
+  append            plain growth between runs
+  copytruncate      copy to ``app.log.1``, truncate, refill past the old offset
+  copytruncate-same the same, refilled to exactly the old size
+  rename            ``mv app.log app.log.1`` and a fresh ``app.log``
+
+Source mtimes are moved an hour into the past before each run, so the
+agent's stat-only fast paths (which distrust recent mtimes) are exercised.
+The exit status is 1 when any scenario loses or duplicates lines.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+RUNNER_PATH = REPO_ROOT / ".cursor" / "agents" / "runner.py"
+
+
+def load_logger_module() -> Any:
+    spec = importlib.util.spec_from_file_location("cursor_agent_runner", RUNNER_PATH)
+    if spec is None or spec.loader is None:
+        raise RuntimeError(f"unable to load Cursor runner from {RUNNER_PATH}")
+    runner = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(runner)
+    return runner.import_agents_module("logger_agent")
+
+
+class Source:
+    """A source log plus the lines every run must eventually copy."""
+
+    def __init__(self, root: Path) -> None:
+        self.path = root / "logs" / "app.log"
+        self.path.parent.mkdir(parents=True)
+        self.expected: List[str] = []
+        self.counter = 0
+        self.age = 3600
+
+    def lines(self, count: int) -> str:
+        text = ""
+        for _ in range(count):
+            self.counter += 1
+            line = f"entry {self.counter:05d}"
+            self.expected.append(line)
+            text += line + "\n"
+        return text
+
+    def append(self, count: int) -> None:
+        with self.path.open("a", encoding="utf-8") as fh:
+            fh.write(self.lines(count))
+
+    def copytruncate(self) -> None:
+        shutil.copy2(self.path, self.path.with_name("app.log.1"))
+        with self.path.open("r+", encoding="utf-8") as fh:
+            fh.truncate(0)
+
+    def rename(self) -> None:
+        os.replace(self.path, self.path.with_name("app.log.1"))
+
+    def age_files(self) -> None:
+        # Distinct, old mtimes: every step moves the mtime, none is racy.
+        self.age -= 1
+        stamp = time.time() - self.age
+        for path in self.path.parent.iterdir():
+            os.utime(path, (stamp, stamp))
+
+
+def scenario_append(source: Source, run: Callable[[], None]) -> None:
+    source.append(10)
+    run()
+    source.append(5)
+    run()
+
+
+def scenario_copytruncate(source: Source, run: Callable[[], None]) -> None:
+    source.append(10)
+    run()
+    source.append(2)
+    source.copytruncate()
+    source.append(40)
+    run()
+
+
+def scenario_copytruncate_same(source: Source, run: Callable[[], None]) -> None:
+    source.append(10)
+    run()
+    source.copytruncate()
+    source.append(10)
+    run()
+
+
+def scenario_rename(source: Source, run: Callable[[], None]) -> None:
+    source.append(10)
+    run()
+    source.append(3)
+    source.rename()
+    source.append(20)
+    run()
+
+
+SCENARIOS: Dict[str, Callable[[Source, Callable[[], None]], None]] = {
+    "append": scenario_append,
+    "copytruncate": scenario_copytruncate,
+    "copytruncate-same": scenario_copytruncate_same,
+    "rename": scenario_rename,
+}
+
+
+def check(name: str, module: Any, keep: bool) -> bool:
+    root = Path(tempfile.mkdtemp(prefix=f"logger-{name}-"))
+    source = Source(root)
+    config = {
+        "infra_root": str(root),
+        "source_logs": ["logs/*.log"],
+        "target_log": "CHANGE.log",
+        "state_file": ".state/logger-agent.json",
+    }
+
+    def run() -> None:
+        source.age_files()
+        agent = module.LoggerAgent("logger-agent", config)
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent.run([])
+
+    try:
+        SCENARIOS[name](source, run)
+        changelog = root / "CHANGE.log"
+        text = changelog.read_text(encoding="utf-8") if changelog.exists() else ""
+        copied = [line for line in text.splitlines() if line.startswith("entry ")]
+        ok = copied == source.expected
+        status = "ok" if ok else "FAIL"
+        print(f"{name:<18} {status}  expected {len(source.expected)} lines, copied {len(copied)}")
+        if not ok:
+            missing = [line for line in source.expected if line not in copied]
+            if missing:
+                print(f"{'':<18} missing: {', '.join(missing[:5])}{' ...' if len(missing) > 5 else ''}")
+        return ok
+    finally:
+        if keep:
+            print(f"{'':<18} kept {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "scenarios",
+        nargs="*",
+        help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)}).",
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directories.")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    module = load_logger_module()
+    results = [check(name, module, args.keep) for name in args.scenarios or SCENARIOS]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,20 @@
 #!/usr/bin/env python3
 """
 Skeleton for a Python-based infra agent.
+
+Copy to ``.cursor/agents/<agent_name>.py`` and register it in
+``registry.json``; the ``base`` import below resolves from there, both
+through ``runner.py`` and when the file is executed directly.
 """
 
 from __future__ import annotations
 
 from typing import Dict
 
-import importlib.util
-import sys
-from pathlib import Path
-
-BASE_MODULE_PATH = Path(__file__).resolve().parents[3] / ".cursor" / "agents" / "base.py"
-BASE_MODULE_ID = "cursor_agent_base"
-
-if BASE_MODULE_ID in sys.modules:
-    _base_module = sys.modules[BASE_MODULE_ID]
-else:
-    _base_spec = importlib.util.spec_from_file_location(BASE_MODULE_ID, BASE_MODULE_PATH)
-    if _base_spec is None or _base_spec.loader is None:
-        raise RuntimeError(f"unable to load base agent from {BASE_MODULE_PATH}")
-    _base_module = importlib.util.module_from_spec(_base_spec)
-    sys.modules[BASE_MODULE_ID] = _base_module
-    _base_spec.loader.exec_module(_base_module)
-
-BaseAgent = getattr(_base_module, "BaseAgent")
+if __package__:
+    from .base import BaseAgent
+else:  # executed as a script; .cursor/agents is sys.path[0]
+    from base import BaseAgent
 
 
 class TemplateAgent(BaseAgent):